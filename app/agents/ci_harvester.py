@@ -0,0 +1,204 @@
+# === CI run harvest (GitHub Actions) ===
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.utils import github_client
+from app.utils.github_client import GitHubError
+from app.db import get_ci_cursor, set_ci_cursor, save_ci_runs, prune_ci_runs, iter_ci_runs
+
+CI_SLICE_HOURS = float(os.getenv("CI_SLICE_HOURS", "24"))  # created= range per query
+CI_RETENTION_DAYS = float(os.getenv("CI_RETENTION_DAYS", "90"))  # stored runs older than this are pruned
+CI_REPORT_TOP_N = int(os.getenv("CI_REPORT_TOP_N", "5"))  # workflow/branch rows shown in the report
+CI_SEARCH_LIMIT = 1000  # /actions/runs returns at most 1000 runs per created= query
+CI_PAGE_SIZE = 100
+
+FAILED_CONCLUSIONS = {"failure", "timed_out", "startup_failure"}
+# Not a verdict on the code: left out of failure-rate denominators
+IGNORED_CONCLUSIONS = {"cancelled", "skipped", "neutral", "stale", "action_required"}
+
+
+def repo_api(repo):
+    # Read at call time so github_replay.use_api_url reaches this module too
+    return f"{github_client.GITHUB_API_URL}/repos/{repo}"
+
+
+def iso(ts):
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def epoch(value):
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()) if value else None
+
+
+def run_row(run):
+    # Duration is run_started_at -> updated_at: the list endpoint has no
+    # billable timing, and fetching /timing per run would double the calls
+    started = epoch(run.get("run_started_at") or run.get("created_at"))
+    finished = epoch(run.get("updated_at"))
+    completed = run.get("status") == "completed"
+    return {
+        "id": run["id"],
+        "workflow": run.get("name") or str(run.get("workflow_id")),
+        "branch": run.get("head_branch") or "",
+        "conclusion": (run.get("conclusion") or "unknown") if completed else None,
+        "run_attempt": run.get("run_attempt") or 1,
+        "created_at": epoch(run["created_at"]),
+        "duration_seconds": finished - started if completed and started and finished else None
+    }
+
+
+async def iter_run_pages(client, repo, start, end, page_stats):
+    # Yields pages of runs created in [start, end]. A range with more runs than
+    # the search limit is split in half until each query fits. A failed page
+    # raises GitHubError: it isn't an empty range.
+    page = 1
+    while True:
+        params = {"created": f"{iso(start)}..{iso(end)}", "per_page": CI_PAGE_SIZE, "page": page}
+        data = await client.get_page(f"{repo_api(repo)}/actions/runs", params=params)
+        page_stats["pages"] += 1
+        if not isinstance(data, dict):
+            return
+        total = data.get("total_count", 0)
+        if page == 1 and total > CI_SEARCH_LIMIT and end - start > timedelta(minutes=1):
+            middle = start + (end - start) / 2
+            async for runs in iter_run_pages(client, repo, start, middle, page_stats):
+                yield runs
+            async for runs in iter_run_pages(client, repo, middle, end, page_stats):
+                yield runs
+            return
+        runs = data.get("workflow_runs") or []
+        if runs:
+            yield runs
+        if len(runs) < CI_PAGE_SIZE or page * CI_PAGE_SIZE >= total:
+            return
+        page += 1
+
+
+async def fetch_default_branch(client, repo):
+    data = await client.get_json(repo_api(repo), default={})
+    return (data.get("default_branch") if isinstance(data, dict) else None) or "main"
+
+
+async def harvest_ci_runs(client, repo, days=7):
+    # Fetches only runs created since the stored cursor, oldest slice first,
+    # then recomputes the window's stats from ci_runs. The cursor stays at the
+    # oldest run still in progress so it's re-read once it finishes.
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    window_start = now - timedelta(days=days)
+    cursor = get_ci_cursor(repo)
+    start = max(datetime.fromisoformat(cursor.replace("Z", "+00:00")), window_start) if cursor else window_start
+    default_branch = await fetch_default_branch(client, repo)
+
+    page_stats = {"pages": 0}
+    fetched = 0
+    oldest_pending = None
+    slice_start = start
+    while slice_start < now:
+        slice_end = min(slice_start + timedelta(hours=CI_SLICE_HOURS), now)
+        try:
+            async for runs in iter_run_pages(client, repo, slice_start, slice_end, page_stats):
+                rows = [run_row(run) for run in runs]
+                save_ci_runs(repo, rows)
+                fetched += len(rows)
+                for row in rows:
+                    if row["conclusion"] is None and (oldest_pending is None or row["created_at"] < oldest_pending):
+                        oldest_pending = row["created_at"]
+        except GitHubError as e:
+            # Runs already saved stay; the stats below cover what is stored
+            print(f"⚠️ CI harvest for {repo} stopped early, cursor kept at {iso(slice_start)}: {e}")
+            break
+        # Only advanced once a whole slice is stored, so a failed harvest retries it
+        set_ci_cursor(repo, iso(datetime.fromtimestamp(oldest_pending, timezone.utc)) if oldest_pending else iso(slice_end))
+        slice_start = slice_end
+
+    prune_ci_runs(repo, int((now - timedelta(days=CI_RETENTION_DAYS)).timestamp()))
+    stats = ci_window_stats(repo, int(window_start.timestamp()), default_branch)
+    stats.update({"runs_fetched": fetched, "pages": page_stats["pages"], "incremental": cursor is not None})
+    return stats
+
+
+def workflow_stats(repo, workflow, branch, conclusions, attempts, durations):
+    counted = [c for c in conclusions if c not in IGNORED_CONCLUSIONS]
+    failures = sum(1 for c in counted if c in FAILED_CONCLUSIONS)
+    # The list endpoint reports each run's latest attempt: a success on
+    # attempt 2+ means an earlier attempt failed on the same commit
+    flaky = sum(1 for c, a in zip(conclusions, attempts) if a > 1 and c == "success")
+    p50, p90, p95 = np.percentile(durations, [50, 90, 95]).tolist() if durations else (None, None, None)
+    return {
+        "repo": repo,
+        "workflow": workflow,
+        "branch": branch,
+        "runs": len(counted),
+        "failures": failures,
+        "failure_rate": round(failures / len(counted) * 100, 1) if counted else 0.0,
+        "reruns": sum(1 for a in attempts if a > 1),
+        "flaky_reruns": flaky,
+        "p50_minutes": round(p50 / 60, 1) if p50 is not None else None,
+        "p90_minutes": round(p90 / 60, 1) if p90 is not None else None,
+        "p95_minutes": round(p95 / 60, 1) if p95 is not None else None
+    }
+
+
+def ci_window_stats(repo, since_epoch, default_branch):
+    # One pass over the stored runs (sorted by workflow, branch); only the
+    # current group's columns are held at a time
+    workflows = []
+    group = None
+    conclusions, attempts, durations = [], [], []
+    for workflow, branch, conclusion, run_attempt, duration in iter_ci_runs(repo, since_epoch):
+        if (workflow, branch) != group:
+            if group:
+                workflows.append(workflow_stats(repo, *group, conclusions, attempts, durations))
+            group = (workflow, branch)
+            conclusions, attempts, durations = [], [], []
+        conclusions.append(conclusion)
+        attempts.append(run_attempt or 1)
+        if duration is not None:
+            durations.append(duration)
+    if group:
+        workflows.append(workflow_stats(repo, *group, conclusions, attempts, durations))
+    return summarize_ci(workflows, {repo: default_branch})
+
+
+def summarize_ci(workflows, default_branches):
+    runs = sum(w["runs"] for w in workflows)
+    failures = sum(w["failures"] for w in workflows)
+    default = [w for w in workflows if w["branch"] == default_branches.get(w["repo"])]
+    default_runs = sum(w["runs"] for w in default)
+    default_failures = sum(w["failures"] for w in default)
+    return {
+        "runs": runs,
+        "failures": failures,
+        "failure_rate": round(failures / runs * 100, 1) if runs else 0.0,
+        "flaky_reruns": sum(w["flaky_reruns"] for w in workflows),
+        "default_branches": default_branches,
+        "default_branch_runs": default_runs,
+        "default_branch_failure_rate": round(default_failures / default_runs * 100, 1) if default_runs else None,
+        "workflows": workflows
+    }
+
+
+def merge_ci_stats(stats):
+    # Workflow rows are per repo, so merging is concatenation plus new totals
+    stats = [s for s in stats if s]
+    merged = summarize_ci(
+        [w for s in stats for w in s["workflows"]],
+        {repo: branch for s in stats for repo, branch in s["default_branches"].items()}
+    )
+    merged.update({
+        "runs_fetched": sum(s.get("runs_fetched", 0) for s in stats),
+        "pages": sum(s.get("pages", 0) for s in stats),
+        "incremental": all(s.get("incremental") for s in stats)
+    })
+    return merged
+
+
+def top_workflows(ci_stats, n=CI_REPORT_TOP_N):
+    # Most failures first, then slowest p90
+    return sorted(
+        ci_stats.get("workflows", []),
+        key=lambda w: (w["failures"], w["flaky_reruns"], w["p90_minutes"] or 0),
+        reverse=True
+    )[:n]
@@ -1,145 +1,143 @@
 # === data_harvester_agent ===
 import os
-import requests
+import time
+import asyncio
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import statistics
-from concurrent.futures import ThreadPoolExecutor
+from array import array
+
+from app.utils.github_client import GitHubClient, GitHubError, GITHUB_API_URL
+from app.utils.event_table import EventTable, EventTableBuilder
+from app.agents.ci_harvester import harvest_ci_runs, merge_ci_stats, epoch as epoch_seconds
+from app.agents.dora import harvest_dora, dora_metrics
+from app.agents.hotspots import fetch_pr_files, record_pr_files, prune_hotspots
+from app.utils.identity import IDENTITIES, is_bot, canonical_author
+from app.db import init_db, get_watermark, set_watermark, save_pr_rows, get_pr_rows, iter_pr_rows
 
 load_dotenv()
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-REPO = "microsoft/vscode"
-BASE_API = f"https://api.github.com/repos/{REPO}"
-
-
-def paginated_get_recent(url, headers, since_iso, date_key="created_at"):
-    all_data = []
-    page = 1
-    while True:
-        paged_url = f"{url}&page={page}" if "?" in url else f"{url}?page={page}"
-        response = requests.get(paged_url, headers=headers)
-        if response.status_code != 200:
-            break
-        data = response.json()
-        if not isinstance(data, list) or not data:
-            break
-
-        filtered = []
-        for item in data:
-            item_date = item.get(date_key)
-            if item_date and item_date > since_iso:
-                filtered.append(item)
-            else:
-                break
-
-        if not filtered:
-            break
-
-        all_data.extend(filtered)
-        if len(filtered) < len(data):
-            break
-
-        page += 1
-    return all_data
-
-
-def paginated_get(url, headers, max_pages=5):
-    all_data = []
-    for page in range(1, max_pages + 1):
-        paged_url = f"{url}&page={page}" if "?" in url else f"{url}?page={page}"
-        response = requests.get(paged_url, headers=headers)
-        if response.status_code != 200:
-            break
-        data = response.json()
-        if not isinstance(data, list) or not data:
-            break
-        all_data.extend(data)
-    return all_data
-
-
-def fetch_mttr_from_issues(headers):
-    week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat() + "Z"
-    issues_url = f"{BASE_API}/issues?state=closed&labels=incident&per_page=100&sort=created&direction=desc"
-    issues = paginated_get_recent(issues_url, headers, since_iso=week_ago, date_key="created_at")
-
-    recovery_durations = []
-    for issue in issues:
-        created_at = datetime.fromisoformat(issue["created_at"].replace("Z", "+00:00"))
-        closed_at = datetime.fromisoformat(issue["closed_at"].replace("Z", "+00:00"))
-        recovery_time = (closed_at - created_at).total_seconds() / 3600
-        recovery_durations.append(recovery_time)
-
-    mttr_hours = round(statistics.mean(recovery_durations), 2) if recovery_durations else None
-    return {"mttr_hours": mttr_hours}
-
-
-def fetch_pr_throughput(headers):
-    week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat() + "Z"
-    url = f"{BASE_API}/pulls?state=all&per_page=100&sort=created&direction=desc"
-    prs = paginated_get_recent(url, headers, since_iso=week_ago, date_key="created_at")
-    total_prs = len(prs)
-    merged_prs = [pr for pr in prs if pr.get("merged_at")]
-    throughput = round((len(merged_prs) / total_prs) * 100, 2) if total_prs else 0.0
+HARVEST_BACKEND = os.getenv("HARVEST_BACKEND", "rest")  # "rest" or "graphql"
+# Comma-separated owner/name list; a report run can also pass state["repos"]
+REPOS = [r.strip() for r in os.getenv("GITHUB_REPOS", "microsoft/vscode").split(",") if r.strip()]
+HARVEST_MAX_PARALLEL_REPOS = int(os.getenv("HARVEST_MAX_PARALLEL_REPOS", "4"))
+
+
+def repo_api(repo):
+    return f"{GITHUB_API_URL}/repos/{repo}"
+
+
+def parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+class PRRecord:
+    # One PR as the metrics need it: epoch-second timestamps and churn totals,
+    # no raw GitHub JSON. __slots__ keeps it to a few dozen bytes per PR.
+    __slots__ = ("number", "author", "bot", "created_at", "merged_at", "first_review_at", "additions", "deletions", "files_changed")
+
+    def __init__(self, row):
+        self.number = row["number"]
+        self.author = row["author"] or "Unknown"
+        # GitHub's user type as stored, or the identity map / [bot] suffix
+        self.bot = bool(row["author_is_bot"]) or is_bot(self.author)
+        self.created_at = epoch(row["created_at"])
+        self.merged_at = epoch(row["merged_at"])
+        self.first_review_at = epoch(row["first_review_at"])
+        self.additions = row["additions"] or 0
+        self.deletions = row["deletions"] or 0
+        self.files_changed = row["files_changed"] or 0
+
+
+def epoch(value):
+    ts = parse_ts(value)
+    return ts.timestamp() if ts else None
+
+
+class PRWindow:
+    # Running totals over a stream of PRRecords: throughput, cycle time and
+    # review latency are aggregated as PRs arrive, so the window never holds
+    # the PRs themselves. Only per-PR latencies (8 bytes each) are kept, for
+    # the review latency histogram.
+    def __init__(self, since_iso, pages_fetched=0):
+        self.since_iso = since_iso
+        self.pages_fetched = pages_fetched
+        self.total = 0
+        self.merged = 0
+        self.cycle_hours = 0.0
+        self.latencies = array("d")
+
+    def add(self, pr):
+        self.total += 1
+        if pr.merged_at:
+            self.merged += 1
+            self.cycle_hours += (pr.merged_at - pr.created_at) / 3600
+        if pr.first_review_at:
+            self.latencies.append((pr.first_review_at - pr.created_at) / 3600)
+
+    def merge(self, other):
+        self.since_iso = min(self.since_iso, other.since_iso) if self.since_iso else other.since_iso
+        self.pages_fetched += other.pages_fetched
+        self.total += other.total
+        self.merged += other.merged
+        self.cycle_hours += other.cycle_hours
+        self.latencies.extend(other.latencies)
+        return self
+
+
+def pr_records(rows):
+    # Generator stage: stored rows in, compact records out
+    for row in rows:
+        yield PRRecord(row)
+
+
+def compute_pr_throughput(window):
+    throughput = round((window.merged / window.total) * 100, 2) if window.total else 0.0
     return {
-        "total_prs": total_prs,
-        "merged_prs": len(merged_prs),
-        "throughput_percent": throughput,
-        "merged_prs_list": merged_prs
+        "total_prs": window.total,
+        "merged_prs": window.merged,
+        "throughput_percent": throughput
     }
 
 
-def fetch_ci_failures(headers):
-    runs = paginated_get(f"{BASE_API}/actions/runs?per_page=100", headers, max_pages=2)
-    return {
-        "total_runs": len(runs),
-        "failed_runs": sum(1 for run in runs if run.get("conclusion") == "failure")
-    }
+def first_review(reviews, author):
+    # Earliest submitted review by someone other than the author or a bot.
+    # Taken by timestamp rather than position; pending reviews have no
+    # submitted_at and don't count yet.
+    first = (None, None)
+    for review in reviews:
+        user = review.get("user") or {}
+        login, submitted = user.get("login"), review.get("submitted_at")
+        if not submitted or review.get("state") == "PENDING" or not login:
+            continue
+        # The author under another alias is still the author
+        if canonical_author(login) == canonical_author(author) or is_bot(login, user.get("type")):
+            continue
+        if first[0] is None or submitted < first[0]:
+            first = (submitted, login)
+    return first
 
 
-def fetch_review_latency(headers):
-    week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat() + "Z"
-    url = f"{BASE_API}/pulls?state=all&per_page=100&sort=created&direction=desc"
-    prs = paginated_get_recent(url, headers, since_iso=week_ago, date_key="created_at")
-
-    total_latency = 0
-    count = 0
-    for pr in prs:
-        created = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00"))
-        pr_number = pr["number"]
-        reviews = requests.get(f"{BASE_API}/pulls/{pr_number}/reviews", headers=headers).json()
-        if reviews:
-            first_review_time = datetime.fromisoformat(reviews[0]["submitted_at"].replace("Z", "+00:00"))
-        else:
-            comments = requests.get(f"{BASE_API}/issues/{pr_number}/comments", headers=headers).json()
-            if not comments:
-                continue
-            first_review_time = datetime.fromisoformat(comments[0]["created_at"].replace("Z", "+00:00"))
-
-        latency_hrs = (first_review_time - created).total_seconds() / 3600
-        total_latency += latency_hrs
-        count += 1
-
-    avg_latency = round(total_latency / count, 2) if count else 0.0
-    return {"avg_review_latency_hours": avg_latency}
+async def fetch_first_review(client, repo, pr_number, author, immutable=False):
+    # A failed lookup raises GitHubError rather than reading as "no review yet"
+    reviews = await client.get_page(f"{repo_api(repo)}/pulls/{pr_number}/reviews", params={"per_page": 100},
+                                    immutable=immutable)
+    return first_review(reviews if isinstance(reviews, list) else [], author)
+
+
+def review_latency_hours(window):
+    # Hours from PR creation to first non-author review, for every PR that got one
+    return window.latencies.tolist()
 
 
-def fetch_cycle_time(headers):
-    week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat() + "Z"
-    url = f"{BASE_API}/pulls?state=closed&per_page=100&sort=created&direction=desc"
-    prs = paginated_get_recent(url, headers, since_iso=week_ago, date_key="created_at")
+def compute_review_latency(window):
+    latencies = window.latencies
+    avg_latency = round(sum(latencies) / len(latencies), 2) if latencies else 0.0
+    return {"avg_review_latency_hours": avg_latency}
 
-    recent_prs = [pr for pr in prs if pr.get("merged_at") and pr["created_at"] > week_ago]
-    total_cycle_time = 0
-    merged_count = 0
-    for pr in recent_prs:
-        created = datetime.fromisoformat(pr["created_at"].replace("Z", "+00:00"))
-        merged = datetime.fromisoformat(pr["merged_at"].replace("Z", "+00:00"))
-        cycle_time_hrs = (merged - created).total_seconds() / 3600
-        total_cycle_time += cycle_time_hrs
-        merged_count += 1
 
-    avg_hrs = round(total_cycle_time / merged_count, 2) if merged_count else 0.0
+def compute_cycle_time(window):
+    avg_hrs = round(window.cycle_hours / window.merged, 2) if window.merged else 0.0
     avg_days = round(avg_hrs / 24, 2)
     return {
         "avg_cycle_time_hours": avg_hrs,
@@ -147,82 +145,224 @@ def fetch_cycle_time(headers):
     }
 
 
-def fetch_pr_event(pr, headers):
-    pr_number = pr["number"]
-    files = paginated_get(f"{BASE_API}/pulls/{pr_number}/files", headers, max_pages=1)
-    author_login = pr.get("user", {}).get("login") or "Unknown"
-    if "bot" in str(author_login).lower():
-        return None
+async def fetch_pr_churn(client, repo, pr_number):
+    # Totals for the row, plus the file list for the hotspot index
+    files = await fetch_pr_files(client, repo, pr_number)
+    additions = sum(f[1] for f in files)
+    deletions = sum(f[2] for f in files)
+    return additions, deletions, len(files), files
+
+
+async def build_pr_row(client, repo, pr, previous):
+    user = pr.get("user") or {}
+    row = {
+        "number": pr["number"],
+        "author": user.get("login") or "Unknown",
+        "state": pr.get("state"),
+        "created_at": pr["created_at"],
+        "updated_at": pr.get("updated_at"),
+        "merged_at": pr.get("merged_at"),
+        "closed_at": pr.get("closed_at"),
+        "first_review_at": (previous or {}).get("first_review_at"),
+        "first_reviewer": (previous or {}).get("first_reviewer"),
+        "additions": (previous or {}).get("additions"),
+        "deletions": (previous or {}).get("deletions"),
+        "files_changed": (previous or {}).get("files_changed"),
+        "author_is_bot": is_bot(user.get("login") or "Unknown", user.get("type"))
+    }
+    # Only look up what the stored row doesn't already have
+    if not row["first_review_at"]:
+        row["first_review_at"], row["first_reviewer"] = await fetch_first_review(
+            client, repo, row["number"], row["author"], immutable=row["state"] == "closed"
+        )
+    if row["merged_at"] and row["additions"] is None and not row["author_is_bot"]:
+        row["additions"], row["deletions"], row["files_changed"], row["files"] = await fetch_pr_churn(client, repo, row["number"])
+    return row
+
+
+def finish_from_rows(repo, week_ago, pages_fetched):
+    # Streams the stored window through PRRecords into the running totals and
+    # the event table; rows are read from the DB in batches and dropped.
+    # Authors go in under their canonical identity, so one person's login and
+    # display name count as one.
+    window = PRWindow(week_ago, pages_fetched)
+    events = EventTableBuilder()
+    for pr in pr_records(iter_pr_rows(repo, week_ago)):
+        window.add(pr)
+        if pr.merged_at and not pr.bot:
+            events.add(canonical_author(pr.author), pr.number, pr.additions, pr.deletions, pr.files_changed, repo)
+    return {
+        "window": window,
+        "pr_metrics": compute_pr_throughput(window),
+        "review_latency": compute_review_latency(window),
+        "cycle_time": compute_cycle_time(window),
+        "event_table": events.build()
+    }
+
 
-    additions = sum(f.get("additions", 0) for f in files)
-    deletions = sum(f.get("deletions", 0) for f in files)
-    files_changed = len(files)
+async def harvest(client, repo, days=7):
+    week_ago = (datetime.utcnow() - timedelta(days=days)).isoformat() + "Z"
+    watermark = get_watermark(repo)
+    updated_since = max(watermark, week_ago) if watermark else week_ago
+
+    # Only PRs created or updated since the last run are fetched; CI and MTTR
+    # run alongside. Each /pulls page is turned into rows, saved and dropped
+    # before the next one, so memory stays at one page however big the window.
+    params = {"state": "all", "per_page": 100, "sort": "updated", "direction": "desc"}
+    page_stats = {"pages": 0}
+    side_fetches = asyncio.gather(harvest_ci_runs(client, repo, days), harvest_dora(client, repo))
+    refreshed = 0
+    newest_update = None
+    complete = False
+    try:
+        async for page in client.iter_recent(f"{repo_api(repo)}/pulls", since_iso=updated_since, date_key="updated_at",
+                                             params=params, page_stats=page_stats):
+            newest_update = max(newest_update or "", *(pr["updated_at"] for pr in page))
+            in_window = [pr for pr in page if pr["created_at"] > week_ago]
+            stored = get_pr_rows(repo, [pr["number"] for pr in in_window])
+            rows = await asyncio.gather(*(build_pr_row(client, repo, pr, stored.get(pr["number"])) for pr in in_window))
+            save_pr_rows(repo, rows)
+            record_pr_files(repo, rows)
+            refreshed += len(rows)
+        complete = True
+    except GitHubError as e:
+        # Pages already saved stay saved; the report uses what is stored
+        print(f"⚠️ PR harvest for {repo} stopped early, watermark not advanced: {e}")
+    except BaseException:
+        side_fetches.cancel()
+        raise
+    ci_stats, dora_ingest = await side_fetches
+    pages_fetched = page_stats["pages"]
+    # Only once every page back to the old watermark was stored; otherwise the
+    # next run starts from the old one again
+    if complete and newest_update:
+        set_watermark(repo, newest_update)
+    prune_hotspots(repo)
+
+    harvested = finish_from_rows(repo, week_ago, pages_fetched)
+    harvested.update({
+        "ci_failures": ci_stats["failures"],
+        "ci_stats": ci_stats,
+        "dora_ingest": dora_ingest,
+        "prs_refreshed": refreshed,
+        "incremental": watermark is not None,
+        # Throughput, review latency and cycle time used to paginate /pulls once each
+        "api_calls_saved": 2 * pages_fetched
+    })
+    return harvested
+
+
+def merge_repo_results(results):
+    # Org-level view: the per-repo running totals are merged, so throughput,
+    # cycle time and review latency are recomputed over every PR rather than
+    # averaged per repo
+    window = PRWindow("")
+    for r in results.values():
+        window.merge(r["window"])
+
+    # One DORA timeline per repo, merged: incidents only fail their own repo's deployments
+    dora = dora_metrics(list(results), epoch_seconds(window.since_iso)) if results else {}
 
     return {
-        "type": "PullRequestEvent",
-        "author": author_login,
-        "additions": additions,
-        "deletions": deletions,
-        "files_changed": files_changed,
-        "pr_number": pr_number
+        "window": window,
+        "pr_metrics": compute_pr_throughput(window),
+        "review_latency": compute_review_latency(window),
+        "cycle_time": compute_cycle_time(window),
+        "ci_failures": sum(r["ci_failures"] for r in results.values()),
+        "ci_stats": merge_ci_stats([r["ci_stats"] for r in results.values()]),
+        "dora": dora,
+        "event_table": EventTable.concat([r["event_table"] for r in results.values()]),
+        "prs_refreshed": sum(r["prs_refreshed"] for r in results.values()),
+        "incremental": all(r["incremental"] for r in results.values()),
+        "api_calls_saved": sum(r["api_calls_saved"] for r in results.values()),
+        "repo_results": {
+            repo: {
+                "total_prs": r["window"].total,
+                "merged_prs": r["window"].merged,
+                "events": len(r["event_table"]),
+                "ci_failures": r["ci_failures"],
+                "seconds": r["seconds"]
+            }
+            for repo, r in results.items()
+        }
     }
 
 
-def data_harvester_agent(state):
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json"
-    }
+async def harvest_repos(client, repos, max_parallel=None):
+    if HARVEST_BACKEND == "graphql":
+        from app.agents.graphql_harvester import harvest_graphql as backend
+    else:
+        backend = harvest
 
-    pr_metrics = fetch_pr_throughput(headers)
-    review_latency = fetch_review_latency(headers)
-    cycle_time = fetch_cycle_time(headers)
-    ci_failures = fetch_ci_failures(headers).get("failed_runs", 0)
-    mttr = fetch_mttr_from_issues(headers)
+    # Repos share one client, so its connection pool and rate-limit pause are
+    # global; this semaphore bounds how many repo pipelines run at once
+    semaphore = asyncio.Semaphore(max_parallel or HARVEST_MAX_PARALLEL_REPOS)
 
-    merged_prs = pr_metrics.get("merged_prs_list", [])
+    async def harvest_one(repo):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await backend(client, repo)
+            result["seconds"] = round(time.perf_counter() - started, 2)
+            print(f"📦 Harvested {repo}: {result['window'].total} PRs in {result['seconds']}s")
+            return repo, result
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(lambda pr: fetch_pr_event(pr, headers), merged_prs))
+    results = dict(await asyncio.gather(*(harvest_one(repo) for repo in repos)))
+    return merge_repo_results(results)
 
-    events = [res for res in results if res]
 
-    # Author-level churn aggregation
-    per_author_diff = {}
-    for event in events:
-        author = event["author"]
-        if author not in per_author_diff:
-            per_author_diff[author] = {
-                "additions": 0,
-                "deletions": 0,
-                "files_touched": 0
-            }
-        per_author_diff[author]["additions"] += event["additions"]
-        per_author_diff[author]["deletions"] += event["deletions"]
-        per_author_diff[author]["files_touched"] += event["files_changed"]
-
-    # Churn Outlier Detection
-    author_churn = [(author, stats["additions"] + stats["deletions"]) for author, stats in per_author_diff.items()]
-    churn_outliers = []
-    if author_churn:
-        churn_vals = [val for _, val in author_churn]
-        mean_churn = statistics.mean(churn_vals)
-        stdev_churn = statistics.stdev(churn_vals) if len(churn_vals) > 1 else 0
-        churn_outliers = [
-            {"author": author, "churn": churn}
-            for author, churn in author_churn
-            if churn > mean_churn + 2 * stdev_churn
-        ]
+async def run_harvest(repos):
+    init_db()
+    async with GitHubClient(token=GITHUB_TOKEN) as client:
+        harvested = await harvest_repos(client, repos)
+    harvested["client_stats"] = dict(client.stats)
+    harvested["cache_stats"] = dict(client.cache.stats) if client.cache else {}
+    return harvested
+
+
+def data_harvester_agent(state):
+    repos = state.get("repos") or REPOS
+    # Picks up edits to the identity map since the last report
+    IDENTITIES.refresh()
+    harvested = asyncio.run(run_harvest(repos))
+
+    window = harvested["window"]
+    pr_metrics = harvested["pr_metrics"]
+
+    client_stats = harvested["client_stats"]
+    harvest_stats = {
+        "api_calls": client_stats["calls"],
+        "api_retries": client_stats["retries"],
+        "bytes_received": client_stats["bytes"],
+        "api_seconds": round(client_stats["seconds"], 3),
+        "pr_window_pages": window.pages_fetched,
+        "api_calls_saved": harvested["api_calls_saved"],
+        "prs_refreshed": harvested["prs_refreshed"],
+        "incremental": harvested["incremental"],
+        "backend": HARVEST_BACKEND,
+        "repos": len(repos),
+        "cache": harvested["cache_stats"]
+    }
+    print(f"📡 Harvest made {harvest_stats['api_calls']} GitHub calls, saved {harvest_stats['api_calls_saved']} ({HARVEST_BACKEND} backend).")
+    if harvest_stats["cache"]:
+        cache = harvest_stats["cache"]
+        print(f"🗄️ HTTP cache: {cache['hits']} hits, {cache['revalidated']} revalidated (304), {cache['misses']} misses, {cache['evictions']} evicted.")
 
     state.update({
-        "events": events,
         "pr_metrics": pr_metrics,
-        "review_latency": review_latency,
-        "cycle_time": cycle_time,
-        "ci_failures": ci_failures,
-        "mttr_hours": mttr,
-        "per_author_diff": per_author_diff,
-        "churn_outliers": churn_outliers
+        "review_latency": harvested["review_latency"],
+        "review_latencies": [round(h, 2) for h in review_latency_hours(window)],
+        "cycle_time": harvested["cycle_time"],
+        "ci_failures": harvested["ci_failures"],
+        "ci_stats": harvested["ci_stats"],
+        "mttr_hours": harvested["dora"].get("mttr_hours"),
+        "dora": harvested["dora"],
+        # Merged PRs as a columnar table (no per-PR dicts); per-author stats
+        # and churn outliers are computed once, by DiffAnalyst
+        "event_table": harvested["event_table"],
+        "harvest_stats": harvest_stats,
+        "window": {"since": window.since_iso, "until": datetime.utcnow().isoformat() + "Z", "days": 7},
+        "repos": repos,
+        "repo_results": harvested["repo_results"]
     })
 
     return state
@@ -0,0 +1,243 @@
+# === DORA metrics from deployments, releases and incidents ===
+import asyncio
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.agents.ci_harvester import repo_api, iso, epoch
+from app.utils.github_client import GitHubError
+from app.db import (
+    get_dora_cursor, set_dora_cursor, save_dora_deployments, save_dora_incidents,
+    latest_dora_deployment, load_dora_timeline, prune_dora
+)
+
+DORA_ENVIRONMENT = os.getenv("DORA_ENVIRONMENT", "production")
+# "deployments", "releases", or "auto": releases for repos that have no deployments
+DORA_DEPLOY_SOURCE = os.getenv("DORA_DEPLOY_SOURCE", "auto")
+DORA_HISTORY_DAYS = float(os.getenv("DORA_HISTORY_DAYS", "90"))  # stored (and first-harvest) history
+DORA_INCIDENT_LABEL = os.getenv("DORA_INCIDENT_LABEL", "incident")
+# An incident opened this soon after a deployment marks that deployment as failed
+DORA_FAILURE_WINDOW_HOURS = float(os.getenv("DORA_FAILURE_WINDOW_HOURS", "24"))
+DORA_COMPARE_MAX_PAGES = 5  # 100 commits per page
+
+FINAL_STATUSES = {"success", "failure", "error", "inactive"}
+
+
+async def deployment_status(client, repo, deployment):
+    # Statuses come newest first; "inactive" means a later deployment replaced a successful one
+    statuses = await client.get_json(f"{repo_api(repo)}/deployments/{deployment['id']}/statuses", params={"per_page": 1}, default=[])
+    latest = statuses[0] if isinstance(statuses, list) and statuses else {}
+    state = latest.get("state") or "pending"
+    deployment["status"] = "success" if state == "inactive" else state
+    if state == "success":
+        deployment["deployed_at"] = epoch(latest.get("created_at"))
+    elif state in FINAL_STATUSES:
+        deployment["deployed_at"] = deployment["created_at"]
+    else:
+        deployment["deployed_at"] = None
+
+
+async def shipped_commits(client, repo, base, head):
+    # (sha, authored_at) for commits in base...head. Author date, not committer
+    # date: rebases and squash merges reset the latter to merge time. The
+    # first deployment on record has no base and ships no known commits, and
+    # neither does one whose base is gone (404). Other failures raise.
+    commits = []
+    if not base:
+        return commits
+    for page in range(1, DORA_COMPARE_MAX_PAGES + 1):
+        try:
+            data = await client.get_page(f"{repo_api(repo)}/compare/{base}...{head}", params={"per_page": 100, "page": page},
+                                         immutable=True)
+        except GitHubError as e:
+            if e.status != 404:
+                raise
+            break
+        batch = data.get("commits") if isinstance(data, dict) else None
+        if not batch:
+            break
+        commits += [(c["sha"], epoch(c["commit"]["author"]["date"])) for c in batch]
+        if len(batch) < 100 or len(commits) >= data.get("total_commits", 0):
+            break
+    return commits
+
+
+async def fetch_new_deployments(client, repo, source, since):
+    deployments = []
+    if source == "releases":
+        async for page in client.iter_recent(f"{repo_api(repo)}/releases", since_iso=since, date_key="created_at", params={"per_page": 100}):
+            deployments += [
+                {"id": r["id"], "sha": r["tag_name"], "created_at": epoch(r["created_at"]),
+                 "deployed_at": epoch(r["published_at"]), "status": "success"}
+                for r in page if r.get("published_at") and not r.get("draft") and not r.get("prerelease")
+            ]
+        return deployments
+
+    params = {"environment": DORA_ENVIRONMENT, "per_page": 100}
+    async for page in client.iter_recent(f"{repo_api(repo)}/deployments", since_iso=since, date_key="created_at", params=params):
+        deployments += [{"id": d["id"], "sha": d["sha"], "created_at": epoch(d["created_at"])} for d in page]
+    await asyncio.gather(*(deployment_status(client, repo, d) for d in deployments))
+    return deployments
+
+
+async def ingest_deployments(client, repo, history_start):
+    # Only deployments created after the cursor are fetched, and each one's
+    # commits come from comparing it with the previous deployment. While a
+    # deployment is still in progress the cursor is held just before it, so it
+    # and everything after it are fetched and compared again next run (saving
+    # is an upsert). Nothing is saved and the cursor stays put unless every
+    # page and comparison came back.
+    source = DORA_DEPLOY_SOURCE
+    if source == "auto":
+        source = "releases" if get_dora_cursor(repo, "releases") else "deployments"
+    cursor = get_dora_cursor(repo, source)
+    since = max(cursor, iso(history_start)) if cursor else iso(history_start)
+    try:
+        deployments = await fetch_new_deployments(client, repo, source, since)
+        if DORA_DEPLOY_SOURCE == "auto" and source == "deployments" and not deployments and not cursor:
+            source = "releases"
+            cursor = get_dora_cursor(repo, source)
+            deployments = await fetch_new_deployments(client, repo, source, since)
+        if not deployments:
+            return source, 0
+
+        deployments.sort(key=lambda d: d["created_at"])
+        previous = latest_dora_deployment(repo, deployments[0]["created_at"])
+        bases = [previous[1] if previous else None] + [d["sha"] for d in deployments[:-1]]
+        shipped = await asyncio.gather(*(shipped_commits(client, repo, base, d["sha"]) for base, d in zip(bases, deployments)))
+    except GitHubError as e:
+        print(f"⚠️ DORA {source} harvest for {repo} stopped early, cursor not advanced: {e}")
+        return source, 0
+    changes = [
+        (sha, d["id"], authored_at, d["deployed_at"])
+        for d, commits in zip(deployments, shipped) if d["deployed_at"]
+        for sha, authored_at in commits if authored_at
+    ]
+    save_dora_deployments(repo, deployments, changes)
+
+    # Held just before the oldest deployment still in progress, so it's re-read
+    pending = [d["created_at"] for d in deployments if d["deployed_at"] is None]
+    newest = min(pending) - 1 if pending else deployments[-1]["created_at"]
+    set_dora_cursor(repo, source, iso(datetime.fromtimestamp(newest, timezone.utc)))
+    return source, len(deployments)
+
+
+async def ingest_incidents(client, repo, history_start):
+    # Incident issues updated since the last harvest (open ones included, so
+    # MTTR picks them up when they close)
+    since = get_dora_cursor(repo, "incidents") or iso(history_start)
+    params = {"state": "all", "labels": DORA_INCIDENT_LABEL, "sort": "updated", "direction": "desc", "since": since, "per_page": 100}
+    fetched = 0
+    newest = None
+    try:
+        async for page in client.iter_recent(f"{repo_api(repo)}/issues", since_iso=since, date_key="updated_at", params=params):
+            save_dora_incidents(repo, [
+                {"number": i["number"], "created_at": epoch(i["created_at"]), "closed_at": epoch(i.get("closed_at"))}
+                for i in page if "pull_request" not in i
+            ])
+            fetched += len(page)
+            newest = max(newest or "", *(i["updated_at"] for i in page))
+    except GitHubError as e:
+        # Saved pages stay (saving is an upsert); the next run re-reads from the old cursor
+        print(f"⚠️ DORA incident harvest for {repo} stopped early, cursor not advanced: {e}")
+        return fetched
+    if newest:
+        set_dora_cursor(repo, "incidents", newest)
+    return fetched
+
+
+async def harvest_dora(client, repo):
+    history_start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(days=DORA_HISTORY_DAYS)
+    (source, deployments), incidents = await asyncio.gather(
+        ingest_deployments(client, repo, history_start),
+        ingest_incidents(client, repo, history_start)
+    )
+    prune_dora(repo, int(history_start.timestamp()))
+    return {"source": source, "deployments_fetched": deployments, "incidents_fetched": incidents}
+
+
+class DoraTimeline:
+    # Deployments, shipped commits and incidents as sorted epoch arrays. A
+    # report window is a bisect slice of each, and every incident is pinned to
+    # the deployment before it with one bisect, so any window inside the
+    # stored history is computed without another API call. Built from one
+    # repo's rows: an incident can only fail a deployment of its own repo.
+    # previous is the last deployment before the loaded history; incidents can
+    # be pinned to it, but it isn't kept or counted.
+    def __init__(self, deployments, changes, incidents, previous=None):
+        deployments = ([previous] if previous else []) + list(deployments)
+        self.deploy_times = [t for t, _ in deployments]
+        self.deploy_failed = [status != "success" for _, status in deployments]
+        self.change_times = [t for t, _ in changes]
+        self.lead_seconds = [lead for _, lead in changes]
+        self.incident_starts = [start for start, _ in incidents]
+        self.incident_ends = [end for _, end in incidents]
+
+        failure_window = DORA_FAILURE_WINDOW_HOURS * 3600
+        for start in self.incident_starts:
+            i = bisect_right(self.deploy_times, start) - 1
+            if i >= 0 and start - self.deploy_times[i] <= failure_window:
+                self.deploy_failed[i] = True
+        if previous:
+            del self.deploy_times[0], self.deploy_failed[0]
+
+    @classmethod
+    def merge(cls, timelines):
+        # Several repos on one timeline, failures already pinned per repo
+        merged = cls([], [], [])
+        deployments = sorted(
+            (pair for t in timelines for pair in zip(t.deploy_times, t.deploy_failed)), key=lambda d: d[0]
+        )
+        changes = sorted((pair for t in timelines for pair in zip(t.change_times, t.lead_seconds)), key=lambda c: c[0])
+        incidents = sorted(
+            (pair for t in timelines for pair in zip(t.incident_starts, t.incident_ends)), key=lambda i: i[0]
+        )
+        merged.deploy_times = [t for t, _ in deployments]
+        merged.deploy_failed = [failed for _, failed in deployments]
+        merged.change_times = [t for t, _ in changes]
+        merged.lead_seconds = [lead for _, lead in changes]
+        merged.incident_starts = [start for start, _ in incidents]
+        merged.incident_ends = [end for _, end in incidents]
+        return merged
+
+    def window(self, since, until):
+        lo, hi = bisect_left(self.deploy_times, since), bisect_left(self.deploy_times, until)
+        deployments = hi - lo
+        failed = sum(self.deploy_failed[lo:hi])
+        succeeded = sum(1 for f in self.deploy_failed[lo:hi] if not f)
+
+        lo, hi = bisect_left(self.change_times, since), bisect_left(self.change_times, until)
+        leads = self.lead_seconds[lo:hi]
+        lead_p50, lead_p90 = (np.percentile(leads, [50, 90]) / 3600).tolist() if leads else (None, None)
+
+        lo, hi = bisect_left(self.incident_starts, since), bisect_left(self.incident_starts, until)
+        ends = self.incident_ends[lo:hi]
+        recoveries = [end - start for start, end in zip(self.incident_starts[lo:hi], ends) if end]
+        weeks = (until - since) / (7 * 86400)
+        return {
+            "deployments": deployments,
+            "successful_deployments": succeeded,
+            "deploys_per_week": round(succeeded / weeks, 2) if weeks else 0.0,
+            "failed_deployments": failed,
+            "change_failure_rate": round(failed / deployments * 100, 1) if deployments else None,
+            "changes": len(leads),
+            "lead_time_hours": round(lead_p50, 2) if lead_p50 is not None else None,
+            "lead_time_p90_hours": round(lead_p90, 2) if lead_p90 is not None else None,
+            "incidents": len(ends),
+            "open_incidents": sum(1 for end in ends if end is None),
+            "mttr_hours": round(sum(recoveries) / len(recoveries) / 3600, 2) if recoveries else None
+        }
+
+
+def dora_timeline(repos, since=None):
+    if since is None:
+        since = int((datetime.now(timezone.utc) - timedelta(days=DORA_HISTORY_DAYS)).timestamp())
+    return DoraTimeline.merge([DoraTimeline(*load_dora_timeline(repo, since)) for repo in repos])
+
+
+def dora_metrics(repos, since, until=None):
+    # since/until: epoch seconds; until defaults to now
+    until = until or int(datetime.now(timezone.utc).timestamp())
+    return dora_timeline(repos, since).window(since, until)
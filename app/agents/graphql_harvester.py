@@ -0,0 +1,165 @@
+# === GraphQL harvest backend (HARVEST_BACKEND=graphql) ===
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+from app.agents.data_harvester import finish_from_rows, first_review
+from app.agents.ci_harvester import harvest_ci_runs
+from app.agents.dora import harvest_dora
+from app.agents.hotspots import FILES_PER_PAGE, fetch_pr_files, record_pr_files, prune_hotspots
+from app.utils.github_client import GitHubError
+from app.utils.identity import is_bot
+from app.db import get_watermark, set_watermark, save_pr_rows
+
+GRAPHQL_PAGE_SIZE = int(os.getenv("GRAPHQL_PAGE_SIZE", "50"))
+GRAPHQL_REVIEWS_PER_PR = 20  # enough to get past the author's own replies to the first real review
+
+# One page returns PR metadata, early reviews, churn totals and the first 100
+# changed files, replacing the /reviews and /files calls the REST backend
+# makes per PR. PRs with more files page the rest over REST.
+PR_WINDOW_QUERY = """
+query($owner: String!, $name: String!, $pageSize: Int!, $reviewsPerPr: Int!, $filesPerPr: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: $pageSize, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        state
+        createdAt
+        updatedAt
+        mergedAt
+        closedAt
+        additions
+        deletions
+        changedFiles
+        author { login __typename }
+        reviews(first: $reviewsPerPr) { nodes { submittedAt state author { login __typename } } }
+        files(first: $filesPerPr) { totalCount nodes { path additions deletions } }
+      }
+    }
+  }
+}
+"""
+
+
+async def iter_pr_nodes(client, repo, updated_since, page_stats):
+    # Yields one page of recently updated PR nodes at a time; a failed page
+    # raises GitHubError rather than ending the window early
+    owner, name = repo.split("/")
+    cursor = None
+    while True:
+        data = await client.graphql(PR_WINDOW_QUERY, {
+            "owner": owner, "name": name, "pageSize": GRAPHQL_PAGE_SIZE, "reviewsPerPr": GRAPHQL_REVIEWS_PER_PR,
+            "filesPerPr": FILES_PER_PAGE, "cursor": cursor
+        })
+        page_stats["pages"] += 1
+        connection = ((data or {}).get("repository") or {}).get("pullRequests")
+        if not connection:
+            raise GitHubError(f"GraphQL pullRequests page of {repo}")
+
+        # A PR that failed to resolve comes back as null alongside the rest
+        nodes = [n for n in connection["nodes"] if n]
+        recent = [n for n in nodes if n["updatedAt"] > updated_since]
+        if recent:
+            yield recent
+
+        if len(recent) < len(nodes) or not connection["pageInfo"]["hasNextPage"]:
+            break
+        cursor = connection["pageInfo"]["endCursor"]
+
+
+def node_first_review(node, author):
+    # Review nodes in the REST shape first_review() reads
+    return first_review([
+        {
+            "submitted_at": r.get("submittedAt"),
+            "state": r.get("state"),
+            "user": {"login": (r.get("author") or {}).get("login"), "type": (r.get("author") or {}).get("__typename")}
+        }
+        for r in (node.get("reviews") or {}).get("nodes") or []
+    ], author)
+
+
+def node_files(node):
+    # None when the PR has more files than the query returned
+    files = node.get("files") or {}
+    nodes = files.get("nodes") or []
+    if files.get("totalCount", 0) > len(nodes):
+        return None
+    return [(f["path"], f.get("additions", 0), f.get("deletions", 0)) for f in nodes]
+
+
+def node_row(node):
+    merged = bool(node.get("mergedAt"))
+    author = (node.get("author") or {}).get("login") or "Unknown"
+    first_review_at, first_reviewer = node_first_review(node, author)
+    return {
+        "number": node["number"],
+        "author": author,
+        "state": "open" if node.get("state") == "OPEN" else "closed",
+        "created_at": node["createdAt"],
+        "updated_at": node.get("updatedAt"),
+        "merged_at": node.get("mergedAt"),
+        "closed_at": node.get("closedAt"),
+        "first_review_at": first_review_at,
+        "first_reviewer": first_reviewer,
+        "additions": node.get("additions", 0) if merged else None,
+        "deletions": node.get("deletions", 0) if merged else None,
+        "files_changed": node.get("changedFiles", 0) if merged else None,
+        # GraphQL logins carry no [bot] suffix; __typename is the only sign
+        "author_is_bot": is_bot(author, (node.get("author") or {}).get("__typename")),
+        "files": node_files(node) if merged else []
+    }
+
+
+async def harvest_graphql(client, repo, days=7):
+    week_ago = (datetime.utcnow() - timedelta(days=days)).isoformat() + "Z"
+    watermark = get_watermark(repo)
+    updated_since = max(watermark, week_ago) if watermark else week_ago
+
+    # Rows are saved page by page, so only one page of nodes is held at a time
+    page_stats = {"pages": 0}
+    side_fetches = asyncio.gather(harvest_ci_runs(client, repo, days), harvest_dora(client, repo))
+    node_count = row_count = merged_count = file_fallbacks = 0
+    newest_update = None
+    complete = False
+    try:
+        async for nodes in iter_pr_nodes(client, repo, updated_since, page_stats):
+            rows = [node_row(n) for n in nodes if n["createdAt"] > week_ago]
+            truncated = [r for r in rows if r["files"] is None]
+            for row, files in zip(truncated, await asyncio.gather(*(fetch_pr_files(client, repo, r["number"]) for r in truncated))):
+                row["files"] = files
+            file_fallbacks += len(truncated)
+            save_pr_rows(repo, rows)
+            record_pr_files(repo, rows)
+            node_count += len(nodes)
+            row_count += len(rows)
+            merged_count += sum(1 for r in rows if r["merged_at"])
+            newest_update = max(newest_update or "", *(n["updatedAt"] for n in nodes))
+        complete = True
+    except GitHubError as e:
+        print(f"⚠️ PR harvest for {repo} stopped early, watermark not advanced: {e}")
+    except BaseException:
+        side_fetches.cancel()
+        raise
+    ci_stats, dora_ingest = await side_fetches
+    pages = page_stats["pages"]
+    if complete and newest_update:
+        set_watermark(repo, newest_update)
+    prune_hotspots(repo)
+
+    # The REST backend pages /pulls at 100/page, then makes 1 call per PR for
+    # its reviews and at least 1 per merged PR for its files
+    rest_pages = max(1, -(-node_count // 100))
+    rest_equivalent = rest_pages + row_count + merged_count
+
+    harvested = finish_from_rows(repo, week_ago, pages)
+    harvested.update({
+        "ci_failures": ci_stats["failures"],
+        "ci_stats": ci_stats,
+        "dora_ingest": dora_ingest,
+        "prs_refreshed": row_count,
+        "incremental": watermark is not None,
+        "api_calls_saved": max(rest_equivalent - pages - file_fallbacks, 0)
+    })
+    return harvested
@@ -0,0 +1,115 @@
+# === File-level churn and hotspot index ===
+import heapq
+import os
+from datetime import date, timedelta
+
+from app.agents.ci_harvester import repo_api
+from app.agents.review_analyst import week_start
+from app.utils.identity import canonical_author
+from app.db import record_file_churn, iter_file_churn, prune_file_churn
+
+HOTSPOT_WEEKS = int(os.getenv("HOTSPOT_WEEKS", "12"))  # weeks of stored churn a report looks at
+HOTSPOT_TOP_N = int(os.getenv("HOTSPOT_TOP_N", "5"))  # files and directories in the report
+HOTSPOT_DIR_DEPTH = int(os.getenv("HOTSPOT_DIR_DEPTH", "2"))  # path components that make a directory
+HOTSPOT_RETENTION_WEEKS = int(os.getenv("HOTSPOT_RETENTION_WEEKS", "52"))
+FILES_PER_PAGE = 100
+FILES_MAX_PAGES = 30  # /pulls/{n}/files lists at most 3000 files
+
+
+async def fetch_pr_files(client, repo, pr_number):
+    # Every page, not just the first 30 files: [(path, additions, deletions)]
+    files = await client.paginate(f"{repo_api(repo)}/pulls/{pr_number}/files", max_pages=FILES_MAX_PAGES,
+                                  params={"per_page": FILES_PER_PAGE}, immutable=True)
+    return [(f["filename"], f.get("additions", 0), f.get("deletions", 0)) for f in files]
+
+
+def record_pr_files(repo, rows):
+    # Rows that came with a file list (merged PRs fetched this harvest) go
+    # into the index under the week they merged; the list isn't kept on the row
+    record_file_churn(repo, [
+        (row["number"], row["author"], week_start(date.fromisoformat(row["merged_at"][:10])), row.pop("files"))
+        for row in rows if row.get("files") and row.get("merged_at")
+    ])
+
+
+def prune_hotspots(repo):
+    prune_file_churn(repo, week_start(date.today() - timedelta(weeks=HOTSPOT_RETENTION_WEEKS)))
+
+
+def directory_of(path, depth=HOTSPOT_DIR_DEPTH):
+    parts = path.split("/")[:-1]
+    return "/".join(parts[:depth]) + "/" if parts else "./"
+
+
+def ownership(authors):
+    # Share of the churn by its biggest contributor: 100% is a single owner
+    owner, churn = max(authors.items(), key=lambda item: item[1])
+    total = sum(authors.values())
+    return owner, round(churn / total * 100, 1) if total else 0.0
+
+
+def hotspot_index(repos, weeks=HOTSPOT_WEEKS, top_n=HOTSPOT_TOP_N):
+    # One pass over the stored churn, grouped per file. Only the top_n files
+    # by (PRs, churn) are held, in a min-heap; directories are summed as they
+    # go (far fewer of them than files) and ranked by churn at the end.
+    since_week = week_start(date.today() - timedelta(weeks=weeks - 1))
+    hot_files = []
+    directories = {}
+    total_churn = file_count = 0
+
+    def add_file(repo, path, authors, prs):
+        nonlocal total_churn, file_count
+        churn = sum(authors.values())
+        total_churn += churn
+        file_count += 1
+        entry = (prs, churn, repo, path)
+        if len(hot_files) < top_n:
+            heapq.heappush(hot_files, (entry, authors))
+        elif entry > hot_files[0][0]:
+            heapq.heapreplace(hot_files, (entry, authors))
+
+        directory = directories.setdefault((repo, directory_of(path)), {"churn": 0, "changes": 0, "files": 0, "authors": {}})
+        directory["churn"] += churn
+        directory["changes"] += prs
+        directory["files"] += 1
+        for author, lines in authors.items():
+            directory["authors"][author] = directory["authors"].get(author, 0) + lines
+
+    group, authors, prs = None, {}, 0
+    for repo, path, author, additions, deletions, author_prs in iter_file_churn(repos, since_week):
+        if (repo, path) != group:
+            if group:
+                add_file(*group, authors, prs)
+            group, authors, prs = (repo, path), {}, 0
+        # Logins are resolved here, not when stored, so map edits apply to past weeks
+        person = canonical_author(author)
+        authors[person] = authors.get(person, 0) + (additions or 0) + (deletions or 0)
+        prs += author_prs
+    if group:
+        add_file(*group, authors, prs)
+
+    many_repos = len(repos) > 1
+    files = []
+    for (prs, churn, repo, path), authors in sorted(hot_files, reverse=True):
+        owner, share = ownership(authors)
+        files.append({
+            "path": f"{repo}:{path}" if many_repos else path, "prs": prs, "churn": churn,
+            "authors": len(authors), "owner": owner, "owner_share": share
+        })
+    dirs = []
+    for (repo, path), d in heapq.nlargest(top_n, directories.items(), key=lambda item: item[1]["churn"]):
+        owner, share = ownership(d["authors"])
+        dirs.append({
+            "path": f"{repo}:{path}" if many_repos else path, "churn": d["churn"], "changes": d["changes"],
+            "files": d["files"], "authors": len(d["authors"]), "owner": owner, "owner_share": share
+        })
+    hot_churn = sum(f["churn"] for f in files)
+    return {
+        "weeks": weeks,
+        "files_tracked": file_count,
+        "total_churn": total_churn,
+        # How much of all churn the top files account for
+        "top_files_churn_share": round(hot_churn / total_churn * 100, 1) if total_churn else 0.0,
+        "files": files,
+        "directories": dirs
+    }
@@ -1,14 +1,31 @@
 import datetime
-import json
+import hashlib
 from app.utils.llm import generate_summary_via_llm
-from app.db import save_report_to_db
+from app.utils.audit_log import get_audit_log
+from app.utils.metrics import report_metrics
+from app.db import save_report_to_db, save_llm_summary, week_over_week
+from app.agents.ci_harvester import top_workflows
 
-def log_summary(summary: str):
-    with open("audit_log.jsonl", "a") as log_file:
-        log_file.write(json.dumps({
-            "timestamp": datetime.datetime.now().isoformat(),
-            "summary": summary
-        }) + "\n")
+def log_summary(state, summary: str):
+    # Structured audit record; the full summary text lives in dev_reports
+    # (looked up by run_id), so only its hash and size are logged here
+    harvest_stats = state.get("harvest_stats", {})
+    pr_metrics = state.get("pr_metrics", {})
+    get_audit_log().write({
+        "timestamp": datetime.datetime.now().isoformat(),
+        "run_id": state.get("report_id"),
+        "repos": state.get("repos", []),
+        "window": state.get("window"),
+        "stage_metrics": state.get("stage_metrics", {}),
+        "api_calls": harvest_stats.get("api_calls"),
+        "api_retries": harvest_stats.get("api_retries"),
+        "api_calls_saved": harvest_stats.get("api_calls_saved"),
+        "total_prs": pr_metrics.get("total_prs", 0),
+        "merged_prs": pr_metrics.get("merged_prs", 0),
+        "churn_outliers": len(state.get("churn_outliers", [])),
+        "summary_sha1": hashlib.sha1(summary.encode()).hexdigest(),
+        "summary_chars": len(summary)
+    })
 
 
 def generate_narrative(insight_data):
@@ -46,6 +63,23 @@ def generate_narrative(insight_data):
     )
 
 
+def team_lines(per_author):
+    # Contributions summed per team (identity map); empty when no author has one
+    teams = {}
+    for stats in per_author.values():
+        if stats.get("team"):
+            sums = teams.setdefault(stats["team"], {"additions": 0, "deletions": 0, "authors": 0})
+            sums["additions"] += stats["additions"]
+            sums["deletions"] += stats["deletions"]
+            sums["authors"] += 1
+    if not teams:
+        return []
+    ranked = sorted(teams.items(), key=lambda item: item[1]["additions"] + item[1]["deletions"], reverse=True)
+    return ["• Per-Team Contributions:"] + [
+        f"    • {team}: +{t['additions']} / -{t['deletions']} ({t['authors']} author(s))" for team, t in ranked
+    ]
+
+
 def insight_narrator_agent(state):
     additions = state.get('total_additions') or sum(e['additions'] for e in state.get('events', []))
     deletions = state.get('total_deletions') or sum(e['deletions'] for e in state.get('events', []))
@@ -53,8 +87,12 @@ def insight_narrator_agent(state):
     review_latency = state.get("review_latency", {})
     cycle_time = state.get("cycle_time", {})
     ci_failures = state.get("ci_failures", 0)
+    ci_stats = state.get("ci_stats") or {}
+    review_percentiles = state.get("review_percentiles") or {}
+    latency = review_percentiles.get("overall") or {}
     per_author = state.get("per_author_diff", {})
     churn_outliers = state.get("churn_outliers", [])
+    hotspots = state.get("hotspots") or {}
 
     print("👉 per_author inside insight_narrator_agent:", per_author)
 
@@ -81,10 +119,29 @@ def insight_narrator_agent(state):
     mttr = state.get("mttr_hours", None)
     mttr_display = f"{mttr:.2f} hrs" if mttr is not None else "N/A"
 
+    # From deployments and incidents when the repos have them; otherwise the
+    # PR and CI proxies, labelled as such
+    dora = state.get("dora") or {}
+    if dora.get("lead_time_hours") is not None:
+        lead_time = f"{dora['lead_time_hours']} hrs median, p90 {dora['lead_time_p90_hours']} hrs (commit → deploy)"
+    else:
+        lead_time = f"{cycle_time.get('avg_cycle_time_hours', 0)} hrs (PR cycle time)"
+    if dora.get("deployments"):
+        deploy_frequency = f"{dora['deploys_per_week']} deploys/week"
+        change_failure_rate = f"{dora['change_failure_rate']}% ({dora['failed_deployments']}/{dora['deployments']} deploys)"
+    else:
+        deploy_frequency = f"{merged_prs} merged PRs/week (no deployments found)"
+        change_failure_rate = (
+            f"{ci_stats['default_branch_failure_rate']}% (default-branch CI runs)"
+            if ci_stats.get("default_branch_failure_rate") is not None else "N/A"
+        )
+    if dora.get("open_incidents"):
+        mttr_display += f", {dora['open_incidents']} incident(s) still open"
+
     dora_metrics = {
-        "Lead Time for Changes": f"{cycle_time.get('avg_cycle_time_hours', 0)} hrs",
-        "Deployment Frequency": f"{merged_prs} PRs/week",
-        "Change Failure Rate": f"{round((ci_failures / max(total_prs, 1)) * 100, 2)}%",
+        "Lead Time for Changes": lead_time,
+        "Deployment Frequency": deploy_frequency,
+        "Change Failure Rate": change_failure_rate,
         "Mean Time to Recovery": mttr_display
     }
 
@@ -95,17 +152,71 @@ def insight_narrator_agent(state):
         f"• PR Throughput: {throughput}%",
         f"• Total PRs: {total_prs}",
         f"• Merged PRs: {merged_prs}",
-        f"• Avg. Review Latency: {review_latency.get('avg_review_latency_hours', 0)} hrs",
+        f"• Avg. Review Latency: {review_latency.get('avg_review_latency_hours', 0)} hrs" + (
+            f" (p50 {latency['p50']} / p90 {latency['p90']} / p99 {latency['p99']} hrs)"
+            if latency.get("count") else ""
+        ),
         f"• Avg. Cycle Time: {cycle_time.get('avg_cycle_time_hours', 0)} hrs",
-        f"• CI Failures: {ci_failures}",
+        f"• CI Failures: {ci_failures}" + (
+            f" ({ci_stats['failure_rate']}% of {ci_stats['runs']} runs, {ci_stats['flaky_reruns']} flaky reruns)" if ci_stats.get("runs") else ""
+        ),
         f"• Per-Author Contributions:\n{author_lines}",
+    ] + team_lines(per_author) + [
         f"\n• 🚀 *DORA Metrics:*"
     ] + [f"    • {key}: {val}" for key, val in dora_metrics.items()]
 
+    # Deltas against last week's rollup (no re-harvest needed)
+    deltas = week_over_week({
+        "avg_review_latency": review_latency.get("avg_review_latency_hours", 0),
+        "avg_cycle_time": cycle_time.get("avg_cycle_time_hours", 0),
+        "merged_prs": merged_prs,
+        "churn": additions + deletions,
+        "ci_failures": ci_failures
+    }, state.get("repos", []))
+    if deltas:
+        labels = {
+            "avg_review_latency": "Review Latency",
+            "avg_cycle_time": "Cycle Time",
+            "merged_prs": "Merged PRs",
+            "churn": "Code Churn",
+            "ci_failures": "CI Failures"
+        }
+        summary_lines.append("\n• 📈 *Week over Week:*")
+        summary_lines += [
+            f"    • {labels[metric]}: {d['current']} vs {d['previous']} "
+            f"({'▲' if d['change_percent'] >= 0 else '▼'} {abs(d['change_percent'])}%)"
+            for metric, d in deltas.items()
+        ]
+
     if total_prs == 0:
         summary_lines.append("⚠️ No pull requests opened this week.")
     if ci_failures > 3:
         summary_lines.append("❗ High number of CI failures detected.")
+    repo_results = state.get("repo_results", {})
+    if len(repo_results) > 1:
+        summary_lines.append("\n• 📦 *Per-Repository:*")
+        summary_lines += [
+            f"    • {repo}: {r['merged_prs']}/{r['total_prs']} PRs merged, {r['ci_failures']} CI failures"
+            for repo, r in sorted(repo_results.items(), key=lambda item: item[1]["total_prs"], reverse=True)
+        ]
+    workflows = top_workflows(ci_stats)
+    if workflows:
+        summary_lines.append("\n• ⚙️ *CI by Workflow:*")
+        summary_lines += [
+            f"    • {w['repo'] + ' ' if len(repo_results) > 1 else ''}{w['workflow']} @ {w['branch'] or '?'}: "
+            f"{w['failure_rate']}% failed ({w['failures']}/{w['runs']}), "
+            f"p50 {w['p50_minutes']} / p90 {w['p90_minutes']} min, {w['flaky_reruns']} flaky"
+            for w in workflows
+        ]
+    for scope, label in [("teams", "Team"), ("reviewers", "First Reviewer")]:
+        rows = review_percentiles.get(scope) or {}
+        # A lone "unassigned" team (no identity map or TEAM_MEMBERS) says nothing new
+        if len(rows) > 1 or (scope == "reviewers" and rows):
+            summary_lines.append(f"\n• ⏱️ *Review Latency by {label}:*")
+            summary_lines += [
+                f"    • {key}: p50 {p['p50']} / p90 {p['p90']} / p99 {p['p99']} hrs ({p['count']} PRs)"
+                for key, p in rows.items()
+            ]
     if churn_outliers:
         churn_summary = "\n• 🔥 *Churn Outliers:*"
         churn_summary += "\n" + "\n".join(
@@ -115,20 +226,41 @@ def insight_narrator_agent(state):
             ]
         )
         summary_lines.append(churn_summary)
+    if hotspots.get("files"):
+        summary_lines.append(
+            f"\n• 🗺️ *Hotspots (last {hotspots['weeks']} weeks):* top {len(hotspots['files'])} of "
+            f"{hotspots['files_tracked']} files hold {hotspots['top_files_churn_share']}% of churn"
+        )
+        summary_lines += [
+            f"    • {f['path']}: {f['prs']} PRs, {f['churn']} lines, {f['authors']} author(s), {f['owner_share']}% by {f['owner']}"
+            for f in hotspots["files"]
+        ]
+        summary_lines += [
+            f"    • 📁 {d['path']}: {d['churn']} lines over {d['files']} files, {d['owner_share']}% by {d['owner']}"
+            for d in hotspots["directories"]
+        ]
 
 
 
     structured_summary = "\n".join(summary_lines)
 
-    # LLM + fallback narrative
+    # The deterministic narrative ships with the report; the LLM version is
+    # produced afterwards (llm_followup) so a slow model never holds it up
     llm_input_metrics = {
         "additions": additions,
         "deletions": deletions,
         "total_prs": total_prs,
         "merged_prs": merged_prs,
         "review_latency": review_latency.get("avg_review_latency_hours", 0),
+        "review_latency_p50": latency.get("p50"),
+        "review_latency_p90": latency.get("p90"),
         "cycle_time": cycle_time.get("avg_cycle_time_hours", 0),
         "ci_failures": ci_failures,
+        "ci_failure_rate": ci_stats.get("failure_rate"),
+        "ci_flaky_reruns": ci_stats.get("flaky_reruns"),
+        "deploys_per_week": dora.get("deploys_per_week"),
+        "change_failure_rate": dora.get("change_failure_rate"),
+        "lead_time_hours": dora.get("lead_time_hours"),
         "per_author": [
             {
                 "author": a,
@@ -138,17 +270,32 @@ def insight_narrator_agent(state):
             }
             for a, d in per_author.items()
         ],
-        "churn_outliers": churn_outliers
+        "churn_outliers": churn_outliers,
+        "hotspots": hotspots.get("files", []),
+        "week_over_week_percent": {metric: d["change_percent"] for metric, d in deltas.items()}
     }
 
-    narrative = generate_summary_via_llm(llm_input_metrics) or generate_narrative(state)
+    narrative = generate_narrative(state)
     final_summary = f"{narrative}\n\n{structured_summary}"
 
     print("\n=== Weekly Dev Report Summary ===\n")
     print(final_summary)
 
-    log_summary(final_summary)
     state["summary"] = final_summary
+    state["llm_metrics"] = llm_input_metrics
+    state["report_metrics"] = report_metrics(state)
     save_report_to_db(state)
+    log_summary(state, final_summary)
 
     return state
+
+
+def llm_followup(state):
+    # LLM narrative for a finished report, or None if the model is slow or down
+    metrics = state.get("llm_metrics")
+    if not metrics:
+        return None
+    text = generate_summary_via_llm(metrics)
+    if text and state.get("report_id"):
+        save_llm_summary(state["report_id"], text)
+    return text
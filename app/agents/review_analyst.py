@@ -0,0 +1,111 @@
+# === review_analyst_agent ===
+import os
+from datetime import date, datetime, timedelta
+
+from app.utils.sketch import DDSketch, merge_sketches
+from app.utils.identity import canonical_author, team_of
+from app.db import iter_pr_rows, save_review_sketches, load_review_sketches
+
+REVIEW_REPORT_TOP_N = int(os.getenv("REVIEW_REPORT_TOP_N", "5"))  # teams/reviewers shown in the report
+UNASSIGNED_TEAM = "unassigned"
+SCOPES = ("repo", "team", "reviewer")
+
+
+def week_start(day):
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+class LatencySketches:
+    # One DDSketch per (scope, key): the repo, the PR author's team, and the
+    # first reviewer (canonical identity). Hours to first non-author review
+    # go into all three.
+    def __init__(self):
+        self.sketches = {scope: {} for scope in SCOPES}
+
+    def add(self, repo, author, reviewer, hours):
+        for scope, key in (("repo", repo), ("team", team_of(author) or UNASSIGNED_TEAM),
+                           ("reviewer", canonical_author(reviewer))):
+            self.sketches[scope].setdefault(key, DDSketch()).add(hours)
+
+    def merge(self, other):
+        for scope, sketches in other.sketches.items():
+            for key, sketch in sketches.items():
+                self.sketches[scope].setdefault(key, DDSketch()).merge(sketch)
+        return self
+
+    def rows(self):
+        return [
+            (scope, key, len(sketch), sketch.to_json())
+            for scope, sketches in self.sketches.items() for key, sketch in sketches.items()
+        ]
+
+    def summary(self, top_n=REVIEW_REPORT_TOP_N):
+        # Percentiles over everything added, plus per repo and the busiest teams/reviewers
+        def top(scope):
+            ranked = sorted(self.sketches[scope].items(), key=lambda item: len(item[1]), reverse=True)[:top_n]
+            return {key: sketch.summary() for key, sketch in ranked}
+        return {
+            "overall": merge_sketches(self.sketches["repo"].values()).summary(),
+            "repos": {key: sketch.summary() for key, sketch in self.sketches["repo"].items()},
+            "teams": top("team"),
+            "reviewers": top("reviewer")
+        }
+
+
+def build_repo_sketches(repo, since_iso):
+    # One pass over the repo's stored PRs from the Monday before the window:
+    # every week the window touches is rebuilt whole (so the stored sketch is
+    # the same however many reports ran that week), and the window's own
+    # sketches come out of the same pass
+    since = parse_ts(since_iso)
+    first_week = date.fromisoformat(week_start(since.date()))
+    weeks = {}
+    window = LatencySketches()
+    for row in iter_pr_rows(repo, f"{first_week.isoformat()}T00:00:00"):
+        created, reviewed = parse_ts(row["created_at"]), parse_ts(row["first_review_at"])
+        if not reviewed:
+            continue
+        hours = (reviewed - created).total_seconds() / 3600
+        reviewer = row["first_reviewer"] or "unknown"
+        weeks.setdefault(week_start(created.date()), LatencySketches()).add(repo, row["author"], reviewer, hours)
+        if created > since:
+            window.add(repo, row["author"], reviewer, hours)
+
+    week = first_week
+    while week <= datetime.utcnow().date():
+        sketches = weeks.get(week.isoformat())
+        save_review_sketches(repo, week.isoformat(), sketches.rows() if sketches else [])
+        week += timedelta(days=7)
+    return window
+
+
+def latency_percentiles(scope, since, until, repos=None, key=None):
+    # Percentiles for the stored weeks from since's Monday through until
+    # (dates), merged from the weekly sketches alone:
+    # {key: {"count", "mean", "p50", "p90", "p99"}}. For scope "repo", "*" is
+    # every repo merged: the whole org when no repos are given.
+    merged = {}
+    for _, row_key, _, sketch in load_review_sketches(scope, week_start(since), until.isoformat(), repos, key):
+        merged.setdefault(row_key, DDSketch()).merge(DDSketch.from_json(sketch))
+    if scope == "repo" and merged:
+        merged["*"] = merge_sketches(merged.values())
+    return {k: sketch.summary() for k, sketch in sorted(merged.items())}
+
+
+def review_analyst_agent(state):
+    # Seed/replay runs have no stored PR window to read
+    window = state.get("window") or {}
+    if not window.get("since"):
+        return state
+
+    sketches = LatencySketches()
+    for repo in state.get("repos", []):
+        sketches.merge(build_repo_sketches(repo, window["since"]))
+    state["review_percentiles"] = sketches.summary()
+    overall = state["review_percentiles"]["overall"]
+    print(f"⏱️ Review latency p50/p90/p99: {overall['p50']}/{overall['p90']}/{overall['p99']} hrs over {overall['count']} PRs")
+    return state
@@ -1,10 +1,38 @@
+import ast
+import base64
+import json
 import sqlite3
-from datetime import datetime
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
 
 DB_PATH = "weekly_reports.db"
+SCHEMA_VERSION = 12
+# Reports saved before multi-repo support have no repos; they were all of this one
+LEGACY_REPOS = "microsoft/vscode"
+
+_local = threading.local()
+
+
+def get_connection():
+    # One connection per thread, reused across calls. WAL lets slash-command
+    # readers and the report writer work concurrently; busy_timeout makes
+    # writers wait for the lock instead of raising "database is locked".
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
+
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS dev_reports (
@@ -22,37 +50,978 @@ def init_db():
         summary TEXT
     )
     """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS harvest_watermarks (
+        repo TEXT PRIMARY KEY,
+        updated_since TEXT,
+        last_run_at TEXT
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS pr_rows (
+        repo TEXT,
+        number INTEGER,
+        author TEXT,
+        state TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        merged_at TEXT,
+        closed_at TEXT,
+        first_review_at TEXT,
+        first_reviewer TEXT,
+        additions INTEGER,
+        deletions INTEGER,
+        files_changed INTEGER,
+        author_is_bot INTEGER,
+        PRIMARY KEY (repo, number)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pr_rows_created ON pr_rows (repo, created_at)")
+
+    # Normalized report detail; dev_reports keeps the report-level totals
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_authors (
+        report_id INTEGER REFERENCES dev_reports(id),
+        author TEXT,
+        additions INTEGER,
+        deletions INTEGER,
+        files_touched INTEGER,
+        team TEXT,
+        PRIMARY KEY (report_id, author)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_events (
+        report_id INTEGER REFERENCES dev_reports(id),
+        repo TEXT,
+        pr_number INTEGER,
+        author TEXT,
+        additions INTEGER,
+        deletions INTEGER,
+        files_changed INTEGER
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_churn_outliers (
+        report_id INTEGER REFERENCES dev_reports(id),
+        pr_id TEXT,
+        author TEXT,
+        additions INTEGER,
+        deletions INTEGER,
+        files_changed INTEGER,
+        lines_changed INTEGER,
+        z_score REAL
+    )
+    """)
+    # Weekly/monthly aggregates per repo set and per author. Columns hold sums
+    # over the reports saved in the period; averages are sum / reports.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_rollups (
+        scope TEXT,
+        key TEXT,
+        period TEXT,
+        period_start TEXT,
+        reports INTEGER DEFAULT 0,
+        total_prs INTEGER DEFAULT 0,
+        merged_prs INTEGER DEFAULT 0,
+        additions INTEGER DEFAULT 0,
+        deletions INTEGER DEFAULT 0,
+        files_touched INTEGER DEFAULT 0,
+        ci_failures INTEGER DEFAULT 0,
+        review_latency_sum REAL DEFAULT 0,
+        cycle_time_sum REAL DEFAULT 0,
+        PRIMARY KEY (scope, key, period, period_start)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_jobs (
+        id TEXT PRIMARY KEY,
+        dedupe_key TEXT,
+        status TEXT,
+        progress TEXT,
+        channel_id TEXT,
+        report_key TEXT,
+        error TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_jobs_dedupe ON report_jobs (dedupe_key, status)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_cache (
+        cache_key TEXT PRIMARY KEY,
+        report_key TEXT,
+        summary TEXT,
+        chart BLOB,
+        created_at REAL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS report_schedule_runs (
+        schedule_id TEXT PRIMARY KEY,
+        last_run_at TEXT
+    )
+    """)
+    # Workflow runs, one narrow row each (epoch seconds, no raw JSON), kept
+    # across reports so each harvest only fetches runs newer than ci_cursors
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ci_runs (
+        repo TEXT,
+        id INTEGER,
+        workflow TEXT,
+        branch TEXT,
+        conclusion TEXT,
+        run_attempt INTEGER,
+        created_at INTEGER,
+        duration_seconds INTEGER,
+        PRIMARY KEY (repo, id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ci_runs_created ON ci_runs (repo, created_at)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ci_cursors (
+        repo TEXT PRIMARY KEY,
+        created_since TEXT,
+        last_run_at TEXT
+    )
+    """)
+    # DORA inputs: production deployments (or releases), the commits each one
+    # shipped, and incident issues. Kept for DORA_HISTORY_DAYS so any window
+    # in that range is computed without re-fetching.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS dora_deployments (
+        repo TEXT,
+        id INTEGER,
+        sha TEXT,
+        created_at INTEGER,
+        deployed_at INTEGER,
+        status TEXT,
+        PRIMARY KEY (repo, id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS dora_changes (
+        repo TEXT,
+        sha TEXT,
+        deployment_id INTEGER,
+        committed_at INTEGER,
+        deployed_at INTEGER,
+        PRIMARY KEY (repo, sha)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS dora_incidents (
+        repo TEXT,
+        number INTEGER,
+        created_at INTEGER,
+        closed_at INTEGER,
+        PRIMARY KEY (repo, number)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS dora_cursors (
+        repo TEXT,
+        source TEXT,
+        cursor TEXT,
+        last_run_at TEXT,
+        PRIMARY KEY (repo, source)
+    )
+    """)
+    # Review latency (hours to the first non-author review) as DDSketch JSON,
+    # per repo and week of PR creation; scope "repo" (key = the repo), "team"
+    # (the PR author's) or "reviewer". Months and org-wide percentiles merge rows.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS review_latency_sketches (
+        repo TEXT,
+        scope TEXT,
+        key TEXT,
+        week_start TEXT,
+        count INTEGER,
+        sketch TEXT,
+        PRIMARY KEY (repo, scope, key, week_start)
+    ) WITHOUT ROWID
+    """)
+    # Line churn per file, author and week of merge, added to once per merged
+    # PR (file_churn_prs records which PRs are in), so hotspots over any span
+    # of stored weeks need no re-fetching
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS file_churn (
+        repo TEXT,
+        week_start TEXT,
+        path TEXT,
+        author TEXT,
+        additions INTEGER,
+        deletions INTEGER,
+        prs INTEGER,
+        PRIMARY KEY (repo, week_start, path, author)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_churn_path ON file_churn (repo, path)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS file_churn_prs (
+        repo TEXT,
+        number INTEGER,
+        week_start TEXT,
+        PRIMARY KEY (repo, number)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        prompt_hash TEXT PRIMARY KEY,
+        model TEXT,
+        response TEXT,
+        created_at REAL
+    )
+    """)
+    conn.commit()
+    migrate_db(conn)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dev_reports_timestamp ON dev_reports (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dev_reports_repos ON dev_reports (repos, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_authors_author ON report_authors (author, report_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_events_report ON report_events (report_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_events_repo ON report_events (repo, report_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_events_author ON report_events (author, report_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_churn_outliers_report ON report_churn_outliers (report_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_churn_outliers_author ON report_churn_outliers (author, report_id)")
     conn.commit()
-    conn.close()
 
-def save_report_to_db(state):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
 
+def migrate_db(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    if version < 1:
+        # v1: dev_reports gains a repos column, and the stringified per_author
+        # dicts of older reports are backfilled into report_authors
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(dev_reports)")}
+        if "repos" not in columns:
+            conn.execute("ALTER TABLE dev_reports ADD COLUMN repos TEXT")
+
+        backfilled = 0
+        for report_id, per_author in conn.execute("SELECT id, per_author FROM dev_reports WHERE per_author IS NOT NULL").fetchall():
+            try:
+                authors = ast.literal_eval(per_author)
+            except (ValueError, SyntaxError):
+                continue
+            conn.executemany("""
+                INSERT OR IGNORE INTO report_authors (report_id, author, additions, deletions, files_touched)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (report_id, author, stats.get("additions", 0), stats.get("deletions", 0), stats.get("files_touched"))
+                for author, stats in authors.items()
+            ])
+            backfilled += 1
+        print(f"🗃️ Migrated weekly_reports schema to v1, backfilled {backfilled} report(s).")
+
+    if version < 2:
+        # v2: report_key makes saves idempotent (upsert per pipeline run)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(dev_reports)")}
+        if "report_key" not in columns:
+            conn.execute("ALTER TABLE dev_reports ADD COLUMN report_key TEXT")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dev_reports_key ON dev_reports (report_key)")
+
+    if version < 5:
+        # v5: MTTR is stored per report and rolled up, and cached reports keep
+        # their extra charts. Runs before the v3 rebuild, which reads these columns.
+        for table, column, decl in [
+            ("dev_reports", "mttr_hours", "REAL"),
+            ("report_rollups", "mttr_sum", "REAL DEFAULT 0"),
+            ("report_rollups", "mttr_reports", "INTEGER DEFAULT 0"),
+            ("report_cache", "extra_charts", "TEXT"),
+        ]:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    if version < 9:
+        # v9: report authors carry their team (identity map) for team rollups.
+        # Runs before the v3 rebuild, which reads it.
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(report_authors)")}
+        if "team" not in columns:
+            conn.execute("ALTER TABLE report_authors ADD COLUMN team TEXT")
+
+    legacy = 0
+    if version < 12:
+        # v12: reports saved before the repos column only ever covered the
+        # repo the old code harvested. Left NULL they roll up under an empty
+        # key that no trend query asks for. Runs before the v3 rebuild, which
+        # reads it; databases past v3 are rebuilt when any row was filled in.
+        legacy = conn.execute(
+            "UPDATE dev_reports SET repos = ? WHERE repos IS NULL OR repos = ''", (LEGACY_REPOS,)
+        ).rowcount
+
+    if version < 3 or legacy:
+        # v3: build rollups for every report saved before they existed
+        conn.execute("DELETE FROM report_rollups")
+        report_ids = [row[0] for row in conn.execute("SELECT id FROM dev_reports")]
+        for report_id in report_ids:
+            apply_report_rollups(conn, report_id, 1)
+        print(f"🗃️ Built rollups for {len(report_ids)} existing report(s).")
+
+    if version < 4:
+        # v4: cached reports carry their own expiry (scheduled builds live longer)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(report_cache)")}
+        if "expires_at" not in columns:
+            conn.execute("ALTER TABLE report_cache ADD COLUMN expires_at REAL")
+
+    if version < 6:
+        # v6: the LLM narrative arrives after the report and is stored separately
+        for table, column in [("dev_reports", "llm_summary"), ("report_cache", "followup")]:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+    if version < 7:
+        # v7: per-report instrumentation (stage timings, GitHub calls, render time)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(dev_reports)")}
+        if "metrics" not in columns:
+            conn.execute("ALTER TABLE dev_reports ADD COLUMN metrics TEXT")
+
+    if version < 8:
+        # v8: first_review_at was the first review or comment of any kind,
+        # including the author's own. It's cleared along with the watermarks so
+        # the next harvest re-reads each window PR's first non-author review.
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(pr_rows)")}
+        if "first_reviewer" not in columns:
+            conn.execute("ALTER TABLE pr_rows ADD COLUMN first_reviewer TEXT")
+        conn.execute("UPDATE pr_rows SET first_review_at = NULL WHERE first_reviewer IS NULL")
+        conn.execute("DELETE FROM harvest_watermarks")
+
+    if version < 10:
+        # v10: whether the PR author is a bot (GitHub's user type) is stored
+        # with the row instead of remembered per process. Watermarks are
+        # cleared so the next harvest fills it in for the window's PRs.
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(pr_rows)")}
+        if "author_is_bot" not in columns:
+            conn.execute("ALTER TABLE pr_rows ADD COLUMN author_is_bot INTEGER")
+        conn.execute("DELETE FROM harvest_watermarks")
+
+    if version < 11:
+        # v11: cached reports remember whether there was anything to plot, so a
+        # cache hit for a quiet week isn't shown as a failed chart. Older
+        # entries can't tell, and are dropped (they're rebuilt on demand).
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(report_cache)")}
+        if "has_contributions" not in columns:
+            conn.execute("ALTER TABLE report_cache ADD COLUMN has_contributions INTEGER")
+        conn.execute("DELETE FROM report_cache")
+
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+PR_ROW_FIELDS = [
+    "number", "author", "state", "created_at", "updated_at", "merged_at",
+    "closed_at", "first_review_at", "first_reviewer", "additions", "deletions", "files_changed", "author_is_bot"
+]
+
+
+def get_watermark(repo):
+    row = get_connection().execute("SELECT updated_since FROM harvest_watermarks WHERE repo = ?", (repo,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(repo, updated_since):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO harvest_watermarks (repo, updated_since, last_run_at) VALUES (?, ?, ?)
+            ON CONFLICT(repo) DO UPDATE SET updated_since = excluded.updated_since, last_run_at = excluded.last_run_at
+        """, (repo, updated_since, datetime.now().isoformat()))
+
+
+def save_pr_rows(repo, rows):
+    with get_connection() as conn:
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO pr_rows (repo, {", ".join(PR_ROW_FIELDS)})
+            VALUES (?, {", ".join("?" for _ in PR_ROW_FIELDS)})
+        """, [(repo, *(row.get(f) for f in PR_ROW_FIELDS)) for row in rows])
+
+
+def iter_pr_rows(repo, created_since, batch_size=1000):
+    # Streams the window from the cursor in batches instead of fetchall()
+    cursor = get_connection().execute(
+        f"SELECT {', '.join(PR_ROW_FIELDS)} FROM pr_rows WHERE repo = ? AND created_at > ? ORDER BY created_at DESC",
+        (repo, created_since)
+    )
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        for values in batch:
+            yield dict(zip(PR_ROW_FIELDS, values))
+
+
+def load_pr_rows(repo, created_since):
+    return list(iter_pr_rows(repo, created_since))
+
+
+def get_pr_rows(repo, numbers):
+    # Stored rows for one page of PRs, keyed by number
+    if not numbers:
+        return {}
+    cursor = get_connection().execute(
+        f"SELECT {', '.join(PR_ROW_FIELDS)} FROM pr_rows WHERE repo = ? AND number IN ({', '.join('?' for _ in numbers)})",
+        (repo, *numbers)
+    )
+    return {values[0]: dict(zip(PR_ROW_FIELDS, values)) for values in cursor.fetchall()}
+
+CI_RUN_FIELDS = ["id", "workflow", "branch", "conclusion", "run_attempt", "created_at", "duration_seconds"]
+
+
+def get_ci_cursor(repo):
+    row = get_connection().execute("SELECT created_since FROM ci_cursors WHERE repo = ?", (repo,)).fetchone()
+    return row[0] if row else None
+
+
+def set_ci_cursor(repo, created_since):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO ci_cursors (repo, created_since, last_run_at) VALUES (?, ?, ?)
+            ON CONFLICT(repo) DO UPDATE SET created_since = excluded.created_since, last_run_at = excluded.last_run_at
+        """, (repo, created_since, datetime.now().isoformat()))
+
+
+def save_ci_runs(repo, rows):
+    with get_connection() as conn:
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO ci_runs (repo, {", ".join(CI_RUN_FIELDS)})
+            VALUES (?, {", ".join("?" for _ in CI_RUN_FIELDS)})
+        """, [(repo, *(row.get(f) for f in CI_RUN_FIELDS)) for row in rows])
+
+
+def prune_ci_runs(repo, created_before):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM ci_runs WHERE repo = ? AND created_at < ?", (repo, created_before))
+
+
+def iter_ci_runs(repo, created_since, batch_size=1000):
+    # Completed runs in the window, grouped by workflow and branch
+    cursor = get_connection().execute("""
+        SELECT workflow, branch, conclusion, run_attempt, duration_seconds FROM ci_runs
+        WHERE repo = ? AND created_at >= ? AND conclusion IS NOT NULL
+        ORDER BY workflow, branch
+    """, (repo, created_since))
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield from batch
+
+
+def get_dora_cursor(repo, source):
+    row = get_connection().execute("SELECT cursor FROM dora_cursors WHERE repo = ? AND source = ?", (repo, source)).fetchone()
+    return row[0] if row else None
+
+
+def set_dora_cursor(repo, source, value):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO dora_cursors (repo, source, cursor, last_run_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(repo, source) DO UPDATE SET cursor = excluded.cursor, last_run_at = excluded.last_run_at
+        """, (repo, source, value, datetime.now().isoformat()))
+
+
+def save_dora_deployments(repo, deployments, changes):
+    # changes: (sha, deployment_id, committed_at, deployed_at); a commit keeps
+    # the first deployment that shipped it
+    with get_connection() as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO dora_deployments (repo, id, sha, created_at, deployed_at, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(repo, d["id"], d["sha"], d["created_at"], d["deployed_at"], d["status"]) for d in deployments])
+        conn.executemany("""
+            INSERT OR IGNORE INTO dora_changes (repo, sha, deployment_id, committed_at, deployed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(repo, *change) for change in changes])
+
+
+def save_dora_incidents(repo, incidents):
+    with get_connection() as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO dora_incidents (repo, number, created_at, closed_at) VALUES (?, ?, ?, ?)
+        """, [(repo, i["number"], i["created_at"], i["closed_at"]) for i in incidents])
+
+
+def latest_dora_deployment(repo, before):
+    # Newest stored deployment created before `before` (epoch): the base of the next compare
+    return get_connection().execute(
+        "SELECT id, sha, created_at FROM dora_deployments WHERE repo = ? AND created_at < ? ORDER BY created_at DESC LIMIT 1",
+        (repo, before)
+    ).fetchone()
+
+
+def load_dora_timeline(repo, since):
+    # Sorted rows of one repo for DoraTimeline, plus the last deployment
+    # before since (or None) for pinning incidents early in the window
+    conn = get_connection()
+    previous = conn.execute("""
+        SELECT deployed_at, status FROM dora_deployments
+        WHERE repo = ? AND deployed_at < ? AND status IN ('success', 'failure', 'error')
+        ORDER BY deployed_at DESC LIMIT 1
+    """, (repo, since)).fetchone()
+    deployments = conn.execute("""
+        SELECT deployed_at, status FROM dora_deployments
+        WHERE repo = ? AND deployed_at >= ? AND status IN ('success', 'failure', 'error')
+        ORDER BY deployed_at
+    """, (repo, since)).fetchall()
+    changes = conn.execute("""
+        SELECT deployed_at, deployed_at - committed_at FROM dora_changes
+        WHERE repo = ? AND deployed_at >= ? ORDER BY deployed_at
+    """, (repo, since)).fetchall()
+    incidents = conn.execute("""
+        SELECT created_at, closed_at FROM dora_incidents
+        WHERE repo = ? AND (created_at >= ? OR closed_at IS NULL) ORDER BY created_at
+    """, (repo, since)).fetchall()
+    return deployments, changes, incidents, previous
+
+
+def prune_dora(repo, before):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM dora_deployments WHERE repo = ? AND created_at < ?", (repo, before))
+        conn.execute("DELETE FROM dora_changes WHERE repo = ? AND deployed_at < ?", (repo, before))
+        conn.execute("DELETE FROM dora_incidents WHERE repo = ? AND created_at < ? AND closed_at IS NOT NULL", (repo, before))
+
+
+def save_review_sketches(repo, week_start, rows):
+    # rows: (scope, key, count, sketch_json). Replaces the repo's whole week,
+    # so rebuilding a week from pr_rows is idempotent.
+    with get_connection() as conn:
+        conn.execute("DELETE FROM review_latency_sketches WHERE repo = ? AND week_start = ?", (repo, week_start))
+        conn.executemany("""
+            INSERT INTO review_latency_sketches (repo, scope, key, week_start, count, sketch)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(repo, scope, key, week_start, count, sketch) for scope, key, count, sketch in rows])
+
+
+def load_review_sketches(scope, since_week, until_week, repos=None, key=None):
+    # (repo, key, week_start, sketch_json) for weeks starting in [since_week, until_week]
+    query = "SELECT repo, key, week_start, sketch FROM review_latency_sketches WHERE scope = ? AND week_start BETWEEN ? AND ?"
+    params = [scope, since_week, until_week]
+    if repos:
+        query += f" AND repo IN ({', '.join('?' for _ in repos)})"
+        params += list(repos)
+    if key is not None:
+        query += " AND key = ?"
+        params.append(key)
+    return get_connection().execute(query, params).fetchall()
+
+
+def record_file_churn(repo, prs):
+    # prs: (number, author, week_start, [(path, additions, deletions), ...]).
+    # A PR already recorded is skipped, so re-harvesting it never double counts.
+    with get_connection() as conn:
+        for number, author, week, files in prs:
+            added = conn.execute(
+                "INSERT OR IGNORE INTO file_churn_prs (repo, number, week_start) VALUES (?, ?, ?)", (repo, number, week)
+            ).rowcount
+            if not added:
+                continue
+            # One row per path, so a path listed twice still counts as one PR
+            by_path = {}
+            for path, additions, deletions in files:
+                previous = by_path.get(path, (0, 0))
+                by_path[path] = (previous[0] + additions, previous[1] + deletions)
+            conn.executemany("""
+                INSERT INTO file_churn (repo, week_start, path, author, additions, deletions, prs)
+                VALUES (?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT(repo, week_start, path, author) DO UPDATE SET
+                    additions = additions + excluded.additions,
+                    deletions = deletions + excluded.deletions,
+                    prs = prs + 1
+            """, [(repo, week, path, author, additions, deletions) for path, (additions, deletions) in by_path.items()])
+
+
+def iter_file_churn(repos, since_week, batch_size=1000):
+    # (repo, path, author, additions, deletions, prs) summed over the weeks,
+    # in (repo, path) order so each file's authors arrive together
+    cursor = get_connection().execute(f"""
+        SELECT repo, path, author, SUM(additions), SUM(deletions), SUM(prs) FROM file_churn
+        WHERE repo IN ({", ".join("?" for _ in repos)}) AND week_start >= ?
+        GROUP BY repo, path, author ORDER BY repo, path
+    """, (*repos, since_week))
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield from batch
+
+
+def prune_file_churn(repo, before_week):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM file_churn WHERE repo = ? AND week_start < ?", (repo, before_week))
+        conn.execute("DELETE FROM file_churn_prs WHERE repo = ? AND week_start < ?", (repo, before_week))
+
+
+REPORT_CHILD_TABLES = ["report_authors", "report_events", "report_churn_outliers"]
+
+
+def save_report_to_db(state):
+    # Keyed by state["report_id"]: saving the same pipeline run twice updates
+    # the row and replaces its child rows instead of duplicating them
+    report_key = state.setdefault("report_id", uuid.uuid4().hex)
     timestamp = datetime.now().isoformat()
     additions = state.get("total_additions", 0)
     deletions = state.get("total_deletions", 0)
     pr = state.get("pr_metrics", {})
     cycle = state.get("cycle_time", {})
     review = state.get("review_latency", {})
+    # Harvested runs carry a columnar table; seed/replay runs only have events
+    table = state.get("event_table")
+    events = table.iter_events() if table is not None else state.get("events", [])
 
-    cursor.execute("""
-        INSERT INTO dev_reports (
-            timestamp, total_additions, total_deletions,
-            total_prs, merged_prs, pr_throughput,
-            avg_review_latency, avg_cycle_time, ci_failures,
-            per_author, summary
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        timestamp, additions, deletions,
-        pr.get("total_prs", 0),
-        pr.get("merged_prs", 0),
-        round((pr.get("merged_prs", 0) / pr.get("total_prs", 1)) * 100, 1) if pr.get("total_prs", 0) else 0.0,
-        review.get("avg_review_latency_hours", 0),
-        cycle.get("avg_cycle_time_hours", 0),
-        state.get("ci_failures", 0),
-        str(state.get("per_author_diff", {})),
-        state.get("summary", "")
-    ))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        existing = cursor.execute("SELECT id FROM dev_reports WHERE report_key = ?", (report_key,)).fetchone()
+        if existing:
+            # Take the previous version of this report back out of the rollups
+            apply_report_rollups(conn, existing[0], -1)
+        cursor.execute("""
+            INSERT INTO dev_reports (
+                report_key, timestamp, repos, total_additions, total_deletions,
+                total_prs, merged_prs, pr_throughput,
+                avg_review_latency, avg_cycle_time, ci_failures, mttr_hours,
+                summary, metrics
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(report_key) DO UPDATE SET
+                repos = excluded.repos,
+                total_additions = excluded.total_additions,
+                total_deletions = excluded.total_deletions,
+                total_prs = excluded.total_prs,
+                merged_prs = excluded.merged_prs,
+                pr_throughput = excluded.pr_throughput,
+                avg_review_latency = excluded.avg_review_latency,
+                avg_cycle_time = excluded.avg_cycle_time,
+                ci_failures = excluded.ci_failures,
+                mttr_hours = excluded.mttr_hours,
+                summary = excluded.summary,
+                metrics = excluded.metrics
+        """, (
+            report_key, timestamp, ",".join(state.get("repos", [])), additions, deletions,
+            pr.get("total_prs", 0),
+            pr.get("merged_prs", 0),
+            round((pr.get("merged_prs", 0) / pr.get("total_prs", 1)) * 100, 1) if pr.get("total_prs", 0) else 0.0,
+            review.get("avg_review_latency_hours", 0),
+            cycle.get("avg_cycle_time_hours", 0),
+            state.get("ci_failures", 0),
+            state.get("mttr_hours"),
+            state.get("summary", ""),
+            json.dumps(state["report_metrics"]) if state.get("report_metrics") else None
+        ))
+        report_id = cursor.execute("SELECT id FROM dev_reports WHERE report_key = ?", (report_key,)).fetchone()[0]
+
+        for table in REPORT_CHILD_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE report_id = ?", (report_id,))
+        cursor.executemany("""
+            INSERT INTO report_authors (report_id, author, additions, deletions, files_touched, team)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (report_id, author, stats.get("additions", 0), stats.get("deletions", 0), stats.get("files_touched", 0), stats.get("team"))
+            for author, stats in state.get("per_author_diff", {}).items()
+        ])
+        cursor.executemany("""
+            INSERT INTO report_events (report_id, repo, pr_number, author, additions, deletions, files_changed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (report_id, e.get("repo"), e.get("pr_number"), e.get("author"),
+             e.get("additions", 0), e.get("deletions", 0), e.get("files_changed", 0))
+            for e in events
+        ])
+        cursor.executemany("""
+            INSERT INTO report_churn_outliers (report_id, pr_id, author, additions, deletions, files_changed, lines_changed, z_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (report_id, o.get("id"), o.get("author"), o.get("additions"), o.get("deletions"),
+             o.get("files_changed"), o.get("lines_changed", o.get("churn")), o.get("z_score"))
+            for o in state.get("churn_outliers", [])
+        ])
+        apply_report_rollups(conn, report_id, 1)
+    return report_id
+
+
+def period_starts(timestamp):
+    day = datetime.fromisoformat(timestamp).date()
+    week = day - timedelta(days=day.weekday())
+    return {"week": week.isoformat(), "month": day.replace(day=1).isoformat()}
+
+
+def apply_report_rollups(conn, report_id, sign):
+    # Adds (sign=1) or removes (sign=-1) one stored report's contribution to its
+    # week and month rollups, so updates cost O(authors) regardless of history
+    report = conn.execute("""
+        SELECT timestamp, repos, total_prs, merged_prs, total_additions, total_deletions,
+               ci_failures, avg_review_latency, avg_cycle_time, mttr_hours
+        FROM dev_reports WHERE id = ?
+    """, (report_id,)).fetchone()
+    if not report:
+        return
+    timestamp, repos, total_prs, merged_prs, additions, deletions, ci_failures, latency, cycle, mttr = report
+    authors = conn.execute(
+        "SELECT author, additions, deletions, files_touched, team FROM report_authors WHERE report_id = ?", (report_id,)
+    ).fetchall()
+    teams = {}
+    for _, add, dels, files, team in authors:
+        if team:
+            sums = teams.setdefault(team, [0, 0, 0])
+            sums[0] += add or 0
+            sums[1] += dels or 0
+            sums[2] += files or 0
+
+    rows = []
+    for period, start in period_starts(timestamp).items():
+        rows.append((
+            "repo", repos or "", period, start, sign, sign * (total_prs or 0), sign * (merged_prs or 0),
+            sign * (additions or 0), sign * (deletions or 0), 0, sign * (ci_failures or 0),
+            sign * (latency or 0), sign * (cycle or 0),
+            sign * (mttr or 0), sign * (mttr is not None)
+        ))
+        rows += [
+            ("author", author, period, start, sign, 0, 0, sign * (add or 0), sign * (dels or 0),
+             sign * (files or 0), 0, 0, 0, 0, 0)
+            for author, add, dels, files, _ in authors
+        ]
+        rows += [
+            ("team", team, period, start, sign, 0, 0, sign * add, sign * dels, sign * files, 0, 0, 0, 0, 0)
+            for team, (add, dels, files) in teams.items()
+        ]
+
+    conn.executemany("""
+        INSERT INTO report_rollups (
+            scope, key, period, period_start, reports, total_prs, merged_prs,
+            additions, deletions, files_touched, ci_failures, review_latency_sum, cycle_time_sum,
+            mttr_sum, mttr_reports
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(scope, key, period, period_start) DO UPDATE SET
+            reports = reports + excluded.reports,
+            total_prs = total_prs + excluded.total_prs,
+            merged_prs = merged_prs + excluded.merged_prs,
+            additions = additions + excluded.additions,
+            deletions = deletions + excluded.deletions,
+            files_touched = files_touched + excluded.files_touched,
+            ci_failures = ci_failures + excluded.ci_failures,
+            review_latency_sum = review_latency_sum + excluded.review_latency_sum,
+            cycle_time_sum = cycle_time_sum + excluded.cycle_time_sum,
+            mttr_sum = mttr_sum + excluded.mttr_sum,
+            mttr_reports = mttr_reports + excluded.mttr_reports
+    """, rows)
+
+
+ROLLUP_FIELDS = [
+    "reports", "total_prs", "merged_prs", "additions", "deletions",
+    "files_touched", "ci_failures", "review_latency_sum", "cycle_time_sum",
+    "mttr_sum", "mttr_reports"
+]
+
+
+def get_rollup(scope, key, period, period_start):
+    # Primary-key lookup; values are per-report averages for the period
+    row = get_connection().execute(f"""
+        SELECT {", ".join(ROLLUP_FIELDS)} FROM report_rollups
+        WHERE scope = ? AND key = ? AND period = ? AND period_start = ?
+    """, (scope, key, period, period_start)).fetchone()
+    if not row or not row[0]:
+        return None
+    return rollup_averages(dict(zip(ROLLUP_FIELDS, row)))
+
+
+def rollup_averages(sums):
+    reports = sums["reports"]
+    return {
+        "reports": reports,
+        "total_prs": sums["total_prs"] / reports,
+        "merged_prs": sums["merged_prs"] / reports,
+        "churn": (sums["additions"] + sums["deletions"]) / reports,
+        "files_touched": sums["files_touched"] / reports,
+        "ci_failures": sums["ci_failures"] / reports,
+        "avg_review_latency": sums["review_latency_sum"] / reports,
+        "avg_cycle_time": sums["cycle_time_sum"] / reports,
+        # Only reports that saw incidents carry an MTTR
+        "mttr_hours": sums["mttr_sum"] / sums["mttr_reports"] if sums["mttr_reports"] else None
+    }
+
+
+def weekly_trend(repos, weeks=8, now=None):
+    # Weekly per-report averages for the repo set, oldest first; weeks without
+    # a stored report are left out
+    now = now or datetime.now()
+    since = period_starts((now - timedelta(weeks=weeks - 1)).isoformat())["week"]
+    rows = get_connection().execute(f"""
+        SELECT period_start, {", ".join(ROLLUP_FIELDS)} FROM report_rollups
+        WHERE scope = 'repo' AND key = ? AND period = 'week' AND period_start >= ? AND reports > 0
+        ORDER BY period_start
+    """, (",".join(repos), since)).fetchall()
+    return [
+        {"week": period_start, **rollup_averages(dict(zip(ROLLUP_FIELDS, values)))}
+        for period_start, *values in rows
+    ]
+
+
+def week_over_week(current, repos, now=None):
+    # current: this run's metrics with the same keys get_rollup returns
+    now = now or datetime.now()
+    last_week = period_starts((now - timedelta(weeks=1)).isoformat())["week"]
+    previous = get_rollup("repo", ",".join(repos), "week", last_week)
+    if not previous:
+        return {}
+    deltas = {}
+    for metric, value in current.items():
+        before = previous.get(metric)
+        if value is None or not before:
+            continue
+        deltas[metric] = {
+            "current": value,
+            "previous": round(before, 2),
+            "change_percent": round((value - before) / before * 100, 1)
+        }
+    return deltas
+
+
+def author_churn_history(author, weeks=12):
+    since = (datetime.now() - timedelta(weeks=weeks)).isoformat()
+    rows = get_connection().execute("""
+        SELECT r.timestamp, a.additions, a.deletions, a.files_touched
+        FROM report_authors a JOIN dev_reports r ON r.id = a.report_id
+        WHERE a.author = ? AND r.timestamp >= ?
+        ORDER BY r.timestamp
+    """, (author, since)).fetchall()
+    return [
+        {"timestamp": ts, "additions": add, "deletions": dels, "files_touched": files, "churn": add + dels}
+        for ts, add, dels, files in rows
+    ]
+
+
+def author_churn_baselines(authors, weeks=12):
+    # Median per-PR churn of each author over past reports; PRs repeat across
+    # overlapping weekly windows, so each (repo, pr_number) is counted once
+    if not authors:
+        return {}
+    since = (datetime.now() - timedelta(weeks=weeks)).isoformat()
+    placeholders = ", ".join("?" for _ in authors)
+    rows = get_connection().execute(f"""
+        SELECT DISTINCT e.author, e.repo, e.pr_number, e.additions + e.deletions
+        FROM report_events e JOIN dev_reports r ON r.id = e.report_id
+        WHERE e.author IN ({placeholders}) AND r.timestamp >= ?
+    """, (*authors, since)).fetchall()
+
+    churn_by_author = {}
+    for author, _, _, churn in rows:
+        churn_by_author.setdefault(author, []).append(churn)
+    return {
+        author: (statistics.median(values), len(values))
+        for author, values in churn_by_author.items()
+    }
+
+
+JOB_FIELDS = ["id", "dedupe_key", "status", "progress", "channel_id", "report_key", "error", "created_at", "updated_at"]
+
+
+def create_job(job_id, dedupe_key, channel_id):
+    now = datetime.now().isoformat()
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO report_jobs (id, dedupe_key, status, progress, channel_id, created_at, updated_at)
+            VALUES (?, ?, 'queued', '', ?, ?, ?)
+        """, (job_id, dedupe_key, channel_id, now, now))
+
+
+def update_job(job_id, **fields):
+    fields["updated_at"] = datetime.now().isoformat()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with get_connection() as conn:
+        conn.execute(f"UPDATE report_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def get_job(job_id):
+    row = get_connection().execute(
+        f"SELECT {', '.join(JOB_FIELDS)} FROM report_jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    return dict(zip(JOB_FIELDS, row)) if row else None
+
+
+def mark_interrupted_jobs():
+    # Jobs left queued/running by a previous process will never finish
+    with get_connection() as conn:
+        cursor = conn.execute(
+            "UPDATE report_jobs SET status = 'interrupted', updated_at = ? WHERE status IN ('queued', 'running')",
+            (datetime.now().isoformat(),)
+        )
+    return cursor.rowcount
+
+
+def get_cached_report(cache_key):
+    row = get_connection().execute(
+        "SELECT report_key, summary, chart, created_at, expires_at, extra_charts, followup, has_contributions "
+        "FROM report_cache WHERE cache_key = ?",
+        (cache_key,)
+    ).fetchone()
+    if not row or not row[4] or row[4] < time.time():
+        return None
+    extra_charts = {name: base64.b64decode(png) for name, png in json.loads(row[5] or "{}").items()}
+    return {
+        "report_key": row[0], "summary": row[1], "chart": row[2], "created_at": row[3],
+        "extra_charts": extra_charts, "followup": row[6], "has_contributions": bool(row[7])
+    }
+
+
+def save_cached_report(cache_key, report_key, summary, chart, ttl, extra_charts=None, has_contributions=True):
+    # extra_charts: {name: PNG bytes}, stored as base64 JSON next to the main chart.
+    # has_contributions: False when the week had nothing to plot (no chart on purpose)
+    now = time.time()
+    extra = json.dumps({name: base64.b64encode(png).decode() for name, png in (extra_charts or {}).items()})
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO report_cache
+                (cache_key, report_key, summary, chart, created_at, expires_at, extra_charts, has_contributions)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (cache_key, report_key, summary, chart, now, now + ttl, extra, int(bool(has_contributions))))
+
+
+def set_cached_followup(cache_key, text):
+    with get_connection() as conn:
+        conn.execute("UPDATE report_cache SET followup = ? WHERE cache_key = ?", (text, cache_key))
+
+
+def save_report_metrics(report_key, metrics):
+    with get_connection() as conn:
+        conn.execute("UPDATE dev_reports SET metrics = ? WHERE report_key = ?", (json.dumps(metrics), report_key))
+
+
+def get_report_metrics(report_key):
+    row = get_connection().execute("SELECT metrics FROM dev_reports WHERE report_key = ?", (report_key,)).fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+
+def save_llm_summary(report_key, text):
+    with get_connection() as conn:
+        conn.execute("UPDATE dev_reports SET llm_summary = ? WHERE report_key = ?", (text, report_key))
+
+
+def get_llm_response(prompt_hash, max_age):
+    row = get_connection().execute(
+        "SELECT response, created_at FROM llm_cache WHERE prompt_hash = ?", (prompt_hash,)
+    ).fetchone()
+    if not row or time.time() - row[1] > max_age:
+        return None
+    return row[0]
+
+
+def save_llm_response(prompt_hash, model, response):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_cache (prompt_hash, model, response, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (prompt_hash, model, response, time.time()))
+
+
+def get_schedule_last_run(schedule_id):
+    row = get_connection().execute(
+        "SELECT last_run_at FROM report_schedule_runs WHERE schedule_id = ?", (schedule_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def set_schedule_last_run(schedule_id, last_run_at):
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO report_schedule_runs (schedule_id, last_run_at) VALUES (?, ?)
+            ON CONFLICT(schedule_id) DO UPDATE SET last_run_at = excluded.last_run_at
+        """, (schedule_id, last_run_at))
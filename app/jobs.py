@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db import (
+    create_job, update_job, mark_interrupted_jobs, get_cached_report, save_cached_report, set_cached_followup,
+    save_report_metrics
+)
+from app.utils.metrics import observe, report_metrics
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "900"))
+REPORT_WINDOW_DAYS = 7
+# Bump when a metric's definition changes so cached reports built with the old one are ignored
+REPORT_METRIC_VERSION = 1
+
+
+def report_cache_key(repos, days=REPORT_WINDOW_DAYS):
+    return f"{','.join(sorted(repos))}|{days}d|v{REPORT_METRIC_VERSION}"
+
+
+class ReportJobQueue:
+    # Runs the LangGraph pipeline off the Slack handler thread. A fresh cached
+    # report is served without running anything; identical in-flight requests
+    # share one job (single-flight): later callers are attached as extra
+    # subscribers and get the same progress updates and result.
+    #
+    # render(state) turns the final pipeline state into the cached artifact:
+    # {"summary": str, "chart": PNG bytes or None, "has_contributions": bool}.
+    # followup(state), if given, produces slower extra text (the LLM narrative)
+    # that subscribers get via on_followup after the report itself.
+
+    def __init__(self, pipeline, render, workers=None, cache_ttl=None, followup=None):
+        self.pipeline = pipeline
+        self.render = render
+        self.followup = followup
+        self.cache_ttl = REPORT_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers or REPORT_JOB_WORKERS, thread_name_prefix="report-job")
+        self.lock = threading.Lock()
+        self.in_flight = {}  # dedupe_key -> {"id": job_id, "subscribers": [...], "cache_ttl": seconds}
+        interrupted = mark_interrupted_jobs()
+        if interrupted:
+            print(f"⚠️ Marked {interrupted} unfinished report job(s) from a previous run as interrupted.")
+
+    def submit(self, repos, channel_id, subscriber, refresh=False, cache_ttl=None):
+        # subscriber: object with on_progress(job_id, text), on_done(job_id, artifact),
+        # on_followup(job_id, text) and on_error(job_id, error)
+        # cache_ttl overrides how long this build's artifact is served from cache.
+        # Returns (job_id, "cached" | "merged" | "queued")
+        key = report_cache_key(repos)
+        if not refresh:
+            cached = get_cached_report(key)
+            if cached:
+                subscriber.on_done(None, cached)
+                if cached.get("followup"):
+                    subscriber.on_followup(None, cached["followup"])
+                return None, "cached"
+
+        with self.lock:
+            job = self.in_flight.get(key)
+            if job:
+                job["subscribers"].append(subscriber)
+                # e.g. a scheduled build joining an on-demand one: the artifact
+                # is cached for the longer of the two TTLs
+                if cache_ttl is not None:
+                    job["cache_ttl"] = max(job["cache_ttl"], cache_ttl)
+                return job["id"], "merged"
+            job_id = uuid.uuid4().hex[:8]
+            self.in_flight[key] = {
+                "id": job_id, "subscribers": [subscriber], "cache_ttl": self.cache_ttl if cache_ttl is None else cache_ttl
+            }
+
+        create_job(job_id, key, channel_id)
+        self.executor.submit(self._run, job_id, key, repos)
+        return job_id, "queued"
+
+    def _notify(self, subscribers, method, *args):
+        for subscriber in subscribers:
+            try:
+                getattr(subscriber, method)(*args)
+            except Exception as e:
+                print(f"⚠️ Report job subscriber failed in {method}: {e}")
+
+    def _subscribers(self, key, finished=False):
+        # Once finished, the job leaves in_flight under the same lock, so a
+        # caller either joins before the final notification or starts a new job
+        with self.lock:
+            job = self.in_flight.pop(key) if finished else self.in_flight[key]
+        return list(job["subscribers"])
+
+    def _run(self, job_id, key, repos):
+        started = time.perf_counter()
+        update_job(job_id, status="running")
+        state = {"repos": repos} if repos else {}
+        stages = [n for n in self.pipeline.get_graph().nodes if not n.startswith("__")]
+        try:
+            done = 0
+            for update in self.pipeline.stream(state, stream_mode="updates"):
+                for node, node_state in update.items():
+                    done += 1
+                    state.update(node_state or {})
+                    progress = f"{node} finished ({done}/{len(stages)})"
+                    update_job(job_id, progress=progress)
+                    self._notify(self._subscribers(key), "on_progress", job_id, progress)
+            artifact = self.render(state)
+            with self.lock:
+                cache_ttl = self.in_flight[key]["cache_ttl"]
+            save_cached_report(key, state.get("report_id"), artifact["summary"], artifact["chart"], cache_ttl,
+                               artifact.get("extra_charts"), artifact.get("has_contributions", True))
+        except Exception as e:
+            traceback.print_exc()
+            update_job(job_id, status="failed", error=str(e))
+            self._notify(self._subscribers(key, finished=True), "on_error", job_id, e)
+            return
+
+        update_job(job_id, status="done", progress="complete", report_key=state.get("report_id"))
+        subscribers = self._subscribers(key, finished=True)
+        self._notify(subscribers, "on_done", job_id, artifact)
+        report_seconds = time.perf_counter() - started
+        observe("report_job_seconds", report_seconds)
+        metrics = report_metrics(state, render_seconds=artifact.get("render_seconds"), report_seconds=round(report_seconds, 3))
+        self._save_metrics(state, metrics)
+
+        if self.followup:
+            followup_started = time.perf_counter()
+            try:
+                text = self.followup(state)
+            except Exception as e:
+                print(f"⚠️ Report follow-up for job {job_id} failed: {e}")
+                return
+            metrics["followup_seconds"] = round(time.perf_counter() - followup_started, 3)
+            self._save_metrics(state, metrics)
+            if text:
+                set_cached_followup(key, text)
+                self._notify(subscribers, "on_followup", job_id, text)
+
+    def _save_metrics(self, state, metrics):
+        if state.get("report_id"):
+            save_report_metrics(state["report_id"], metrics)
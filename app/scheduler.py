@@ -0,0 +1,192 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta, timezone, time as dtime
+from zoneinfo import ZoneInfo
+
+from app.db import get_schedule_last_run, set_schedule_last_run
+
+# Pre-warmed weekly reports. REPORT_SCHEDULES is a ";"-separated list of
+#   <cron expression>|<channel id>|<owner/repo>[,<owner/repo>...]
+# e.g. "0 6 * * 1|C0123ABCD|microsoft/vscode; 30 5 * * 1-5|C0456EFGH|org/api,org/web"
+# Cron fields are minute hour day-of-month month day-of-week (0 or 7 = Sunday),
+# evaluated in REPORT_SCHEDULE_TZ.
+REPORT_SCHEDULES = os.getenv("REPORT_SCHEDULES", "")
+REPORT_SCHEDULE_TZ = ZoneInfo(os.getenv("REPORT_SCHEDULE_TZ", "UTC"))
+SCHEDULE_POLL_SECONDS = float(os.getenv("REPORT_SCHEDULE_POLL_SECONDS", "30"))
+# A scheduled report is served from cache until the next run, but never longer than this
+SCHEDULED_REPORT_MAX_TTL = float(os.getenv("SCHEDULED_REPORT_MAX_TTL", str(7 * 24 * 3600)))
+SCHEDULE_LOOKBACK_DAYS = 366
+
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        base, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-", 1))
+        else:
+            start = int(base)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"'{part}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expression):
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"expected 5 cron fields, got {len(fields)}")
+    minutes, hours, days, months, weekdays = (
+        parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_RANGES)
+    )
+    weekdays = {d % 7 for d in weekdays}
+    # Cron semantics: when both day fields are restricted, either one matching is enough
+    return {
+        "minutes": sorted(minutes), "hours": sorted(hours), "days": days, "months": months, "weekdays": weekdays,
+        "any_day": fields[2] == "*", "any_weekday": fields[4] == "*"
+    }
+
+
+def day_matches(cron, day):
+    if day.month not in cron["months"]:
+        return False
+    dom = day.day in cron["days"]
+    dow = (day.weekday() + 1) % 7 in cron["weekdays"]
+    if cron["any_day"] or cron["any_weekday"]:
+        return dom and dow
+    return dom or dow
+
+
+def previous_fire(cron, now):
+    # Latest scheduled time <= now, scanning whole days rather than minutes
+    now = now.replace(second=0, microsecond=0)
+    for offset in range(SCHEDULE_LOOKBACK_DAYS + 1):
+        day = (now - timedelta(days=offset)).date()
+        if not day_matches(cron, day):
+            continue
+        for hour in reversed(cron["hours"]):
+            for minute in reversed(cron["minutes"]):
+                candidate = datetime.combine(day, dtime(hour, minute), tzinfo=now.tzinfo)
+                if candidate <= now:
+                    return candidate
+    return None
+
+
+def next_fire(cron, now):
+    now = now.replace(second=0, microsecond=0)
+    for offset in range(SCHEDULE_LOOKBACK_DAYS + 1):
+        day = (now + timedelta(days=offset)).date()
+        if not day_matches(cron, day):
+            continue
+        for hour in cron["hours"]:
+            for minute in cron["minutes"]:
+                candidate = datetime.combine(day, dtime(hour, minute), tzinfo=now.tzinfo)
+                if candidate > now:
+                    return candidate
+    return None
+
+
+def parse_schedules(spec=REPORT_SCHEDULES):
+    schedules = []
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        try:
+            expression, channel_id, repos = (part.strip() for part in entry.split("|"))
+            repos = [r.strip() for r in repos.split(",") if r.strip()]
+            if not channel_id or not repos:
+                raise ValueError("channel and at least one repo are required")
+            cron = parse_cron(expression)
+        except ValueError as e:
+            print(f"⚠️ Ignoring report schedule '{entry.strip()}': {e}")
+            continue
+        # Stable ID so last-run times survive restarts; editing an entry starts it afresh
+        key = f"{expression}|{channel_id}|{','.join(sorted(repos))}"
+        schedules.append({
+            "id": hashlib.sha1(key.encode()).hexdigest()[:12],
+            "expression": expression,
+            "cron": cron,
+            "channel_id": channel_id,
+            "repos": repos
+        })
+    return schedules
+
+
+class ReportScheduler:
+    # Background thread that submits scheduled reports to the ReportJobQueue.
+    # Each schedule's last fired time is kept in the DB, so a run missed while
+    # the bot was down is caught up (once) on the next check after startup.
+    # A schedule seen for the first time (new, edited, or first deploy) only
+    # records its latest due time: it first fires at its next scheduled time.
+    #
+    # make_subscriber(channel_id) returns the job subscriber that posts the result.
+
+    def __init__(self, jobs, make_subscriber, schedules=None, poll_seconds=None):
+        self.jobs = jobs
+        self.make_subscriber = make_subscriber
+        self.schedules = parse_schedules() if schedules is None else schedules
+        self.poll_seconds = poll_seconds or SCHEDULE_POLL_SECONDS
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not self.schedules:
+            return
+        print(f"⏰ Report scheduler running {len(self.schedules)} schedule(s).")
+        self.thread = threading.Thread(target=self._loop, name="report-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _loop(self):
+        while not self.stopped.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"⚠️ Report scheduler check failed: {e}")
+            self.stopped.wait(self.poll_seconds)
+
+    def run_pending(self, now=None):
+        now = now or datetime.now(REPORT_SCHEDULE_TZ)
+        fired = []
+        for schedule in self.schedules:
+            due = previous_fire(schedule["cron"], now)
+            if not due:
+                continue
+            last_run = get_schedule_last_run(schedule["id"])
+            if not last_run:
+                # Nothing was missed yet; firing now would replay a due time up to a year old
+                set_schedule_last_run(schedule["id"], due.astimezone(timezone.utc).isoformat())
+                upcoming = next_fire(schedule["cron"], now)
+                print(f"⏰ New report schedule for {', '.join(schedule['repos'])}; first run "
+                      f"{upcoming.isoformat() if upcoming else 'not within a year'}.")
+                continue
+            if datetime.fromisoformat(last_run) >= due:
+                continue
+            if due < now - timedelta(seconds=self.poll_seconds * 2):
+                print(f"⏰ Catching up missed report run for {', '.join(schedule['repos'])} (due {due.isoformat()}).")
+
+            # Serve the pre-warmed report until the next scheduled build replaces it
+            upcoming = next_fire(schedule["cron"], now)
+            ttl = SCHEDULED_REPORT_MAX_TTL
+            if upcoming:
+                ttl = min(ttl, (upcoming - now).total_seconds() + self.poll_seconds)
+
+            job_id, status = self.jobs.submit(
+                schedule["repos"], schedule["channel_id"], self.make_subscriber(schedule["channel_id"]),
+                refresh=True, cache_ttl=ttl
+            )
+            set_schedule_last_run(schedule["id"], due.astimezone(timezone.utc).isoformat())
+            print(f"⏰ Scheduled report for {', '.join(schedule['repos'])} → job {job_id} ({status}).")
+            fired.append(job_id)
+        return fired
@@ -1,13 +1,19 @@
 from slack_bolt import App as SlackApp
 from slack_bolt.adapter.fastapi import SlackRequestHandler
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 import os
 from dotenv import load_dotenv
 
 from langgraph_flow import app as langgraph_app  # LangGraph flow
-from app.db import init_db, save_report_to_db
-from app.utils.chart_generator import generate_contribution_chart
+from app.db import init_db, get_job, weekly_trend
+from app.jobs import ReportJobQueue
+from app.scheduler import ReportScheduler
+from app.agents.data_harvester import REPOS
+from app.agents.insight_narrator import llm_followup
+from app.utils.chart_generator import CHART_TITLES, CHART_TREND_WEEKS, report_chart_jobs, render_charts
 from app.utils.slack_utils import upload_chart_to_slack
+from app.utils.metrics import render_prometheus
 
 # Load env and init DB
 load_dotenv()
@@ -23,43 +29,110 @@ if not SLACK_BOT_TOKEN or not SLACK_SIGNING_SECRET:
 # Initialize Slack App
 slack_app = SlackApp(token=SLACK_BOT_TOKEN, signing_secret=SLACK_SIGNING_SECRET)
 
+def render_report(result):
+    # Rendered once per pipeline run; the summary and chart bytes are cached.
+    # InsightNarrator has already saved this run, so the trend includes it.
+    per_author = result.get("per_author_diff", {})  # FIX: consistent key
+    trend = weekly_trend(result.get("repos", []), CHART_TREND_WEEKS)
+    charts, render_seconds = render_charts(report_chart_jobs(result, trend), target="slack")
+    print(f"🖼️ Rendered {len(charts)} chart(s) in {render_seconds:.2f}s")
+    return {
+        "summary": result.get("summary", "No summary available."),
+        "chart": charts.pop("contributions", None),
+        "extra_charts": charts,
+        "has_contributions": bool(per_author),
+        "render_seconds": round(render_seconds, 2)
+    }
+
+
+# Background report jobs: the slash command returns immediately
+report_jobs = ReportJobQueue(langgraph_app, render_report, followup=llm_followup)
+
+
+class SlackReportSubscriber:
+    def __init__(self, say, channel_id):
+        self.say = say
+        self.channel_id = channel_id
+
+    def on_progress(self, job_id, progress):
+        self.say(f"⏳ Job `{job_id}`: {progress}")
+
+    def on_done(self, job_id, report):
+        # report: cached artifact from render_report (InsightNarrator already saved it to the DB)
+        self.say(report["summary"])
+        if report["chart"]:
+            upload_chart_to_slack(self.channel_id, report["chart"])
+        elif report.get("has_contributions", True):
+            self.say("_Chart generation failed._")
+        else:
+            self.say("_No contribution data available to plot._")
+        for name, chart in report.get("extra_charts", {}).items():
+            title = CHART_TITLES.get(name, name)
+            upload_chart_to_slack(self.channel_id, chart, title=title, comment=f"📊 *{title}*")
+
+    def on_followup(self, job_id, text):
+        self.say(f"🧠 *AI summary:*\n{text}")
+
+    def on_error(self, job_id, error):
+        print("❌ Error:", error)
+        self.say(f"❌ Report job `{job_id}` failed with an internal error.")
+
+
+class ScheduledReportSubscriber(SlackReportSubscriber):
+    # Scheduled runs post straight to the channel and skip the progress chatter
+    def __init__(self, channel_id):
+        super().__init__(lambda text: slack_app.client.chat_postMessage(channel=channel_id, text=text), channel_id)
+
+    def on_progress(self, job_id, progress):
+        pass
+
+
+# Pre-warms reports on the REPORT_SCHEDULES cron entries; started with the web app
+report_scheduler = ReportScheduler(report_jobs, ScheduledReportSubscriber)
+
+
 # Slash Command Handler
 @slack_app.command("/dev-report")
 def handle_dev_report(ack, say, command):
     ack()
-    say("📊 Generating your weekly dev report...")
-
-    try:
-        # 1. Run LangGraph pipeline
-        result = langgraph_app.invoke({})
-
-        # 2. Send summary
-        summary = result.get("summary", "No summary available.")
-        say(summary)
-
-        # 3. Save to DB
-        save_report_to_db(result)
-        print("✅ Report saved to DB.")
-
-        # 4. Upload chart if per-author stats exist
-        per_author = result.get("per_author_diff", {})  # FIX: consistent key
-        if isinstance(per_author, dict) and any(per_author.values()):
-            chart_path = generate_contribution_chart(per_author)
-            if chart_path:
-                upload_chart_to_slack(command["channel_id"], chart_path)
-            else:
-                say("_Chart generation failed._")
+    args = command.get("text", "").split()
+
+    # /dev-report status <job_id>
+    if args[:1] == ["status"]:
+        job = get_job(args[1]) if len(args) > 1 else None
+        if not job:
+            say("❓ Unknown job ID.")
         else:
-            say("_No contribution data available to plot._")
+            say(f"📋 Job `{job['id']}` is *{job['status']}*" + (f" — {job['progress']}" if job["progress"] else ""))
+        return
 
-    except Exception as e:
-        print("❌ Error:", e)
-        say("❌ An internal error occurred while processing the report.")
+    # Optional repo list and cache bypass: /dev-report owner/repo1 owner/repo2 --refresh
+    repos = [r for r in args if "/" in r] or REPOS
+    refresh = "--refresh" in args
+    subscriber = SlackReportSubscriber(say, command["channel_id"])
+    job_id, status = report_jobs.submit(repos, command["channel_id"], subscriber, refresh=refresh)
+    if status == "merged":
+        say(f"📊 A report for {', '.join(repos)} is already running (job `{job_id}`); you'll get the same result.")
+    elif status == "queued":
+        say(f"📊 Generating your weekly dev report for {', '.join(repos)} (job `{job_id}`)...")
 
 # FastAPI app + Slack Events adapter
 fastapi_app = FastAPI()
 handler = SlackRequestHandler(slack_app)
 
+@fastapi_app.on_event("startup")
+def start_report_scheduler():
+    report_scheduler.start()
+
+@fastapi_app.on_event("shutdown")
+def stop_report_scheduler():
+    report_scheduler.stop()
+
 @fastapi_app.post("/slack/events")
 async def slack_events(request: Request):
     return await handler.handle(request)
+
+@fastapi_app.get("/metrics")
+def metrics():
+    # Prometheus scrape endpoint: node timings, GitHub/LLM calls, cache hits, render/upload times
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,166 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# Append-only JSONL audit trail of report runs. Writes go through a queue to a
+# background thread, so the pipeline never blocks on disk. The live file is
+# rotated by size or age into gzip archives named after the rotation time:
+#   audit_log.jsonl -> audit_log.20261018-060000-123456.jsonl.gz
+AUDIT_LOG_PATH = os.getenv("AUDIT_LOG_PATH", "audit_log.jsonl")
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+AUDIT_LOG_MAX_AGE_DAYS = float(os.getenv("AUDIT_LOG_MAX_AGE_DAYS", "7"))
+AUDIT_LOG_BACKUPS = int(os.getenv("AUDIT_LOG_BACKUPS", "20"))  # compressed archives kept
+
+ROTATED_STAMP = "%Y%m%d-%H%M%S-%f"  # microseconds keep back-to-back rotations apart
+
+
+def archive_paths(path=AUDIT_LOG_PATH):
+    # Rotated archives, oldest first (the stamp sorts chronologically)
+    base, ext = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(base)}.*{ext}.gz"))
+
+
+def archive_time(archive, path=AUDIT_LOG_PATH):
+    # Rotation time of an archive; every record in it is older than this
+    base, ext = os.path.splitext(path)
+    stamp = archive[len(base) + 1:-len(ext + ".gz")]
+    try:
+        return datetime.strptime(stamp, ROTATED_STAMP)
+    except ValueError:
+        return None
+
+
+class AuditLog:
+    def __init__(self, path=AUDIT_LOG_PATH, max_bytes=AUDIT_LOG_MAX_BYTES,
+                 max_age_days=AUDIT_LOG_MAX_AGE_DAYS, backups=AUDIT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.backups = backups
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        # Non-blocking: the record is serialized and appended by the writer thread
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._drain, name="audit-log", daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+        self.queue.put(record)
+
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread:
+            self.queue.put(None)
+            thread.join(timeout=10)
+
+    def _drain(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            batch = [record]
+            # Write whatever else queued up in the same open/append
+            while not self.queue.empty():
+                record = self.queue.get_nowait()
+                if record is None:
+                    self._append(batch)
+                    return
+                batch.append(record)
+            self._append(batch)
+
+    def _append(self, records):
+        try:
+            self._rotate_if_needed()
+            f = open(self.path, "a")
+            try:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        self.rotate()
+                        f = open(self.path, "a")
+            finally:
+                f.close()
+        except Exception as e:
+            print(f"⚠️ Failed to write audit log: {e}")
+
+    def _rotate_if_needed(self):
+        if not os.path.exists(self.path):
+            return
+        stat = os.stat(self.path)
+        too_big = stat.st_size >= self.max_bytes
+        # Age of the file's first record; ctime isn't creation time on Linux
+        too_old = self.max_age and time.time() - self._first_record_time(stat.st_mtime) >= self.max_age
+        if stat.st_size and (too_big or too_old):
+            self.rotate()
+
+    def _first_record_time(self, fallback):
+        with open(self.path) as f:
+            line = f.readline()
+        try:
+            return datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+        except (ValueError, KeyError, TypeError):
+            return fallback
+
+    def rotate(self):
+        base, ext = os.path.splitext(self.path)
+        archive = f"{base}.{datetime.now().strftime(ROTATED_STAMP)}{ext}.gz"
+        with open(self.path, "rb") as src, gzip.open(archive, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        for old in archive_paths(self.path)[:-self.backups or None]:
+            os.remove(old)
+        print(f"🗜️ Rotated audit log to {archive}")
+
+
+def read_audit_log(start=None, end=None, path=AUDIT_LOG_PATH):
+    # Streams records with start <= timestamp < end (naive local datetimes,
+    # either bound optional) across the archives and the live file, one line
+    # at a time. Archives rotated before start are skipped without opening,
+    # and once an archive was rotated at or after end, later files are too.
+    files = []
+    for archive in archive_paths(path):
+        files.append((gzip.open, archive, archive_time(archive, path)))
+    if os.path.exists(path):
+        files.append((open, path, None))
+
+    previous_rotation = None
+    for opener, name, rotated in files:
+        if end and previous_rotation and previous_rotation >= end:
+            return
+        previous_rotation = rotated
+        if start and rotated and rotated < start:
+            continue
+        with opener(name, "rt") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    timestamp = datetime.fromisoformat(record["timestamp"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if (start and timestamp < start) or (end and timestamp >= end):
+                    continue
+                yield record
+
+
+_audit_log = None
+_audit_log_lock = threading.Lock()
+
+
+def get_audit_log():
+    global _audit_log
+    with _audit_log_lock:
+        if _audit_log is None:
+            _audit_log = AuditLog()
+        return _audit_log
@@ -1,65 +1,317 @@
-import matplotlib
-matplotlib.use("Agg")
-
-import matplotlib.pyplot as plt
+import hashlib
+import io
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 
-def generate_contribution_chart(per_author_diff: dict, filename="contributions.png"):
-    if not per_author_diff:
-        return None
+# Object-oriented Agg API only: no pyplot global state, so concurrent report
+# jobs can render at the same time without clobbering each other's figure.
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-    authors = list(per_author_diff.keys())
-    additions = [v.get("additions", 0) for v in per_author_diff.values()]
-    deletions = [v.get("deletions", 0) for v in per_author_diff.values()]
-    total = [a + d for a, d in zip(additions, deletions)]
+from app.utils.metrics import observe
 
-    if not any(total):
-        return None  # All zeros
+# Size and resolution per destination. Slack shows a preview a few hundred
+# pixels wide, so it doesn't need the 300 dpi print rendering.
+CHART_TARGETS = {
+    "slack": {"figsize": (13, 7), "dpi": 110},
+    "file": {"figsize": (13, 7), "dpi": 300}
+}
+CHART_MAX_AUTHORS = int(os.getenv("CHART_MAX_AUTHORS", "25"))  # the rest are merged into one "others" bar
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "32"))
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+CHART_TREND_WEEKS = int(os.getenv("CHART_TREND_WEEKS", "8"))
+CHART_SCATTER_MAX_POINTS = 20_000  # evenly thinned beyond this; outliers are always drawn
+CHART_SCATTER_LABELS = 10  # outliers annotated with their PR id (highest z first)
+
+CHART_TITLES = {
+    "contributions": "Developer Contribution Chart",
+    "trends": "Delivery Trends",
+    "review_latency": "Review Latency Distribution",
+    "churn_scatter": "PR Churn vs Files Changed"
+}
+
+_cache = OrderedDict()  # hash of (chart kind, data, target) -> PNG bytes
+_cache_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def chart_key(kind, data, target):
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(f"{kind}|{target}|{CHART_MAX_AUTHORS}|{payload}".encode()).hexdigest()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _cache_put(key, png):
+    with _cache_lock:
+        _cache[key] = png
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def collapse_authors(per_author_diff, max_authors=CHART_MAX_AUTHORS):
+    # Returns [(author, total, additions, deletions)] sorted by total, with the
+    # long tail summed into a single "others (N)" entry
+    rows = [
+        (author, v.get("additions", 0) + v.get("deletions", 0), v.get("additions", 0), v.get("deletions", 0))
+        for author, v in per_author_diff.items()
+    ]
+    rows.sort(key=lambda r: r[1], reverse=True)
+    if len(rows) <= max_authors:
+        return rows
+    head, tail = rows[:max_authors - 1], rows[max_authors - 1:]
+    others = (f"others ({len(tail)})", sum(r[1] for r in tail), sum(r[2] for r in tail), sum(r[3] for r in tail))
+    return head + [others]
 
-    # Sort authors by total contributions
-    sorted_data = sorted(zip(authors, total, additions, deletions), key=lambda x: x[1], reverse=True)
-    authors, total, additions, deletions = zip(*sorted_data)
+
+def _new_figure(target):
+    spec = CHART_TARGETS[target]
+    fig = Figure(figsize=spec["figsize"], dpi=spec["dpi"])
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def _png(fig):
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _render_contributions(rows, target):
+    authors, total, additions, deletions = zip(*rows)
+    fig, ax = _new_figure(target)
 
     x = range(len(authors))
     bar_width = 0.6
+    bars_add = ax.bar(x, additions, bar_width, label='Additions', color='#4CAF50')
+    ax.bar(x, deletions, bar_width, bottom=additions, label='Deletions', color='#F44336')
 
-    plt.figure(figsize=(13, 7))
-    bars_add = plt.bar(x, additions, bar_width, label='Additions', color='#4CAF50')
-    bars_del = plt.bar(x, deletions, bar_width, bottom=additions, label='Deletions', color='#F44336')
-
-    # Add in-bar labels for additions
+    # In-bar labels for additions and deletions, totals above the bars
+    label_gap = max(total) * 0.01
     for i, bar in enumerate(bars_add):
-        height = bar.get_height()
-        if height > 0:
-            plt.text(bar.get_x() + bar.get_width() / 2, height / 2, f"+{additions[i]}", 
-                     ha='center', va='center', fontsize=9, color='white', fontweight='bold')
-
-    # Add in-bar labels for deletions
-    for i, bar in enumerate(bars_del):
-        del_height = deletions[i]
-        if del_height > 0:
-            plt.text(bar.get_x() + bar.get_width() / 2, additions[i] + del_height / 2, f"-{deletions[i]}",
-                     ha='center', va='center', fontsize=9, color='white', fontweight='bold')
-
-    # Add total values above bars
-    for i in x:
+        center = bar.get_x() + bar.get_width() / 2
+        if additions[i] > 0:
+            ax.text(center, additions[i] / 2, f"+{additions[i]}",
+                    ha='center', va='center', fontsize=9, color='white', fontweight='bold')
+        if deletions[i] > 0:
+            ax.text(center, additions[i] + deletions[i] / 2, f"-{deletions[i]}",
+                    ha='center', va='center', fontsize=9, color='white', fontweight='bold')
         if total[i] > 0:
-            plt.text(i, total[i] + 10, str(total[i]), ha='center', va='bottom', fontsize=9, fontweight='bold')
+            ax.text(center, total[i] + label_gap, str(total[i]), ha='center', va='bottom', fontsize=9, fontweight='bold')
+
+    ax.set_xticks(list(x))
+    ax.set_xticklabels(authors, rotation=45, ha='right', fontsize=10)
+    ax.tick_params(axis='y', labelsize=10)
+    ax.set_ylabel("Total Contributions", fontsize=12)
+    ax.set_title("Weekly Code Contributions by Author", fontsize=14, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+    ax.legend(loc='upper right', fontsize=10)
+    return _png(fig)
+
+
+def _render_trends(trend, target):
+    # trend: weekly_trend() rows, oldest first
+    fig, ax = _new_figure(target)
+    weeks = [row["week"] for row in trend]
+    for metric, label, color in [
+        ("avg_cycle_time", "Cycle Time (hrs)", "#2196F3"),
+        ("avg_review_latency", "Review Latency (hrs)", "#FF9800"),
+        ("mttr_hours", "MTTR (hrs)", "#9C27B0")
+    ]:
+        points = [(week, row[metric]) for week, row in zip(weeks, trend) if row.get(metric) is not None]
+        if points:
+            ax.plot(*zip(*points), marker="o", linewidth=2, label=label, color=color)
+    ax.tick_params(axis='x', rotation=45, labelsize=10)
+    ax.set_ylabel("Hours", fontsize=12)
+    ax.set_title(f"Delivery Trends (last {len(weeks)} weeks)", fontsize=14, fontweight='bold')
+    ax.grid(linestyle='--', alpha=0.6)
+    ax.legend(loc='upper left', fontsize=10)
+    return _png(fig)
+
+
+def _render_latency_histogram(latencies, target):
+    fig, ax = _new_figure(target)
+    ax.hist(latencies, bins=min(30, max(5, len(latencies) // 3)), color="#FF9800", edgecolor="white")
+    median = sorted(latencies)[len(latencies) // 2]
+    ax.axvline(median, color="#333333", linestyle="--", label=f"median {median:.1f} hrs")
+    ax.set_xlabel("Hours to first non-author review", fontsize=12)
+    ax.set_ylabel("Pull requests", fontsize=12)
+    ax.set_title("Review Latency Distribution", fontsize=14, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+    ax.legend(loc='upper right', fontsize=10)
+    return _png(fig)
+
+
+def _render_churn_scatter(points, target):
+    fig, ax = _new_figure(target)
+    ax.scatter(points["files"], points["churn"], s=12, alpha=0.5, color="#607D8B", label="Pull requests")
+    if points["outlier_files"]:
+        ax.scatter(points["outlier_files"], points["outlier_churn"], s=40, color="#F44336", label="Churn outliers")
+        labelled = zip(points["outlier_files"], points["outlier_churn"], points["outlier_labels"][:CHART_SCATTER_LABELS])
+        for files, churn, label in labelled:
+            ax.annotate(label, (files, churn), xytext=(4, 4), textcoords="offset points", fontsize=8)
+    ax.set_xlabel("Files changed", fontsize=12)
+    ax.set_ylabel("Lines changed", fontsize=12)
+    ax.set_yscale("symlog")
+    ax.set_title("PR Churn vs Files Changed", fontsize=14, fontweight='bold')
+    ax.grid(linestyle='--', alpha=0.6)
+    ax.legend(loc='lower right', fontsize=10)
+    return _png(fig)
+
 
-    plt.xticks(ticks=x, labels=authors, rotation=45, ha='right', fontsize=10)
-    plt.yticks(fontsize=10)
-    plt.ylabel("Total Contributions", fontsize=12)
-    plt.title("Weekly Code Contributions by Author", fontsize=14, fontweight='bold')  # removed 📊 for compatibility
-    plt.grid(axis='y', linestyle='--', alpha=0.6)
-    plt.legend(loc='upper right', fontsize=10)
-    plt.tight_layout()
+CHART_RENDERERS = {
+    "contributions": _render_contributions,
+    "trends": _render_trends,
+    "review_latency": _render_latency_histogram,
+    "churn_scatter": _render_churn_scatter
+}
 
+
+def render_chart(kind, data, target="slack"):
+    # Module-level so worker processes can unpickle it
+    return CHART_RENDERERS[kind](data, target)
+
+
+def render_contribution_chart(per_author_diff: dict, target="slack"):
+    # PNG bytes ready for upload_chart_to_slack, or None when there's nothing to plot
+    if not per_author_diff:
+        return None
+    rows = collapse_authors(per_author_diff)
+    if not any(r[1] for r in rows):
+        return None  # All zeros
+
+    key = chart_key("contributions", rows, target)
+    png = _cache_get(key)
+    if png:
+        return png
     try:
-        plt.savefig(filename, dpi=300)
+        png = _render_contributions(rows, target)
     except Exception as e:
-        print(f"⚠️ Error saving chart: {e}")
+        print(f"⚠️ Error rendering chart: {e}")
         return None
-    finally:
-        plt.close()
+    _cache_put(key, png)
+    return png
+
 
+def generate_contribution_chart(per_author_diff: dict, filename="contributions.png"):
+    # File output for scripts; the bot uploads render_contribution_chart bytes directly
+    png = render_contribution_chart(per_author_diff, target="file")
+    if not png:
+        return None
+    try:
+        with open(filename, "wb") as f:
+            f.write(png)
+    except Exception as e:
+        print(f"⚠️ Error saving chart: {e}")
+        return None
     return filename
+
+
+def report_chart_jobs(state, trend=None):
+    # {chart name: (kind, data)} for everything this report has data for.
+    # trend: weekly_trend() rows for the report's repos.
+    jobs = {}
+    per_author = state.get("per_author_diff") or {}
+    rows = collapse_authors(per_author) if isinstance(per_author, dict) else []
+    if any(r[1] for r in rows):
+        jobs["contributions"] = ("contributions", rows)
+    if trend and len(trend) >= 2:
+        jobs["trends"] = ("trends", trend)
+    latencies = state.get("review_latencies") or []
+    if len(latencies) >= 2:
+        jobs["review_latency"] = ("review_latency", latencies)
+
+    table = state.get("event_table")
+    if table is not None and len(table):
+        stride = max(1, len(table) // CHART_SCATTER_MAX_POINTS)
+        outliers = state.get("churn_outliers", [])
+        jobs["churn_scatter"] = ("churn_scatter", {
+            "files": table.files_changed[::stride].tolist(),
+            "churn": table.churn[::stride].tolist(),
+            "outlier_files": [o["files_changed"] for o in outliers],
+            "outlier_churn": [o["lines_changed"] for o in outliers],
+            "outlier_labels": [o["id"] for o in outliers]
+        })
+    return jobs
+
+
+def _get_pool():
+    # Spawned (not forked) workers: the bot process runs threads, and forking
+    # a threaded process can copy held locks into the child
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=CHART_RENDER_WORKERS, mp_context=get_context("spawn"))
+        return _pool
+
+
+def _reset_pool(pool):
+    # One dead worker (OOM, a crash in Agg) breaks the whole pool for good;
+    # dropping it lets the next render spawn a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_result(future, pool, kind, data, target):
+    # The worker's PNG, or an inline render if the pool broke under it
+    if future is not None:
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _reset_pool(pool)
+    return render_chart(kind, data, target)
+
+
+def render_charts(jobs, target="slack"):
+    # Renders {name: (kind, data)} across the process pool, since matplotlib
+    # holds the GIL while drawing. Returns ({name: PNG bytes}, seconds).
+    started = time.perf_counter()
+    charts = {}
+    pending = {}
+    for name, (kind, data) in jobs.items():
+        key = chart_key(kind, data, target)
+        png = _cache_get(key)
+        if png:
+            charts[name] = png
+        else:
+            pending[name] = (key, kind, data)
+
+    pool = None
+    futures = {}
+    if len(pending) > 1 and CHART_RENDER_WORKERS > 1:
+        try:
+            pool = _get_pool()
+            futures = {name: pool.submit(render_chart, kind, data, target) for name, (_, kind, data) in pending.items()}
+        except Exception as e:
+            print(f"⚠️ Chart process pool unavailable, rendering inline: {e}")
+            if isinstance(e, BrokenProcessPool):
+                _reset_pool(pool)
+
+    for name, (key, kind, data) in pending.items():
+        try:
+            png = _render_result(futures.get(name), pool, kind, data, target)
+        except Exception as e:
+            print(f"⚠️ Error rendering {name} chart: {e}")
+            continue
+        _cache_put(key, png)
+        charts[name] = png
+    seconds = time.perf_counter() - started
+    observe("chart_render_seconds", seconds)
+    return charts, seconds
@@ -0,0 +1,214 @@
+import os
+from array import array
+
+import numpy as np
+
+OUTLIER_METHODS = [m.strip() for m in os.getenv("OUTLIER_METHODS", "zscore,mad,baseline").split(",") if m.strip()]
+ZSCORE_THRESHOLD = 2.0
+MAD_THRESHOLD = 3.5  # modified z-score cut-off (Iglewicz & Hoaglin)
+BASELINE_FACTOR = float(os.getenv("OUTLIER_BASELINE_FACTOR", "3"))
+BASELINE_MIN_PRS = 5
+
+
+class EventTable:
+    # Columnar view of PR events: one NumPy array per field, with authors
+    # factorized to integer codes so per-author sums are a single bincount.
+
+    def __init__(self, author_names, author_codes, pr_numbers, additions, deletions, files_changed, repos=None):
+        self.author_names = list(author_names)
+        self.author_codes = np.asarray(author_codes, dtype=np.int32)
+        self.pr_numbers = np.asarray(pr_numbers, dtype=np.int64)
+        self.additions = np.asarray(additions, dtype=np.int64)
+        self.deletions = np.asarray(deletions, dtype=np.int64)
+        self.files_changed = np.asarray(files_changed, dtype=np.int64)
+        self.repos = repos
+
+    @classmethod
+    def from_events(cls, events):
+        codes_by_author = {}
+        n = len(events)
+        author_codes = np.empty(n, dtype=np.int32)
+        pr_numbers = np.empty(n, dtype=np.int64)
+        additions = np.empty(n, dtype=np.int64)
+        deletions = np.empty(n, dtype=np.int64)
+        files_changed = np.empty(n, dtype=np.int64)
+        repos = []
+        for i, e in enumerate(events):
+            author_codes[i] = codes_by_author.setdefault(e.get("author", "unknown"), len(codes_by_author))
+            pr_numbers[i] = e.get("pr_number") or -1
+            additions[i] = e.get("additions", 0)
+            deletions[i] = e.get("deletions", 0)
+            files_changed[i] = e.get("files_changed", 0)
+            repos.append(e.get("repo"))
+        return cls(list(codes_by_author), author_codes, pr_numbers, additions, deletions, files_changed, repos)
+
+    @classmethod
+    def concat(cls, tables):
+        # Re-factorizes authors so the same login gets one code across tables
+        tables = [t for t in tables if len(t)]
+        codes_by_author = {}
+        remapped = []
+        for t in tables:
+            mapping = np.array([codes_by_author.setdefault(name, len(codes_by_author)) for name in t.author_names], dtype=np.int32)
+            remapped.append(mapping[t.author_codes])
+
+        def join(columns, dtype):
+            return np.concatenate(columns) if columns else np.empty(0, dtype=dtype)
+
+        return cls(
+            list(codes_by_author),
+            join(remapped, np.int32),
+            join([t.pr_numbers for t in tables], np.int64),
+            join([t.additions for t in tables], np.int64),
+            join([t.deletions for t in tables], np.int64),
+            join([t.files_changed for t in tables], np.int64),
+            [repo for t in tables for repo in (t.repos or [None] * len(t))]
+        )
+
+    def iter_events(self):
+        # Event dicts one row at a time, for the DB layer; nothing is materialized
+        columns = zip(self.author_codes.tolist(), self.pr_numbers.tolist(), self.additions.tolist(),
+                      self.deletions.tolist(), self.files_changed.tolist(), self.repos or [None] * len(self))
+        for code, pr_number, additions, deletions, files_changed, repo in columns:
+            yield {
+                "type": "PullRequestEvent",
+                "author": self.author_names[code],
+                "additions": additions,
+                "deletions": deletions,
+                "files_changed": files_changed,
+                "pr_number": pr_number,
+                "repo": repo
+            }
+
+    def __len__(self):
+        return len(self.author_codes)
+
+    @property
+    def churn(self):
+        return self.additions + self.deletions
+
+    def totals(self):
+        return int(self.additions.sum()), int(self.deletions.sum())
+
+    def per_author(self):
+        # Sorted by total churn, highest first (same shape diff_analyst always produced)
+        size = len(self.author_names)
+        adds = np.bincount(self.author_codes, weights=self.additions, minlength=size).astype(np.int64)
+        dels = np.bincount(self.author_codes, weights=self.deletions, minlength=size).astype(np.int64)
+        files = np.bincount(self.author_codes, weights=self.files_changed, minlength=size).astype(np.int64)
+        order = np.argsort(-(adds + dels), kind="stable")
+        return {
+            self.author_names[i]: {"additions": int(adds[i]), "deletions": int(dels[i]), "files_touched": int(files[i])}
+            for i in order
+        }
+
+
+class EventTableBuilder:
+    # Appends PR events straight into typed arrays (8 bytes per value) as the
+    # harvester streams them, instead of collecting a list of dicts first
+    def __init__(self):
+        self.codes_by_author = {}
+        self.author_codes = array("i")
+        self.pr_numbers = array("q")
+        self.additions = array("q")
+        self.deletions = array("q")
+        self.files_changed = array("q")
+        self.repos = []
+
+    def add(self, author, pr_number, additions, deletions, files_changed, repo=None):
+        self.author_codes.append(self.codes_by_author.setdefault(author, len(self.codes_by_author)))
+        self.pr_numbers.append(pr_number if pr_number is not None else -1)
+        self.additions.append(additions or 0)
+        self.deletions.append(deletions or 0)
+        self.files_changed.append(files_changed or 0)
+        self.repos.append(repo)
+
+    def __len__(self):
+        return len(self.author_codes)
+
+    def build(self):
+        # NumPy wraps the array buffers without copying them
+        return EventTable(list(self.codes_by_author), self.author_codes, self.pr_numbers,
+                          self.additions, self.deletions, self.files_changed, self.repos)
+
+
+def zscores(churn):
+    if len(churn) < 2:
+        return np.zeros(len(churn))
+    std = churn.std(ddof=1) or 1.0
+    return (churn - churn.mean()) / std
+
+
+def mad_scores(churn):
+    # Modified z-score: robust to the very outliers we're looking for
+    if len(churn) == 0:
+        return np.zeros(0)
+    median = np.median(churn)
+    mad = np.median(np.abs(churn - median))
+    if mad == 0:
+        return np.zeros(len(churn))
+    return 0.6745 * (churn - median) / mad
+
+
+def detect_churn_outliers(table, baselines=None, methods=None):
+    # baselines: {author: (median_pr_churn, pr_count)} from past reports
+    methods = methods or OUTLIER_METHODS
+    churn = table.churn
+    z = zscores(churn.astype(np.float64))
+    mad = mad_scores(churn.astype(np.float64))
+
+    flags = {}
+    if "zscore" in methods:
+        flags["zscore"] = z > ZSCORE_THRESHOLD
+    if "mad" in methods:
+        flags["mad"] = mad > MAD_THRESHOLD
+    if "baseline" in methods and baselines:
+        limits = np.array([
+            BASELINE_FACTOR * baselines[name][0] if name in baselines and baselines[name][1] >= BASELINE_MIN_PRS else np.inf
+            for name in table.author_names
+        ])
+        flags["baseline"] = churn > limits[table.author_codes]
+    if not flags:
+        return []
+
+    flagged = np.flatnonzero(np.logical_or.reduce(list(flags.values())))
+    # Highest z first; pull the flagged rows out as Python lists in one go
+    # rather than indexing NumPy scalars per outlier
+    flagged = flagged[np.argsort(-z[flagged], kind="stable")]
+    columns = zip(
+        flagged.tolist(),
+        table.pr_numbers[flagged].tolist(),
+        table.author_codes[flagged].tolist(),
+        table.additions[flagged].tolist(),
+        table.deletions[flagged].tolist(),
+        table.files_changed[flagged].tolist(),
+        np.round(z[flagged], 2).tolist(),
+        np.round(mad[flagged], 2).tolist(),
+        zip(*(mask[flagged].tolist() for mask in flags.values()))
+    )
+    names = list(flags)
+
+    outliers = []
+    seen = set()
+    for i, pr_number, code, additions, deletions, files_changed, z_score, mad_score, hits in columns:
+        if pr_number < 0:
+            pr_id = f"event {i}"
+        elif table.repos and table.repos[i]:
+            pr_id = f"{table.repos[i]}#{pr_number}"
+        else:
+            pr_id = f"PR #{pr_number}"
+        if pr_id in seen:
+            continue
+        seen.add(pr_id)
+        outliers.append({
+            "id": pr_id,
+            "author": table.author_names[code],
+            "additions": additions,
+            "deletions": deletions,
+            "files_changed": files_changed,
+            "lines_changed": additions + deletions,
+            "z_score": z_score,
+            "mad_score": mad_score,
+            "flags": [name for name, hit in zip(names, hits) if hit]
+        })
+    return outliers
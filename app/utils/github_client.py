@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+import aiohttp
+
+from app.utils.http_cache import ResponseCache
+from app.utils.metrics import inc, observe
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "10"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "5"))
+GITHUB_MAX_RATE_LIMIT_WAIT = float(os.getenv("GITHUB_MAX_RATE_LIMIT_WAIT", "900"))
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50"))
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+GITHUB_RECORD_PATH = os.getenv("GITHUB_RECORD_PATH")  # capture responses into a replay fixture archive
+SECONDARY_RATE_LIMIT_WAIT = 60.0  # GitHub asks for at least a minute when no Retry-After is sent
+
+
+def endpoint_label(url):
+    # Low-cardinality metric label: /repos/o/r/pulls/12/reviews -> pulls/:n/reviews
+    path = url.split("://", 1)[-1].split("/", 1)[-1].split("?", 1)[0].strip("/").split("/")
+    if path[:1] == ["repos"]:
+        path = path[3:]
+    return "/".join(":n" if part.isdigit() else part for part in path) or "/"
+
+
+class GitHubError(Exception):
+    # A page GitHub didn't return: an error status, an unreadable body or
+    # retries used up. Pagination raises it rather than treating the page as
+    # the end of the data, so callers can leave their cursors where they were.
+    def __init__(self, url, status=None):
+        super().__init__(f"GitHub request failed ({status or 'no response'}): {url}")
+        self.url = url
+        self.status = status
+
+
+class GitHubClient:
+    # Pooled aiohttp session shared by every harvester call. The semaphore caps
+    # in-flight requests; retries back off on 5xx and honour GitHub's primary
+    # (X-RateLimit-*) and secondary (Retry-After, else a minute) rate limits. A rate-limit pause
+    # applies to every coroutine using the client, so concurrent repo harvests
+    # share one budget.
+
+    def __init__(self, token=None, max_concurrency=None, max_retries=None, backoff_base=1.0, cache=None):
+        self.token = token
+        self.cache = cache if cache is not None else (ResponseCache() if HTTP_CACHE_ENABLED else None)
+        self.max_concurrency = max_concurrency or GITHUB_MAX_CONCURRENCY
+        self.max_retries = GITHUB_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.session = None
+        self.semaphore = None
+        self.stats = {"calls": 0, "retries": 0, "bytes": 0, "rate_limited": 0, "seconds": 0.0}
+        self.paused_until = 0.0
+        self.rate_limit_remaining = None
+        self.recorder = None
+        if GITHUB_RECORD_PATH:
+            from app.utils.github_replay import FixtureRecorder
+            self.recorder = FixtureRecorder(GITHUB_RECORD_PATH)
+
+    async def __aenter__(self):
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(
+            headers=headers,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        if self.cache:
+            self.cache.close()
+        if self.recorder and GITHUB_RECORD_PATH:
+            self.recorder.close()
+
+    def _rate_limit_delay(self, status, headers, body=b"", attempt=0):
+        # Retry-After only means "rate limited" on 403/429, or "overloaded" on 503
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None and status in (403, 429, 503):
+            return float(retry_after)
+        if status in (403, 429) and headers.get("X-RateLimit-Remaining") == "0":
+            reset_at = float(headers.get("X-RateLimit-Reset", time.time() + 60))
+            return max(reset_at - time.time(), 1.0)
+        # Secondary limit with budget left and no Retry-After: a minute, doubled
+        # on each retry, capped at the longest pause we're willing to take
+        message = (body or b"").lower()
+        if status == 429 or (status == 403 and (b"secondary rate limit" in message or b"abuse" in message)):
+            return min(SECONDARY_RATE_LIMIT_WAIT * 2 ** attempt, GITHUB_MAX_RATE_LIMIT_WAIT)
+        return None
+
+    def _record_rate_limit(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        self.rate_limit_remaining = int(remaining)
+        # Stop issuing requests before the budget is gone rather than after a 403
+        if self.rate_limit_remaining <= GITHUB_RATE_LIMIT_RESERVE and headers.get("X-RateLimit-Reset"):
+            reset_in = float(headers["X-RateLimit-Reset"]) - time.time()
+            if 0 < reset_in <= GITHUB_MAX_RATE_LIMIT_WAIT:
+                self.paused_until = max(self.paused_until, time.time() + reset_in)
+
+    async def _wait_for_budget(self):
+        delay = self.paused_until - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def request(self, method, url, params=None, json_body=None, headers=None):
+        attempt = 0
+        endpoint = endpoint_label(url)
+        while True:
+            await self._wait_for_budget()
+            try:
+                async with self.semaphore:
+                    self.stats["calls"] += 1
+                    started = time.perf_counter()
+                    async with self.session.request(method, url, params=params, json=json_body, headers=headers) as response:
+                        body = await response.read()
+                        status, response_headers = response.status, response.headers
+                    self._record_call(endpoint, status, len(body), time.perf_counter() - started)
+                    if self.recorder:
+                        self.recorder.record(method, url, params, json_body, status, response_headers, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                inc("github_requests_total", endpoint=endpoint, status="error")
+                if attempt >= self.max_retries:
+                    print(f"❌ GitHub request failed: {url} ({e})")
+                    return None, None, {}
+                await self._backoff(attempt)
+                attempt += 1
+                continue
+
+            self._record_rate_limit(response_headers)
+            delay = self._rate_limit_delay(status, response_headers, body, attempt)
+            if delay is not None and attempt < self.max_retries:
+                self.stats["rate_limited"] += 1
+                if delay > GITHUB_MAX_RATE_LIMIT_WAIT:
+                    print(f"⚠️ GitHub rate limit resets in {delay:.0f}s, giving up on {url}")
+                    return status, None, response_headers
+                print(f"⏳ GitHub rate limited, pausing all requests for {delay:.1f}s")
+                self.paused_until = max(self.paused_until, time.time() + delay)
+                attempt += 1
+                self.stats["retries"] += 1
+                inc("github_retries_total")
+                continue
+
+            if status >= 500 and attempt < self.max_retries:
+                await self._backoff(attempt)
+                attempt += 1
+                continue
+
+            data = None
+            if body:
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    data = None
+            return status, data, response_headers
+
+    def _record_call(self, endpoint, status, size, seconds):
+        self.stats["bytes"] += size
+        self.stats["seconds"] += seconds
+        inc("github_requests_total", endpoint=endpoint, status=status)
+        inc("github_response_bytes_total", size)
+        observe("github_request_seconds", seconds, endpoint=endpoint)
+
+    async def _backoff(self, attempt):
+        inc("github_retries_total")
+        self.stats["retries"] += 1
+        await asyncio.sleep(self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base))
+
+    async def get(self, url, params=None, immutable=False):
+        if not self.cache:
+            return await self.request("GET", url, params=params)
+
+        key = self.cache.key(url, params)
+        entry = self.cache.lookup(key)
+        if entry and entry["immutable"]:
+            self.cache.stats["hits"] += 1
+            inc("http_cache_lookups_total", result="hit")
+            return 200, entry["data"], {}
+
+        status, data, headers = await self.request("GET", url, params=params, headers=self.cache.conditional_headers(entry))
+        if status == 304 and entry:
+            self.cache.stats["revalidated"] += 1
+            inc("http_cache_lookups_total", result="revalidated")
+            self.cache.touch(key, immutable)
+            return 200, entry["data"], headers
+        self.cache.stats["misses"] += 1
+        inc("http_cache_lookups_total", result="miss")
+        if status == 200 and data is not None:
+            self.cache.store(key, data, headers, immutable)
+        return status, data, headers
+
+    async def get_json(self, url, params=None, default=None, immutable=False):
+        status, data, _ = await self.get(url, params=params, immutable=immutable)
+        if status != 200 or data is None:
+            return default
+        return data
+
+    async def get_page(self, url, params=None, immutable=False):
+        # get_json for data that must not silently come back empty
+        status, data, _ = await self.get(url, params=params, immutable=immutable)
+        if status != 200 or data is None:
+            raise GitHubError(url, status)
+        return data
+
+    async def graphql(self, query, variables=None):
+        status, data, _ = await self.request("POST", f"{GITHUB_API_URL}/graphql", json_body={"query": query, "variables": variables or {}})
+        if status != 200 or not data:
+            print(f"❌ GitHub GraphQL request failed with status {status}")
+            return None
+        # Errors often come with partial data (a deleted author, a field hidden
+        # by permissions): the data is returned and the caller decides
+        if data.get("errors"):
+            print(f"⚠️ GitHub GraphQL errors: {data['errors']}")
+        return data.get("data")
+
+    async def paginate(self, url, max_pages=5, params=None, immutable=False):
+        all_data = []
+        for page in range(1, max_pages + 1):
+            data = await self.get_page(url, params={**(params or {}), "page": page}, immutable=immutable)
+            if not isinstance(data, list) or not data:
+                break
+            all_data.extend(data)
+            # A short page is the last one; no need to ask for an empty one after it
+            if len(data) < int((params or {}).get("per_page", 30)):
+                break
+        return all_data
+
+    async def iter_recent(self, url, since_iso, date_key="created_at", params=None, page_stats=None):
+        # Yields one page at a time so callers can process and drop it.
+        # Pages must be sorted newest-first on date_key; stops at the first older item.
+        # A failed page raises GitHubError, so finishing without one means
+        # everything since since_iso was seen.
+        # page_stats["pages"] counts the pages this call fetched (self.stats is shared).
+        page = 1
+        while True:
+            if page_stats is not None:
+                page_stats["pages"] = page_stats.get("pages", 0) + 1
+            data = await self.get_page(url, params={**(params or {}), "page": page})
+            if not isinstance(data, list) or not data:
+                break
+
+            filtered = []
+            for item in data:
+                item_date = item.get(date_key)
+                if item_date and item_date > since_iso:
+                    filtered.append(item)
+                else:
+                    break
+
+            if not filtered:
+                break
+
+            yield filtered
+            if len(filtered) < len(data):
+                break
+
+            page += 1
+
+    async def paginate_recent(self, url, since_iso, date_key="created_at", params=None, page_stats=None):
+        all_data = []
+        async for page in self.iter_recent(url, since_iso, date_key, params, page_stats):
+            all_data.extend(page)
+        return all_data
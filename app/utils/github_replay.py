@@ -0,0 +1,180 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from aiohttp import web
+from yarl import URL
+
+# Offline GitHub: record real API responses into a gzip JSONL fixture archive
+# (GITHUB_RECORD_PATH on GitHubClient), then serve them from a local aiohttp
+# stub server. Requests missing from the archive can fall through to a
+# responder, e.g. seed.seed_fake_github_events.synthetic_responder.
+#
+# Archive line: {"key", "status", "headers", "body"}; key is method + path +
+# sorted query (+ request body hash for GraphQL POSTs), host-independent.
+
+RECORDED_HEADERS = ["ETag", "Link", "Last-Modified"]
+
+
+def replay_key(method, path, query, body=None):
+    key = f"{method.upper()} {path}"
+    if query:
+        key += "?" + urlencode(sorted((k, str(v)) for k, v in query))
+    if body:
+        key += " #" + hashlib.sha1(body if isinstance(body, bytes) else body.encode()).hexdigest()[:16]
+    return key
+
+
+class FixtureRecorder:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.file = gzip.open(path, "at")
+        self.lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, method, url, params, json_body, status, headers, body):
+        # Only full 200 responses are worth replaying; record with
+        # HTTP_CACHE_ENABLED=0 so cached or revalidated (304) calls aren't skipped
+        if status != 200:
+            return
+        full = URL(url).update_query({k: str(v) for k, v in (params or {}).items()})
+        request_body = json.dumps(json_body, sort_keys=True) if json_body is not None else None
+        line = json.dumps({
+            "key": replay_key(method, full.path, full.query.items(), request_body),
+            "status": status,
+            "headers": {h: headers[h] for h in RECORDED_HEADERS if h in headers},
+            "body": body.decode("utf-8", errors="replace")
+        })
+        with self.lock:
+            self.file.write(line + "\n")
+            self.recorded += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def load_fixtures(path):
+    fixtures = {}
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            entry = json.loads(line)
+            fixtures[entry["key"]] = entry  # later recordings win
+    return fixtures
+
+
+def make_app(fixtures=None, responder=None, latency=0.0):
+    # Stub GitHub API. latency (seconds) is added to every response to
+    # approximate network round trips in benchmarks.
+    fixtures = fixtures or {}
+    stats = {"served": 0, "replayed": 0, "synthetic": 0, "misses": 0}
+
+    async def handle(request):
+        if latency:
+            await asyncio.sleep(latency)
+        body = await request.text() if request.method == "POST" else None
+        if body:
+            body = json.dumps(json.loads(body), sort_keys=True)
+        stats["served"] += 1
+        entry = fixtures.get(replay_key(request.method, request.path, request.query.items(), body))
+        if entry:
+            stats["replayed"] += 1
+            return web.Response(status=entry["status"], text=entry["body"], headers=entry["headers"],
+                                content_type="application/json")
+        if responder:
+            status, data = responder(request.method, request.path, dict(request.query), body)
+            stats["synthetic"] += 1
+            return web.json_response(data, status=status)
+        stats["misses"] += 1
+        return web.json_response({"message": "Not Found (no fixture recorded)"}, status=404)
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_route("*", "/{tail:.*}", handle)
+    return app
+
+
+def serve_in_background(app, host="127.0.0.1", port=0):
+    # Runs the stub server on its own event loop thread; returns (base_url, stop)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    async def start():
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        state["runner"] = runner
+        state["url"] = f"http://{host}:{runner.addresses[0][1]}"
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, name="github-stub", daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return state["url"], stop
+
+
+@contextmanager
+def use_api_url(url):
+    # Points the already-imported harvester modules at a stub server
+    from app.utils import github_client
+    from app.agents import data_harvester
+    previous = github_client.GITHUB_API_URL
+    github_client.GITHUB_API_URL = data_harvester.GITHUB_API_URL = url
+    try:
+        yield
+    finally:
+        github_client.GITHUB_API_URL = data_harvester.GITHUB_API_URL = previous
+
+
+def record_synthetic_fixtures(synthetic_repo, out):
+    # Writes the archive a fresh REST harvest of synthetic_repo would need, by
+    # recording a real harvest against the synthetic server
+    import tempfile
+    import app.db as db
+    from app.agents import data_harvester
+    from app.utils.github_client import GitHubClient
+
+    def respond(method, path, query, body):
+        data = synthetic_repo.respond(path, query)
+        return (200, data) if data is not None else (404, {"message": "Not Found"})
+
+    url, stop = serve_in_background(make_app(responder=respond))
+    previous_db = db.DB_PATH
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "record.db")
+    if os.path.exists(out):
+        os.remove(out)
+    recorder = FixtureRecorder(out)
+
+    async def harvest():
+        async with GitHubClient(cache=False) as client:
+            client.recorder = recorder
+            await data_harvester.harvest_repos(client, [synthetic_repo.repo], max_parallel=1)
+
+    try:
+        db.init_db()
+        with use_api_url(url):
+            asyncio.run(harvest())
+    finally:
+        recorder.close()
+        db.DB_PATH = previous_db
+        stop()
+    return recorder.recorded
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import time
+from urllib.parse import urlencode
+
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "github_cache.db")
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", str(7 * 24 * 3600)))
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))
+
+
+class ResponseCache:
+    # On-disk GitHub response cache keyed by URL. Mutable entries are revalidated
+    # with If-None-Match / If-Modified-Since (a 304 does not count against the
+    # rate limit); immutable entries (closed/merged PR sub-resources) are served
+    # without a request. Mutable entries are evicted ttl seconds after their last
+    # fetch, and the least recently used ones are dropped once the cache grows
+    # past max_bytes.
+
+    def __init__(self, path=None, ttl=None, max_mb=None):
+        self.path = path or HTTP_CACHE_PATH
+        self.ttl = HTTP_CACHE_TTL if ttl is None else ttl
+        self.max_bytes = int((HTTP_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body TEXT,
+            size INTEGER,
+            immutable INTEGER,
+            fetched_at REAL,
+            accessed_at REAL
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def lookup(self, key):
+        row = self.conn.execute(
+            "SELECT etag, last_modified, body, immutable FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        etag, last_modified, body, immutable = row
+        self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return {"etag": etag, "last_modified": last_modified, "data": json.loads(body), "immutable": bool(immutable)}
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key, data, headers, immutable=False):
+        body = json.dumps(data)
+        now = time.time()
+        self.conn.execute("""
+            INSERT OR REPLACE INTO responses (key, etag, last_modified, body, size, immutable, fetched_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (key, headers.get("ETag"), headers.get("Last-Modified"), body, len(body), int(immutable), now, now))
+        self.conn.commit()
+
+    def touch(self, key, immutable=False):
+        now = time.time()
+        self.conn.execute(
+            "UPDATE responses SET fetched_at = ?, accessed_at = ?, immutable = MAX(immutable, ?) WHERE key = ?",
+            (now, now, int(immutable), key)
+        )
+        self.conn.commit()
+
+    def evict(self):
+        cursor = self.conn.execute(
+            "DELETE FROM responses WHERE immutable = 0 AND fetched_at < ?", (time.time() - self.ttl,)
+        )
+        evicted = cursor.rowcount
+
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            stale_keys = []
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                stale_keys.append((key,))
+                total -= size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+            evicted += len(stale_keys)
+
+        self.conn.commit()
+        self.stats["evictions"] += evicted
+        return evicted
+
+    def close(self):
+        self.evict()
+        self.conn.close()
@@ -0,0 +1,158 @@
+# === Author identity resolution ===
+import os
+import re
+import threading
+
+# Mailmap-style file, one person per line (repeat a canonical name/email on
+# more lines to add aliases, as in git's .mailmap):
+#   Aliia Khasanova <aliia@example.com> @akhasanova A. Khasanova <aliia@old.example.com> [team: compiler]
+#   tensorflower-gardener @tensorflower-gardener [bot]
+IDENTITY_MAP_PATH = os.getenv("IDENTITY_MAP_PATH", "identities.mailmap")
+# Team membership without a map file: "team:login,login;team:login"
+TEAM_MEMBERS = os.getenv("TEAM_MEMBERS", "")
+
+TOKEN = re.compile(r"<([^>]*)>|@([\w.-]+(?:\[bot\])?)|\[([^\]]*)\]|([^<@\[]+)")
+
+
+class Person:
+    __slots__ = ("name", "email", "team", "bot")
+
+    def __init__(self, name, email=None, team=None, bot=False):
+        self.name = name
+        self.email = email
+        self.team = team
+        self.bot = bot
+
+
+def key(value):
+    # Logins, emails and names share one case-insensitive key space
+    return str(value).strip().lstrip("@").lower()
+
+
+def parse_line(line):
+    # -> (names, emails, logins, team, bot); the first name/email is canonical
+    names, emails, logins, team, bot = [], [], [], None, False
+    for email, login, tag, text in TOKEN.findall(line):
+        if email.strip():
+            emails.append(email.strip())
+        elif login:
+            logins.append(login)
+        elif tag:
+            label, _, value = (part.strip() for part in tag.partition(":"))
+            if label.lower() == "bot":
+                bot = True
+            elif label.lower() == "team" and value:
+                team = value
+        elif text.strip():
+            names.append(text.strip())
+    return names, emails, logins, team, bot
+
+
+class IdentityIndex:
+    # One dict from every known login, email and name to its Person, loaded
+    # once at startup. refresh() costs a stat() when the map is unchanged;
+    # when lines were only appended, just those are parsed, and any other
+    # edit rebuilds the index.
+    def __init__(self, path=IDENTITY_MAP_PATH, team_members=TEAM_MEMBERS):
+        self.path = path
+        self.team_members = team_members
+        self.lock = threading.Lock()
+        self.people = {}
+        self.loaded = ""
+        self.signature = False  # never a real signature, so the first refresh loads
+        self.refresh()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        with self.lock:
+            content = ""
+            if signature:
+                with open(self.path, encoding="utf-8") as f:
+                    content = f.read()
+            if self.loaded and content.startswith(self.loaded):
+                self._add_lines(self.people, content[len(self.loaded):])
+            else:
+                # Built aside and swapped in, so lookups never see half an index
+                people = {}
+                self._add_lines(people, content)
+                self._add_team_members(people)
+                self.people = people
+            self.loaded = content
+            self.signature = signature
+        if signature:
+            persons = {id(p) for p in self.people.values()}
+            print(f"🪪 Identity map: {len(persons)} people, {len(self.people)} aliases from {self.path}")
+        return True
+
+    def _add_lines(self, people, text):
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            names, emails, logins, team, bot = parse_line(line)
+            aliases = names + emails + logins
+            if not aliases:
+                continue
+            # Lines naming the same canonical person extend it; a team given
+            # to one of the aliases before (TEAM_MEMBERS) carries over
+            person = people.get(key(aliases[0]))
+            if person is None:
+                person = Person(names[0] if names else aliases[0], emails[0] if emails else None)
+            known_teams = [people[key(a)].team for a in aliases if key(a) in people and people[key(a)].team]
+            person.team = team or person.team or (known_teams[0] if known_teams else None)
+            person.bot = bot or person.bot
+            for alias in aliases:
+                people[key(alias)] = person
+
+    def _add_team_members(self, people):
+        for entry in self.team_members.split(";"):
+            if not entry.strip():
+                continue
+            team, _, members = (part.strip() for part in entry.partition(":"))
+            if not team or not members:
+                print(f"⚠️ Ignoring team entry '{entry.strip()}': expected team:login,login")
+                continue
+            for login in filter(None, (m.strip() for m in members.split(","))):
+                person = people.setdefault(key(login), Person(login))
+                person.team = person.team or team
+
+    def canonical(self, value):
+        person = self.people.get(key(value))
+        return person.name if person else value
+
+    def team_of(self, value):
+        person = self.people.get(key(value))
+        return person.team if person else None
+
+    def is_bot(self, login, user_type=None):
+        # GitHub's user.type (stored with each PR row, so it holds across
+        # restarts), [bot]-suffixed App accounts, plus machine users marked
+        # [bot] in the map. No substring guessing: "abbott" is a person.
+        if user_type == "Bot":
+            return True
+        person = self.people.get(key(login))
+        return bool(person and person.bot) or key(login).endswith("[bot]")
+
+
+IDENTITIES = IdentityIndex()
+
+
+def canonical_author(value):
+    return IDENTITIES.canonical(value)
+
+
+def team_of(value):
+    return IDENTITIES.team_of(value)
+
+
+def is_bot(login, user_type=None):
+    return IDENTITIES.is_bot(login, user_type)
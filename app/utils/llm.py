@@ -1,20 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
 from dotenv import load_dotenv
 load_dotenv()
 
-from together import Together
+from app.db import get_llm_response, save_llm_response
+from app.utils.metrics import inc, observe
 
-client = Together()  # uses TOGETHER_API_KEY from .env
+# LLM gateway: compact prompt, response cache keyed by prompt hash, and a hard
+# latency budget. LLM_BACKEND=stub answers locally (no network), and
+# LLM_BASE_URL can point the Together client at a local OpenAI-compatible server.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "together")
+LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.1")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_PROMPT_MAX_TOKENS = int(os.getenv("LLM_PROMPT_MAX_TOKENS", "600"))
+LLM_PROMPT_TOP_N = 10  # authors / outliers listed before the rest are summarized as counts
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_STUB_DELAY = float(os.getenv("LLM_STUB_DELAY", "0"))  # simulate a slow model offline
 
-def generate_summary_via_llm(metrics):
-    prompt = f"""Summarize this GitHub engineering activity:
+PROMPT_TEMPLATE = """Summarize this GitHub engineering activity:
 {metrics}
 
 Focus on DORA metrics and team insight. Use **hours** for latency and cycle time (not days). Keep the summary concise, under 100 words."""
-    
-    response = client.chat.completions.create(
-        model="mistralai/Mistral-7B-Instruct-v0.1",  # You can also try other Together-supported models
+
+_client = None
+_client_lock = threading.Lock()
+# Calls run here so the caller can stop waiting at the deadline; a call that
+# overruns finishes in the background and its answer still lands in the cache
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm")
+
+
+def get_client():
+    # Created on first use: importing this module must not need an API key
+    global _client
+    with _client_lock:
+        if _client is None:
+            from together import Together
+            options = {"timeout": LLM_TIMEOUT_SECONDS}
+            if LLM_BASE_URL:
+                options["base_url"] = LLM_BASE_URL
+            _client = Together(**options)  # uses TOGETHER_API_KEY from .env
+        return _client
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1  # ~4 characters per token for English/JSON
+
+
+def compact_metrics(metrics, top_n):
+    # Scalars as-is; author, outlier and hotspot lists trimmed to top_n short rows
+    compact = {k: v for k, v in metrics.items() if k not in ("per_author", "churn_outliers", "hotspots")}
+    authors = sorted(metrics.get("per_author", []), key=lambda a: a["additions"] + a["deletions"], reverse=True)
+    compact["top_authors"] = [[a["author"], a["additions"], a["deletions"], a.get("files_touched", 0)] for a in authors[:top_n]]
+    if len(authors) > top_n:
+        compact["other_authors"] = len(authors) - top_n
+    outliers = metrics.get("churn_outliers", [])
+    compact["churn_outliers"] = [[o.get("id"), o.get("author"), o.get("lines_changed")] for o in outliers[:top_n]]
+    if len(outliers) > top_n:
+        compact["other_outliers"] = len(outliers) - top_n
+    if metrics.get("hotspots"):
+        compact["hotspots"] = [[f["path"], f["prs"], f["churn"], f["owner_share"]] for f in metrics["hotspots"][:top_n]]
+    return compact
+
+
+def build_prompt(metrics, max_tokens=LLM_PROMPT_MAX_TOKENS):
+    # Halves the listed authors/outliers until the prompt fits the token budget
+    top_n = LLM_PROMPT_TOP_N
+    while True:
+        body = json.dumps(compact_metrics(metrics, top_n), separators=(",", ":"), default=str)
+        prompt = PROMPT_TEMPLATE.format(metrics=body)
+        if estimate_tokens(prompt) <= max_tokens or top_n == 0:
+            return prompt
+        top_n //= 2
+
+
+def stub_completion(prompt):
+    # Deterministic offline "model": restates a few numbers from the prompt
+    if LLM_STUB_DELAY:
+        time.sleep(LLM_STUB_DELAY)
+    metrics = json.loads(prompt.split("\n")[1])
+    return (
+        f"(stub) {metrics.get('merged_prs', 0)} of {metrics.get('total_prs', 0)} PRs merged; "
+        f"review latency {metrics.get('review_latency', 0)} hrs, cycle time {metrics.get('cycle_time', 0)} hrs, "
+        f"{metrics.get('ci_failures', 0)} CI failures."
+    )
+
+
+def complete(prompt):
+    if LLM_BACKEND == "stub":
+        return stub_completion(prompt)
+    response = get_client().chat.completions.create(
+        model=LLM_MODEL,
         messages=[
             {"role": "user", "content": prompt}
         ]
     )
     return response.choices[0].message.content
+
+
+def _complete_and_cache(prompt, prompt_hash):
+    text = complete(prompt)
+    if text:
+        save_llm_response(prompt_hash, f"{LLM_BACKEND}:{LLM_MODEL}", text)
+    return text
+
+
+def generate_summary_via_llm(metrics, timeout=None):
+    # Returns the model's summary, or None on timeout/error so callers fall back
+    prompt = build_prompt(metrics)
+    prompt_hash = hashlib.sha256(f"{LLM_BACKEND}|{LLM_MODEL}|{prompt}".encode()).hexdigest()
+    cached = get_llm_response(prompt_hash, LLM_CACHE_TTL)
+    if cached:
+        inc("llm_requests_total", outcome="cached")
+        print("🧠 LLM summary served from cache.")
+        return cached
+
+    budget = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.perf_counter()
+    future = _executor.submit(_complete_and_cache, prompt, prompt_hash)
+    try:
+        text = future.result(timeout=budget)
+    except FutureTimeout:
+        inc("llm_requests_total", outcome="timeout")
+        print(f"⚠️ LLM summary exceeded the {budget:g}s budget; skipping it.")
+        return None
+    except Exception as e:
+        inc("llm_requests_total", outcome="error")
+        print(f"⚠️ LLM summary failed: {e}")
+        return None
+    seconds = time.perf_counter() - started
+    inc("llm_requests_total", outcome="ok")
+    observe("llm_request_seconds", seconds)
+    print(f"🧠 LLM summary in {seconds:.2f}s (~{estimate_tokens(prompt)} prompt tokens).")
+    return text
@@ -0,0 +1,151 @@
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics registry rendered in the Prometheus text format on
+# /metrics. Counters and histograms are keyed by (name, sorted label pairs);
+# everything lives in this process, so values reset when the bot restarts.
+
+METRICS = {
+    # name: (type, help)
+    "pipeline_node_seconds": ("histogram", "Wall time of each LangGraph node"),
+    "pipeline_node_cpu_seconds_total": ("counter", "Process CPU time spent while each LangGraph node ran"),
+    "github_requests_total": ("counter", "GitHub API responses by endpoint and status"),
+    "github_request_seconds": ("histogram", "GitHub API request latency"),
+    "github_response_bytes_total": ("counter", "Bytes received from the GitHub API"),
+    "github_retries_total": ("counter", "GitHub API retries (5xx, network errors and rate limits)"),
+    "http_cache_lookups_total": ("counter", "GitHub response cache lookups by result"),
+    "llm_requests_total": ("counter", "LLM summary requests by outcome"),
+    "llm_request_seconds": ("histogram", "LLM summary latency"),
+    "chart_render_seconds": ("histogram", "Time to render all charts for a report"),
+    "slack_upload_seconds": ("histogram", "Slack chart upload latency"),
+    "report_job_seconds": ("histogram", "End-to-end report job time"),
+    "process_peak_rss_bytes": ("gauge", "Peak resident memory of the bot process"),
+}
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_values = {}  # (name, labels) -> float for counters/gauges
+_histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _values[_key(name, labels)] = value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        counts = _histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+        counts[-2] += 1
+        counts[-1] += seconds
+
+
+def peak_rss_bytes():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextmanager
+def track(name, **labels):
+    # Times a block into a histogram: with track("slack_upload_seconds"): ...
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def node_metrics(name, agent):
+    # Wraps a LangGraph node: wall time, process CPU time and peak RSS go to
+    # the registry and to state["stage_metrics"][name] for the stored report
+    def run(state):
+        started, cpu_started = time.perf_counter(), time.process_time()
+        stages = dict(state.get("stage_metrics") or {})
+        state["stage_metrics"] = stages
+        result = agent(state)
+        seconds = time.perf_counter() - started
+        cpu_seconds = time.process_time() - cpu_started
+        peak = peak_rss_bytes()
+        observe("pipeline_node_seconds", seconds, node=name)
+        inc("pipeline_node_cpu_seconds_total", cpu_seconds, node=name)
+        set_gauge("process_peak_rss_bytes", peak)
+        stages[name] = {
+            "seconds": round(seconds, 3),
+            "cpu_seconds": round(cpu_seconds, 3),
+            "peak_rss_mb": round(peak / 2 ** 20, 1)
+        }
+        return result
+    return run
+
+
+def report_metrics(state, **extra):
+    # Per-report instrumentation stored with the report (dev_reports.metrics)
+    harvest = state.get("harvest_stats", {})
+    cache = harvest.get("cache") or {}
+    lookups = sum(cache.get(k, 0) for k in ("hits", "revalidated", "misses"))
+    return {
+        "stages": state.get("stage_metrics", {}),
+        "github": {
+            "calls": harvest.get("api_calls"),
+            "retries": harvest.get("api_retries"),
+            "bytes": harvest.get("bytes_received"),
+            "seconds": harvest.get("api_seconds"),
+            "cache_hit_rate": round((cache.get("hits", 0) + cache.get("revalidated", 0)) / lookups, 3) if lookups else None
+        },
+        **extra
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    set_gauge("process_peak_rss_bytes", peak_rss_bytes())
+    with _lock:
+        values = dict(_values)
+        histograms = {key: list(counts) for key, counts in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (metric, labels), counts in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(BUCKETS, counts):
+                    lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {counts[-2]}")
+                lines.append(f"{name}_count{_labels(labels)} {counts[-2]}")
+                lines.append(f"{name}_sum{_labels(labels)} {counts[-1]:.6f}")
+        else:
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value:.10g}")
+    return "\n".join(lines) + "\n"
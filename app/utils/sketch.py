@@ -0,0 +1,121 @@
+# === Mergeable quantile sketch (DDSketch) ===
+import json
+import math
+
+SKETCH_RELATIVE_ACCURACY = 0.01  # every quantile is within 1% of the exact value
+SKETCH_MAX_BUCKETS = 2048  # 1% buckets span ~1e-6 to 1e11 before any collapsing
+MIN_INDEXABLE = 1e-6  # smaller values (and negatives, e.g. clock skew) count as zero
+
+
+class DDSketch:
+    # Values are counted in logarithmic buckets: bucket i covers
+    # (gamma^(i-1), gamma^i]. A quantile is read off the cumulative counts, and
+    # two sketches with the same accuracy merge by adding counts, so weekly
+    # sketches combine into monthly or org-level ones exactly as if the raw
+    # values had been sketched together. Size grows with the value range, not
+    # the number of values.
+    def __init__(self, relative_accuracy=SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value, weight=1):
+        value = max(float(value), 0.0)
+        if value < MIN_INDEXABLE:
+            self.zeros += weight
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + weight
+            if len(self.buckets) > SKETCH_MAX_BUCKETS:
+                self._collapse()
+        self.count += weight
+        self.total += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        return self
+
+    def _collapse(self):
+        # Fold the lowest buckets together: only the smallest quantiles lose accuracy
+        indexes = sorted(self.buckets)
+        excess = len(indexes) - SKETCH_MAX_BUCKETS
+        target = indexes[excess]
+        for index in indexes[:excess]:
+            self.buckets[target] += self.buckets.pop(index)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(f"Cannot merge sketches with accuracy {self.relative_accuracy} and {other.relative_accuracy}")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        if len(self.buckets) > SKETCH_MAX_BUCKETS:
+            self._collapse()
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Bucket midpoint in relative terms: at most relative_accuracy off
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99), digits=2):
+        stats = {"count": self.count, "mean": round(self.mean(), digits) if self.count else None}
+        for q in quantiles:
+            value = self.quantile(q)
+            stats[f"p{round(q * 100):g}"] = round(value, digits) if value is not None else None
+        return stats
+
+    def to_json(self):
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "b": {str(i): c for i, c in self.buckets.items()},
+            "z": self.zeros,
+            "n": self.count,
+            "s": self.total,
+            "lo": self.min if self.count else None,
+            "hi": self.max if self.count else None
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketch = cls(data["a"])
+        sketch.buckets = {int(i): c for i, c in data["b"].items()}
+        sketch.zeros = data["z"]
+        sketch.count = data["n"]
+        sketch.total = data["s"]
+        sketch.min = data["lo"] if data["lo"] is not None else math.inf
+        sketch.max = data["hi"] if data["hi"] is not None else -math.inf
+        return sketch
+
+
+def merge_sketches(sketches):
+    merged = DDSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
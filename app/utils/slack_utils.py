@@ -1,17 +1,21 @@
 from slack_sdk import WebClient
 import os
 
+from app.utils.metrics import track
+
 client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"))
 
-def upload_chart_to_slack(channel_id, chart_path):
+def upload_chart_to_slack(channel_id, chart, title="Developer Contribution Chart", comment="📊 *Weekly Dev Chart*"):
+    # chart: file path or PNG bytes
     try:
-        response = client.files_upload_v2(
-            channels=[channel_id],
-            file=chart_path,
-            title="Developer Contribution Chart",
-            filename="dev_report_chart.png",
-            initial_comment="📊 *Weekly Dev Chart*"
-        )
+        with track("slack_upload_seconds"):
+            response = client.files_upload_v2(
+                channels=[channel_id],
+                file=chart,
+                title=title,
+                filename=title.lower().replace(" ", "_") + ".png",
+                initial_comment=comment
+            )
         print("✅ Chart uploaded successfully.")
     except Exception as e:
         print("❌ Failed to upload chart:", e)
@@ -3,33 +3,54 @@ from typing import TypedDict, List, Any
 
 # Step 1: Define the state schema
 class DevState(TypedDict, total=False):  # total=False makes keys optional
-    events: List[Any]
+    repos: List[str]  # owner/name list to harvest; defaults to GITHUB_REPOS
+    repo_results: dict  # per-repo PR counts and harvest timings
+    events: List[Any]  # seed/replay input only; harvested runs hand over event_table
+    event_table: Any  # columnar EventTable built by the harvester
     summary: str
+    report_id: str  # upsert key for dev_reports
     total_additions: int
     total_deletions: int
     per_author_diff: dict  
     pr_metrics: dict
     review_latency: dict
+    review_latencies: List[float]  # per-PR hours to first non-author review, for the histogram
+    review_percentiles: dict  # p50/p90/p99 review latency overall and per repo, team and reviewer
     cycle_time: dict
     ci_failures: int
+    ci_stats: dict  # CI run totals plus per-workflow/branch failure rate, duration percentiles, flaky reruns
     churn_outliers: List[dict]  # ✅ New field for churn analysis
+    hotspots: dict  # top files/directories by churn over HOTSPOT_WEEKS, with ownership share
+    mttr_hours: Any
+    dora: dict  # deployments, lead time, change failure rate and MTTR for the window (app/agents/dora.py)
+    harvest_stats: dict  # API call counts from the harvest stage
+    llm_metrics: dict  # input for the follow-up LLM narrative
+    window: dict  # {"since", "until", "days"} of the harvested PR window
+    stage_metrics: dict  # node name -> {"seconds", "cpu_seconds", "peak_rss_mb"}
+    report_metrics: dict  # instrumentation stored with the report
 
 
 # Step 2: Import your agents
 from app.agents.data_harvester import data_harvester_agent
 from app.agents.diff_analyst import diff_analyst_agent
+from app.agents.review_analyst import review_analyst_agent
 from app.agents.insight_narrator import insight_narrator_agent
+from app.utils.metrics import node_metrics
 
 # Step 3: Build the graph with schema
 graph = StateGraph(DevState)
 
-graph.add_node("DataHarvester", data_harvester_agent)
-graph.add_node("DiffAnalyst", diff_analyst_agent)
-graph.add_node("InsightNarrator", insight_narrator_agent)
+# Every node is wrapped so its wall/CPU time and peak memory reach /metrics
+# and state["stage_metrics"] (later nodes and the stored report see it)
+graph.add_node("DataHarvester", node_metrics("DataHarvester", data_harvester_agent))
+graph.add_node("DiffAnalyst", node_metrics("DiffAnalyst", diff_analyst_agent))
+graph.add_node("ReviewAnalyst", node_metrics("ReviewAnalyst", review_analyst_agent))
+graph.add_node("InsightNarrator", node_metrics("InsightNarrator", insight_narrator_agent))
 
 graph.set_entry_point("DataHarvester")
 graph.add_edge("DataHarvester", "DiffAnalyst")
-graph.add_edge("DiffAnalyst", "InsightNarrator")
+graph.add_edge("DiffAnalyst", "ReviewAnalyst")
+graph.add_edge("ReviewAnalyst", "InsightNarrator")
 
 # Step 4: Compile the graph
 app = graph.compile()
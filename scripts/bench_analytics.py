@@ -0,0 +1,88 @@
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.utils.event_table import EventTable, detect_churn_outliers
+
+# Compares the pure-Python per-author aggregation + z-score pass that
+# diff_analyst_agent used to run with the NumPy EventTable, on synthetic events.
+# Both sides apply only the z > 2 rule so they produce the same outlier list.
+
+SIZES = [1_000, 100_000, 1_000_000]
+AUTHORS = [f"dev{i}" for i in range(500)]
+
+
+def make_events(n):
+    rng = random.Random(42)
+    return [
+        {
+            "author": rng.choice(AUTHORS),
+            "additions": int(rng.lognormvariate(4, 1.2)),
+            "deletions": int(rng.lognormvariate(3, 1.2)),
+            "files_changed": rng.randint(1, 40),
+            "pr_number": i
+        }
+        for i in range(n)
+    ]
+
+
+def python_loops(events):
+    # The two-pass loop diff_analyst_agent ran before EventTable
+    author_stats = defaultdict(lambda: {"additions": 0, "deletions": 0, "files_touched": 0})
+    churn_list = []
+    for e in events:
+        additions = e.get("additions", 0)
+        deletions = e.get("deletions", 0)
+        author = e.get("author", "unknown")
+        churn_list.append(additions + deletions)
+        author_stats[author]["additions"] += additions
+        author_stats[author]["deletions"] += deletions
+        author_stats[author]["files_touched"] += e.get("files_changed", 0)
+
+    mean_churn = statistics.mean(churn_list)
+    std_churn = statistics.stdev(churn_list)
+    high_churn_prs = []
+    seen_outlier_ids = set()
+    for e in events:
+        churn = e.get("additions", 0) + e.get("deletions", 0)
+        pr_id = f"PR #{e.get('pr_number')}"
+        if (churn - mean_churn) / std_churn > 2 and pr_id not in seen_outlier_ids:
+            high_churn_prs.append({
+                "id": pr_id,
+                "author": e.get("author", "unknown"),
+                "additions": e.get("additions", 0),
+                "deletions": e.get("deletions", 0),
+                "files_changed": e.get("files_changed", 0),
+                "lines_changed": churn,
+                "z_score": round((churn - mean_churn) / std_churn, 2)
+            })
+            seen_outlier_ids.add(pr_id)
+    dict(sorted(author_stats.items(), key=lambda item: item[1]["additions"] + item[1]["deletions"], reverse=True))
+    high_churn_prs.sort(key=lambda pr: pr["z_score"], reverse=True)
+    return high_churn_prs
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    print(f"{'events':>10} {'python (s)':>11} {'build (s)':>10} {'analyze (s)':>12} {'total (s)':>10} {'speedup':>8}")
+    detect_churn_outliers(EventTable.from_events(make_events(10)))  # warm up NumPy
+    for n in SIZES:
+        events = make_events(n)
+        py_time, _ = timed(python_loops, events)
+        build_time, table = timed(EventTable.from_events, events)
+        analyze_time, _ = timed(lambda t: (t.per_author(), detect_churn_outliers(t, methods=["zscore"])), table)
+        total = build_time + analyze_time
+        print(f"{n:>10,} {py_time:>11.3f} {build_time:>10.3f} {analyze_time:>12.3f} {total:>10.3f} {py_time / total:>7.1f}x")
+    print("\nbuild = converting event dicts to columns; pipelines that stream rows straight into arrays skip it.")
+
+
+if __name__ == "__main__":
+    main()
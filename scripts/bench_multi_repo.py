@@ -0,0 +1,92 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import app.db as db
+from app.agents import data_harvester
+
+# Benchmarks the per-repo fan-out in data_harvester.harvest_repos against a
+# simulated GitHub with fixed per-request latency, so numbers reflect the
+# scheduling (parallel repos vs one at a time) rather than network noise.
+
+LATENCY = float(os.getenv("BENCH_LATENCY", "0.05"))
+PRS_PER_REPO = int(os.getenv("BENCH_PRS_PER_REPO", "30"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "10"))  # shared client pool size
+REPO_COUNTS = [1, 5, 10, 20, 40]
+
+
+class SimulatedGitHubClient:
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(CONCURRENCY)
+        self.stats = {"calls": 0, "retries": 0, "bytes": 0, "rate_limited": 0}
+        self.cache = None
+        now = datetime.utcnow()
+        self.prs = [
+            {
+                "number": n,
+                "user": {"login": f"dev{n % 7}"},
+                "state": "closed" if n % 3 else "open",
+                "created_at": (now - timedelta(hours=n)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "updated_at": (now - timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "merged_at": (now - timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%SZ") if n % 3 else None,
+                "closed_at": None
+            }
+            for n in range(1, PRS_PER_REPO + 1)
+        ]
+
+    async def _call(self):
+        async with self.semaphore:
+            self.stats["calls"] += 1
+            await asyncio.sleep(LATENCY)
+
+    async def iter_recent(self, url, since_iso, date_key="created_at", params=None, page_stats=None):
+        await self._call()
+        if page_stats is not None:
+            page_stats["pages"] = page_stats.get("pages", 0) + 1
+        recent = [pr for pr in self.prs if pr[date_key] > since_iso] if url.endswith("/pulls") else []
+        if recent:
+            yield recent
+
+    async def paginate_recent(self, url, since_iso, date_key="created_at", params=None, page_stats=None):
+        return [item async for page in self.iter_recent(url, since_iso, date_key, params, page_stats) for item in page]
+
+    async def paginate(self, url, max_pages=5, params=None, immutable=False):
+        await self._call()
+        if url.endswith("/files"):
+            return [{"filename": f"src/file{random.randint(0, 20)}.py", "additions": random.randint(1, 200), "deletions": random.randint(0, 100)}]
+        return [{"conclusion": random.choice(["success", "failure"])}]
+
+    async def get_json(self, url, params=None, default=None, immutable=False):
+        await self._call()
+        review = {"submitted_at": self.prs[0]["updated_at"], "state": "APPROVED", "user": {"login": "reviewer", "type": "User"}}
+        return [review] if url.endswith("/reviews") else []
+
+    async def get_page(self, url, params=None, immutable=False):
+        return await self.get_json(url, params, immutable=immutable)
+
+
+async def run_once(repo_count, max_parallel):
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db.init_db()
+    client = SimulatedGitHubClient()
+    repos = [f"org/repo{i}" for i in range(repo_count)]
+    started = time.perf_counter()
+    harvested = await data_harvester.harvest_repos(client, repos, max_parallel=max_parallel)
+    return time.perf_counter() - started, client.stats["calls"], len(harvested["event_table"])
+
+
+def main():
+    print(f"Simulated latency {LATENCY * 1000:.0f} ms/request, {PRS_PER_REPO} PRs per repo, pool of {CONCURRENCY}\n")
+    print(f"{'repos':>6} {'sequential (s)':>15} {'parallel (s)':>13} {'speedup':>8} {'calls':>7}")
+    for count in REPO_COUNTS:
+        seq_time, calls, _ = asyncio.run(run_once(count, max_parallel=1))
+        par_time, _, _ = asyncio.run(run_once(count, max_parallel=data_harvester.HARVEST_MAX_PARALLEL_REPOS))
+        print(f"{count:>6} {seq_time:>15.2f} {par_time:>13.2f} {seq_time / par_time:>7.1f}x {calls:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import contextlib
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# End-to-end benchmark of the LangGraph flow against an offline GitHub: a
+# synthetic repo per size in BENCH_PR_COUNTS (or a recorded fixture archive via
+# BENCH_FIXTURES), the stub LLM, and a throwaway DB. Reports wall time, CPU,
+# peak memory and GitHub calls per stage. Harvests cover the usual 7-day
+# window, so a repo with PRs spread over BENCH_DAYS=90 fetches ~8% of them.
+#   BENCH_PR_COUNTS=1000,10000,100000,1000000 python scripts/bench_pipeline.py
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_pipeline_")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("HTTP_CACHE_PATH", os.path.join(WORKDIR, "github_cache.db"))
+os.environ.setdefault("AUDIT_LOG_PATH", os.path.join(WORKDIR, "audit_log.jsonl"))
+os.environ.setdefault("CHART_RENDER_WORKERS", "1")
+os.environ.setdefault("HARVEST_BACKEND", "rest")  # synthetic repos only answer REST
+
+import app.db as db
+from app.agents.insight_narrator import llm_followup
+from app.utils.chart_generator import CHART_TREND_WEEKS, report_chart_jobs, render_charts
+from app.utils.github_replay import load_fixtures, make_app, serve_in_background, use_api_url
+from app.utils.metrics import peak_rss_bytes
+from langgraph_flow import app as flow
+from seed.seed_fake_github_events import synthetic_responder
+
+PR_COUNTS = [int(n) for n in os.getenv("BENCH_PR_COUNTS", "1000,10000,100000").split(",")]
+REPOS = os.getenv("BENCH_REPOS", "bench/app").split(",")
+DAYS = int(os.getenv("BENCH_DAYS", "90"))
+LATENCY = float(os.getenv("BENCH_LATENCY", "0"))  # simulated per-request latency (seconds)
+FIXTURES = os.getenv("BENCH_FIXTURES")  # replay a recorded archive instead of synthetic repos
+VERBOSE = os.getenv("BENCH_VERBOSE") == "1"  # keep the pipeline's own output
+
+
+def quiet():
+    # The agents print their progress and the full report; keep the table readable
+    return contextlib.nullcontext() if VERBOSE else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def timed_stage(fn):
+    started, cpu_started = time.perf_counter(), time.process_time()
+    result = fn()
+    return result, {
+        "seconds": round(time.perf_counter() - started, 3),
+        "cpu_seconds": round(time.process_time() - cpu_started, 3),
+        "peak_rss_mb": round(peak_rss_bytes() / 2 ** 20, 1)
+    }
+
+
+def run_pipeline(label, server_app):
+    db.DB_PATH = os.path.join(WORKDIR, f"{label}.db")
+    db.init_db()
+    url, stop = serve_in_background(server_app)
+    try:
+        with use_api_url(url), quiet():
+            started = time.perf_counter()
+            state = {"repos": REPOS}
+            for update in flow.stream(state, stream_mode="updates"):
+                for node_state in update.values():
+                    state.update(node_state or {})
+            total = time.perf_counter() - started
+    finally:
+        stop()
+
+    stages = dict(state.get("stage_metrics", {}))
+    trend = db.weekly_trend(REPOS, CHART_TREND_WEEKS)
+    with quiet():
+        _, stages["Charts"] = timed_stage(lambda: render_charts(report_chart_jobs(state, trend)))
+        _, stages["LLM follow-up"] = timed_stage(lambda: llm_followup(state))
+
+    harvest = state.get("harvest_stats", {})
+    print(f"\n=== {label}: {len(state.get('event_table') or [])} merged PRs in window, pipeline {total:.2f}s ===")
+    print(f"{'stage':<16} {'wall (s)':>9} {'cpu (s)':>8} {'peak RSS (MB)':>14}")
+    for name, m in stages.items():
+        print(f"{name:<16} {m['seconds']:>9.3f} {m['cpu_seconds']:>8.3f} {m['peak_rss_mb']:>14.1f}")
+    print(f"GitHub: {harvest.get('api_calls')} calls, {harvest.get('bytes_received', 0) / 1024:.0f} KiB, "
+          f"{harvest.get('api_seconds')}s in requests; stub served {server_app['stats']}")
+
+
+def main():
+    print(f"Offline pipeline benchmark (workdir {WORKDIR}, latency {LATENCY * 1000:.0f} ms/request)")
+    if FIXTURES:
+        run_pipeline("replay", make_app(fixtures=load_fixtures(FIXTURES), latency=LATENCY))
+        return
+    for count in PR_COUNTS:
+        run_pipeline(f"{count}_prs", make_app(responder=synthetic_responder(REPOS, count, DAYS), latency=LATENCY))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.utils.github_replay import load_fixtures, make_app, serve_in_background
+from seed.seed_fake_github_events import synthetic_responder
+
+# Local stand-in for api.github.com, so the bot runs fully offline:
+#   python scripts/github_stub_server.py --fixtures data/fixtures/demo_app.jsonl.gz --port 8765
+#   GITHUB_API_URL=http://127.0.0.1:8765 uvicorn slack_bot:fastapi_app --port 3000
+# With --synthetic-prs, requests missing from the fixtures are generated on the fly.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic GitHub API responses")
+    parser.add_argument("--fixtures", help="gzip JSONL archive written via GITHUB_RECORD_PATH or the seed script")
+    parser.add_argument("--synthetic-prs", type=int, help="answer for synthetic repos with this many PRs")
+    parser.add_argument("--repos", default="demo/app", help="comma-separated synthetic repos")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if not args.fixtures and not args.synthetic_prs:
+        parser.error("pass --fixtures and/or --synthetic-prs")
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    responder = synthetic_responder(args.repos.split(","), args.synthetic_prs, args.days) if args.synthetic_prs else None
+    app = make_app(fixtures=fixtures, responder=responder, latency=args.latency)
+    url, stop = serve_in_background(app, port=args.port)
+    print(f"🛰️ GitHub stub serving {len(fixtures or {})} fixture(s) at {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop()
+        print(f"👋 Stopped; {app['stats']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.utils.audit_log import AUDIT_LOG_PATH, read_audit_log
+
+# Prints audit records (one JSON object per line) in a date range, streaming
+# through the rotated .gz archives and the live log:
+#   python scripts/read_audit_log.py --since 2026-10-01 --until 2026-10-08 --repo microsoft/vscode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter the report audit log by date range")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="inclusive, e.g. 2026-10-01 or 2026-10-01T06:00")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="exclusive")
+    parser.add_argument("--repo", help="only runs that included this owner/repo")
+    parser.add_argument("--path", default=AUDIT_LOG_PATH)
+    args = parser.parse_args()
+
+    count = 0
+    for record in read_audit_log(args.since, args.until, args.path):
+        if args.repo and args.repo not in record.get("repos", []):
+            continue
+        print(json.dumps(record))
+        count += 1
+    print(f"{count} record(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
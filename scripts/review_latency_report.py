@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+from datetime import date
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.db import init_db
+from app.agents.review_analyst import latency_percentiles
+
+# Review latency percentiles for any range of weeks, merged from the stored
+# weekly sketches (no PR data or GitHub calls needed):
+#   python scripts/review_latency_report.py --scope team --since 2026-09-01 --until 2026-09-30
+#   python scripts/review_latency_report.py --scope repo --since 2026-07-01   # "*" row = whole org
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge weekly review latency sketches into percentiles")
+    parser.add_argument("--scope", choices=["repo", "team", "reviewer"], default="repo")
+    parser.add_argument("--since", type=date.fromisoformat, required=True, help="weeks from this date's Monday")
+    parser.add_argument("--until", type=date.fromisoformat, default=date.today(), help="through the week starting on or before this date")
+    parser.add_argument("--repos", help="comma-separated owner/name list (default: all)")
+    parser.add_argument("--key", help="a single team, reviewer or repo")
+    args = parser.parse_args()
+
+    init_db()
+    repos = [r.strip() for r in args.repos.split(",") if r.strip()] if args.repos else None
+    rows = latency_percentiles(args.scope, args.since, args.until, repos, args.key)
+    if not rows:
+        print("No review latency sketches stored for that range.")
+        return
+    print(f"{args.scope:<30} {'PRs':>6} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8}  (hours)")
+    for key, p in rows.items():
+        print(f"{key:<30} {p['count']:>6} {p['mean']:>8} {p['p50']:>8} {p['p90']:>8} {p['p99']:>8}")
+
+
+if __name__ == "__main__":
+    main()
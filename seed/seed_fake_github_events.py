@@ -1,3 +1,4 @@
+import math
 import random
 import uuid
 from datetime import datetime, timedelta
@@ -37,6 +38,258 @@ def save_to_file(events, path="data/fake_github_events.json"):
         json.dump(events, f, indent=2)
     print(f"[✓] Seeded {len(events)} fake events into: {path}")
 
+# === Synthetic GitHub API ===
+# Deterministic, lazily generated repos for the offline stub server and
+# benchmarks. PR i (0 = most recently updated) is a pure function of
+# (seed, repo, i), so a repo with 10^6 PRs costs no memory: only the pages and
+# PRs the harvester actually requests are ever built.
+
+def _rng(seed, repo, *parts):
+    return random.Random(f"{seed}|{repo}|" + "|".join(map(str, parts)))
+
+
+def _iso(ts):
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+
+class SyntheticRepo:
+    def __init__(self, repo, pr_count, days=90, seed=42, now=None):
+        self.repo = repo
+        self.pr_count = pr_count
+        self.days = days
+        self.seed = seed
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        self.spacing = days * 86400 / max(pr_count, 1)  # seconds between PR updates
+        self.authors = [f"dev{i}" for i in range(max(len(authors), pr_count // 200))]
+
+    def number(self, index):
+        return self.pr_count - index  # newest PRs have the highest numbers
+
+    def index(self, number):
+        return self.pr_count - number
+
+    def pull_request(self, index):
+        rng = _rng(self.seed, self.repo, "pr", index)
+        updated_at = self.now - timedelta(seconds=index * self.spacing)
+        created_at = updated_at - timedelta(hours=min(rng.expovariate(1 / 30), 24 * 30))
+        merged = rng.random() < 0.7
+        author = "dependabot[bot]" if rng.random() < 0.05 else rng.choice(self.authors)
+        return {
+            "number": self.number(index),
+            "user": {"login": author, "type": "Bot" if author.endswith("[bot]") else "User"},
+            "state": "closed" if merged or rng.random() < 0.1 else "open",
+            "created_at": _iso(created_at),
+            "updated_at": _iso(updated_at),
+            "merged_at": _iso(updated_at) if merged else None,
+            "closed_at": _iso(updated_at) if merged else None
+        }
+
+    def pulls_page(self, page, per_page=30):
+        start = (page - 1) * per_page
+        return [self.pull_request(i) for i in range(start, min(start + per_page, self.pr_count))]
+
+    def reviews(self, number):
+        rng = _rng(self.seed, self.repo, "reviews", number)
+        pr = self.pull_request(self.index(number))
+        if rng.random() < 0.2:
+            return []
+        submitted = _parse(pr["created_at"]) + timedelta(hours=rng.expovariate(1 / 4))
+        if submitted > self.now:
+            return []
+        reviewer = rng.choice([a for a in self.authors if a != pr["user"]["login"]] or self.authors)
+        reviews = [{"user": {"login": reviewer, "type": "User"}, "state": "APPROVED", "submitted_at": _iso(submitted)}]
+        # Noise a first-review lookup has to skip: the author replying in a
+        # review thread, and a bot's automated review, both before the real one
+        if rng.random() < 0.3:
+            early = _parse(pr["created_at"]) + (submitted - _parse(pr["created_at"])) * rng.random()
+            reviews.insert(0, {"user": pr["user"], "state": "COMMENTED", "submitted_at": _iso(early)})
+        if rng.random() < 0.2:
+            reviews.insert(0, {"user": {"login": "ci-helper[bot]", "type": "Bot"}, "state": "COMMENTED", "submitted_at": pr["created_at"]})
+        return reviews
+
+    def files(self, number, page=1, per_page=30):
+        rng = _rng(self.seed, self.repo, "files", number)
+        count = min(int(rng.lognormvariate(1.5, 1)) + 1, 300)
+        # Pareto-distributed paths: a few modules and files take most changes.
+        # A path appears once per PR, as on GitHub.
+        paths = {
+            f"src/module{min(int(rng.paretovariate(1.2)) - 1, 50)}/file{min(int(rng.paretovariate(1.1)) - 1, 500)}.py": None
+            for _ in range(count)
+        }
+        rows = [
+            {
+                "filename": path,
+                "additions": int(rng.lognormvariate(3, 1.2)),
+                "deletions": int(rng.lognormvariate(2.5, 1.2))
+            }
+            for path in paths
+        ]
+        return rows[(page - 1) * per_page:page * per_page]
+
+    def incidents(self, page, per_page=30, since=None):
+        # One incident every ~2 days, closed a few hours later; the newest may
+        # still be open. Sorted by updated_at, newest first.
+        count = max(1, self.days // 2)
+        start = (page - 1) * per_page
+        issues = []
+        for i in range(start, min(start + per_page, count)):
+            rng = _rng(self.seed, self.repo, "incident", i)
+            created = self.now - timedelta(days=i * 2, hours=rng.random() * 12)
+            closed = created + timedelta(hours=rng.expovariate(1 / 3))
+            closed = closed if closed <= self.now else None
+            updated = closed or created
+            if since and _iso(updated) <= since:
+                break
+            issues.append({
+                "number": 10_000_000 + i,
+                "labels": [{"name": "incident"}],
+                "state": "closed" if closed else "open",
+                "created_at": _iso(created),
+                "updated_at": _iso(updated),
+                "closed_at": _iso(closed) if closed else None
+            })
+        return issues
+
+    # Production deployments: one per ~20 PR updates, newest first
+    def deployment_spacing(self):
+        return self.spacing * 20
+
+    def deployment(self, i):
+        created = self.now - timedelta(seconds=i * self.deployment_spacing())
+        return {"id": 5_000_000 + i, "sha": f"{i:040x}",
+                "environment": "production", "created_at": _iso(created)}
+
+    def deployments(self, page, per_page=30):
+        count = int(self.days * 86400 / self.deployment_spacing())
+        start = (page - 1) * per_page
+        return [self.deployment(i) for i in range(start, min(start + per_page, count))]
+
+    def deployment_statuses(self, deployment_id):
+        i = deployment_id - 5_000_000
+        rng = _rng(self.seed, self.repo, "deploy", i)
+        created = _parse(self.deployment(i)["created_at"]) + timedelta(minutes=rng.randint(2, 20))
+        if created > self.now:
+            return [{"state": "in_progress", "created_at": _iso(self.now)}]
+        return [{"state": "failure" if rng.random() < 0.08 else "success", "created_at": _iso(created)}]
+
+    def compare(self, base, head):
+        # Commits shipped by deployment `head`, authored ~18h (on average) before it
+        try:
+            i = int(head, 16)
+        except ValueError:
+            return None
+        rng = _rng(self.seed, self.repo, "compare", i)
+        deployed = _parse(self.deployment(i)["created_at"])
+        commits = [
+            {"sha": f"{i:08x}{n:032x}", "commit": {"author": {"date": _iso(deployed - timedelta(hours=rng.expovariate(1 / 18)))}}}
+            for n in range(rng.randint(1, 15))
+        ]
+        return {"total_commits": len(commits), "commits": commits}
+
+    def workflow_run(self, i):
+        # Two runs per PR, run 0 newest; the latest few are still in progress
+        rng = _rng(self.seed, self.repo, "run", i)
+        created = self.now - timedelta(seconds=i * self.spacing / 2)
+        completed = i >= 3
+        return {
+            "id": i + 1,
+            "name": rng.choice(["ci", "lint", "e2e"]),
+            "head_branch": rng.choice(["main", "main", f"feature-{rng.randint(1, 99)}"]),
+            "run_attempt": 2 if rng.random() < 0.05 else 1,
+            "status": "completed" if completed else "in_progress",
+            "conclusion": ("failure" if rng.random() < 0.12 else "success") if completed else None,
+            "created_at": _iso(created),
+            "run_started_at": _iso(created),
+            "updated_at": _iso(created + timedelta(seconds=rng.randint(60, 1800)))
+        }
+
+    def workflow_runs(self, page, per_page=30, created=None):
+        # created: GitHub search syntax, "A..B", ">=A" or "<=B" (ISO timestamps)
+        count = self.pr_count * 2
+        first, last = 0, count - 1
+        if created:
+            step = self.spacing / 2
+            low, _, high = created.partition("..") if ".." in created else (created, None, None)
+            if low.startswith("<="):
+                low, high = None, low[2:]
+            elif low.startswith(">="):
+                low = low[2:]
+            if high and high != "*":
+                first = max(first, math.ceil((self.now - _parse(high)).total_seconds() / step))
+            if low and low != "*":
+                last = min(last, math.floor((self.now - _parse(low)).total_seconds() / step))
+        total = max(0, last - first + 1)
+        start = first + (page - 1) * per_page
+        runs = [self.workflow_run(i) for i in range(start, min(start + per_page, last + 1))]
+        return {"total_count": total, "workflow_runs": runs}
+
+    def respond(self, path, query):
+        # REST routes the harvester uses; returns the JSON body or None (404)
+        parts = path.strip("/").split("/")
+        if parts[:3] != ["repos", *self.repo.split("/")]:
+            return None
+        rest = parts[3:]
+        page = int(query.get("page", 1))
+        per_page = min(int(query.get("per_page", 30)), 100)
+        if rest == ["pulls"]:
+            return self.pulls_page(page, per_page)
+        if len(rest) == 3 and rest[0] == "pulls" and rest[2] == "reviews":
+            return self.reviews(int(rest[1])) if page == 1 else []
+        if len(rest) == 3 and rest[0] == "pulls" and rest[2] == "files":
+            return self.files(int(rest[1]), page, per_page)
+        if len(rest) == 3 and rest[0] == "issues" and rest[2] == "comments":
+            return []
+        if rest == ["issues"]:
+            return self.incidents(page, per_page, query.get("since")) if query.get("labels") == "incident" else []
+        if rest == ["deployments"]:
+            return self.deployments(page, per_page)
+        if len(rest) == 3 and rest[0] == "deployments" and rest[2] == "statuses":
+            return self.deployment_statuses(int(rest[1]))
+        if len(rest) == 2 and rest[0] == "compare":
+            base, _, head = rest[1].partition("...")
+            return self.compare(base, head) if page == 1 else {"total_commits": 0, "commits": []}
+        if rest == ["releases"]:
+            return []
+        if rest == ["actions", "runs"]:
+            return self.workflow_runs(page, per_page, query.get("created"))
+        if rest == []:
+            return {"full_name": self.repo, "default_branch": "main"}
+        return None
+
+
+def synthetic_responder(repos, pr_count, days=90, seed=42):
+    # Callable for github_replay.make_app: (method, path, query, body) -> (status, data)
+    synthetic = {repo: SyntheticRepo(repo, pr_count, days, seed) for repo in repos}
+
+    def respond(method, path, query, body):
+        for repo in synthetic.values():
+            data = repo.respond(path, query)
+            if data is not None:
+                return 200, data
+        return 404, {"message": "Not Found"}
+    return respond
+
+
 if __name__ == "__main__":
-    fake_events = generate_dataset(50)
-    save_to_file(fake_events)
+    import argparse
+    parser = argparse.ArgumentParser(description="Seed fake events, or write a synthetic GitHub fixture archive")
+    parser.add_argument("--github-fixtures", type=int, metavar="PRS", help="PRs in the synthetic repo")
+    parser.add_argument("--repo", default="demo/app")
+    parser.add_argument("--days", type=int, default=90, help="history the PRs are spread over")
+    parser.add_argument("--out", help="fixture archive path (default data/fixtures/<owner>_<name>.jsonl.gz)")
+    args = parser.parse_args()
+
+    if args.github_fixtures:
+        import sys
+        sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+        from app.utils.github_replay import record_synthetic_fixtures
+        out = args.out or f"data/fixtures/{args.repo.replace('/', '_')}.jsonl.gz"
+        written = record_synthetic_fixtures(SyntheticRepo(args.repo, args.github_fixtures, args.days), out)
+        print(f"[✓] Wrote {written} GitHub responses for {args.repo} ({args.github_fixtures} PRs) into: {out}")
+    else:
+        fake_events = generate_dataset(50)
+        save_to_file(fake_events)
@@ -0,0 +1,53 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import pytest
+
+import app.db as db
+from app.utils.github_replay import make_app, serve_in_background
+from seed.seed_fake_github_events import SyntheticRepo
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    # A fresh schema per test; get_connection reconnects when DB_PATH changes
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "reports.db"))
+    db.init_db()
+    return db.DB_PATH
+
+
+@pytest.fixture
+def github_stub():
+    # Starts a stub GitHub answering with responder(method, path, query, body)
+    # -> (status, data); returns its base URL
+    stops = []
+
+    def start(responder):
+        url, stop = serve_in_background(make_app(responder=responder))
+        stops.append(stop)
+        return url
+
+    yield start
+    for stop in stops:
+        stop()
+
+
+@pytest.fixture
+def synthetic_github(github_stub):
+    # A SyntheticRepo behind the stub. faults maps a path suffix to
+    # (status, page): that page (every page when None) fails with status.
+    def start(repo="demo/app", pr_count=1000, days=30, graphql=None):
+        synthetic = SyntheticRepo(repo, pr_count, days)
+        faults = {}
+
+        def respond(method, path, query, body):
+            for suffix, (status, page) in faults.items():
+                if path.endswith(suffix) and page in (None, int(query.get("page", 1))):
+                    return status, {"message": "Injected failure"}
+            if path == "/graphql" and graphql:
+                return graphql(synthetic, body)
+            data = synthetic.respond(path, query)
+            return (200, data) if data is not None else (404, {"message": "Not Found"})
+
+        return github_stub(respond), faults, synthetic
+    return start
@@ -0,0 +1,34 @@
+import os
+
+from app.utils import chart_generator
+
+
+def latency_jobs():
+    return {
+        "a": ("review_latency", [1.0, 2.5, 4.0, 9.0]),
+        "b": ("review_latency", [0.5, 3.0, 6.0, 30.0])
+    }
+
+
+def test_broken_pool_is_replaced_and_charts_render_inline(monkeypatch):
+    monkeypatch.setattr(chart_generator, "CHART_RENDER_WORKERS", 2)
+    monkeypatch.setattr(chart_generator, "_cache", chart_generator.OrderedDict())
+    broken = chart_generator._get_pool()
+    # A worker dying takes the whole pool down
+    try:
+        broken.submit(os._exit, 1).result()
+    except Exception:
+        pass
+
+    charts, _ = chart_generator.render_charts(latency_jobs())
+    assert set(charts) == {"a", "b"}
+    assert all(png.startswith(b"\x89PNG") for png in charts.values())
+
+    # The next render gets a working pool again
+    fresh = chart_generator._get_pool()
+    assert fresh is not broken
+    monkeypatch.setattr(chart_generator, "_cache", chart_generator.OrderedDict())
+    charts, _ = chart_generator.render_charts(latency_jobs())
+    assert set(charts) == {"a", "b"}
+    fresh.shutdown()
+    chart_generator._pool = None
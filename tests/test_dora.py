@@ -0,0 +1,62 @@
+import time
+
+from app.agents.dora import DoraTimeline, dora_metrics
+from app.db import save_dora_deployments, save_dora_incidents
+
+HOUR = 3600
+
+
+def deployment(id, sha, at, status="success"):
+    return {"id": id, "sha": sha, "created_at": at, "deployed_at": at, "status": status}
+
+
+def test_incident_fails_only_its_own_repos_deployment(temp_db):
+    now = int(time.time())
+    start = now - 10 * HOUR
+    # api deploys, then web deploys, then api has an incident: only api's
+    # deployment failed, though web's is the nearest one before the incident
+    save_dora_deployments("org/api", [deployment(1, "a1", start)], [("c1", 1, start - 5 * HOUR, start)])
+    save_dora_deployments("org/web", [deployment(2, "w1", start + HOUR)], [("c2", 2, start - HOUR, start + HOUR)])
+    save_dora_incidents("org/api", [{"number": 7, "created_at": start + 2 * HOUR, "closed_at": start + 4 * HOUR}])
+
+    metrics = dora_metrics(["org/api", "org/web"], start - HOUR, now)
+    assert metrics["deployments"] == 2
+    assert metrics["failed_deployments"] == 1
+    assert metrics["change_failure_rate"] == 50.0
+    assert metrics["changes"] == 2
+    assert metrics["lead_time_hours"] == 3.5
+    assert metrics["mttr_hours"] == 2.0
+
+    assert dora_metrics(["org/web"], start - HOUR, now)["failed_deployments"] == 0
+    assert dora_metrics(["org/api"], start - HOUR, now)["failed_deployments"] == 1
+
+
+def test_merged_timeline_matches_per_repo_windows():
+    api = DoraTimeline([(100, "success"), (5000, "success")], [(100, 40), (5000, 90)], [(200, 900)])
+    web = DoraTimeline([(150, "success"), (300, "failure")], [(150, 10)], [(400, None)])
+    merged = DoraTimeline.merge([api, web])
+    assert merged.deploy_times == [100, 150, 300, 5000]
+    assert merged.deploy_failed == [True, False, True, False]
+
+    window = merged.window(0, 10000)
+    assert window["failed_deployments"] == api.window(0, 10000)["failed_deployments"] + web.window(0, 10000)["failed_deployments"]
+    assert window["incidents"] == 2
+    assert window["open_incidents"] == 1
+
+
+def test_deployment_before_the_window_pins_incidents_but_is_not_counted(temp_db):
+    now = int(time.time())
+    since = now - 10 * HOUR
+    # The incident follows a deployment from before the window, not the one inside it
+    save_dora_deployments("org/api", [deployment(1, "a1", since - HOUR), deployment(2, "a2", since + 3 * HOUR)], [])
+    save_dora_incidents("org/api", [{"number": 7, "created_at": since + HOUR, "closed_at": since + 2 * HOUR}])
+
+    timeline = DoraTimeline([(since + 3 * HOUR, "success")], [], [(since + HOUR, since + 2 * HOUR)],
+                            previous=(since - HOUR, "success"))
+    assert timeline.deploy_times == [since + 3 * HOUR]
+    assert timeline.deploy_failed == [False]
+
+    metrics = dora_metrics(["org/api"], since, now)
+    assert metrics["deployments"] == 1
+    assert metrics["failed_deployments"] == 0
+    assert metrics["incidents"] == 1
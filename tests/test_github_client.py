@@ -0,0 +1,58 @@
+import asyncio
+
+from app.utils import github_client
+from app.utils.github_client import GitHubClient
+
+SECONDARY = b'{"message": "You have exceeded a secondary rate limit. Please wait a few minutes before you try again."}'
+
+
+def test_retry_after_wins():
+    client = GitHubClient(cache=False)
+    assert client._rate_limit_delay(403, {"Retry-After": "7"}, SECONDARY) == 7.0
+
+
+def test_secondary_limit_without_retry_after_waits_a_minute_and_doubles(monkeypatch):
+    monkeypatch.setattr(github_client, "GITHUB_MAX_RATE_LIMIT_WAIT", 900.0)
+    client = GitHubClient(cache=False)
+    headers = {"X-RateLimit-Remaining": "4321"}
+    assert client._rate_limit_delay(403, headers, SECONDARY, attempt=0) == 60.0
+    assert client._rate_limit_delay(403, headers, SECONDARY, attempt=2) == 240.0
+    assert client._rate_limit_delay(429, headers, b"", attempt=0) == 60.0
+    # Capped rather than given up on
+    assert client._rate_limit_delay(403, headers, SECONDARY, attempt=10) == 900.0
+
+
+def test_plain_forbidden_is_not_retried():
+    client = GitHubClient(cache=False)
+    body = b'{"message": "Resource not accessible by integration"}'
+    assert client._rate_limit_delay(403, {"X-RateLimit-Remaining": "4321"}, body) is None
+
+
+def test_secondary_limit_is_retried(github_stub, monkeypatch):
+    monkeypatch.setattr(github_client, "SECONDARY_RATE_LIMIT_WAIT", 0.01)
+    calls = []
+
+    def respond(method, path, query, body):
+        calls.append(path)
+        if len(calls) == 1:
+            return 403, {"message": "You have exceeded a secondary rate limit."}
+        return 200, {"ok": True}
+
+    url = github_stub(respond)
+
+    async def fetch():
+        async with GitHubClient(cache=False, max_retries=2, backoff_base=0) as client:
+            return await client.get_json(f"{url}/repos/o/r"), client.stats
+
+    data, stats = asyncio.run(fetch())
+    assert data == {"ok": True}
+    assert len(calls) == 2
+    assert stats["rate_limited"] == 1
+
+
+def test_retry_after_only_on_rate_limit_statuses():
+    client = GitHubClient(cache=False)
+    assert client._rate_limit_delay(503, {"Retry-After": "3"}) == 3.0
+    assert client._rate_limit_delay(429, {"Retry-After": "3"}) == 3.0
+    for status in (200, 301, 404, 422, 500, 502):
+        assert client._rate_limit_delay(status, {"Retry-After": "3"}) is None
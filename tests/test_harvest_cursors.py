@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import app.db as db
+from app.agents import data_harvester
+from app.agents.graphql_harvester import harvest_graphql
+from app.utils.github_client import GitHubClient
+from app.utils.github_replay import use_api_url
+
+REPO = "demo/app"
+
+# Each harvest keeps a cursor (PR watermark, CI slice cursor, DORA cursors)
+# so the next run fetches only what is new. A page that fails must leave the
+# cursor where it was: a failed run followed by a clean one has to end up
+# with the same data as one clean run on a fresh database.
+
+
+def run(url, backend=data_harvester.harvest):
+    async def harvest():
+        async with GitHubClient(cache=False, max_retries=0, backoff_base=0) as client:
+            return await backend(client, REPO)
+    with use_api_url(url):
+        return asyncio.run(harvest())
+
+
+def stored_prs():
+    return len(list(db.iter_pr_rows(REPO, "")))
+
+
+def fresh_db(tmp_path, monkeypatch, name):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / name))
+    db.init_db()
+
+
+def test_failed_pulls_page_keeps_watermark(temp_db, synthetic_github, tmp_path, monkeypatch):
+    url, faults, _ = synthetic_github()
+    faults["/pulls"] = (500, 2)
+    run(url)
+    assert db.get_watermark(REPO) is None
+    partial = stored_prs()
+
+    faults.clear()
+    second = run(url)
+    assert db.get_watermark(REPO) is not None
+    assert second["prs_refreshed"] > 0
+    recovered = stored_prs()
+
+    fresh_db(tmp_path, monkeypatch, "fresh.db")
+    run(url)
+    assert partial < recovered == stored_prs()
+
+
+def test_failed_pr_files_page_keeps_watermark(temp_db, synthetic_github):
+    # A churn lookup that fails must not store the PR with zero churn
+    url, faults, _ = synthetic_github()
+    faults["/files"] = (502, None)
+    run(url)
+    assert db.get_watermark(REPO) is None
+    faults.clear()
+    run(url)
+    merged = [row for row in db.iter_pr_rows(REPO, "") if row["merged_at"] and not row["author"].endswith("[bot]")]
+    assert merged and all(row["additions"] is not None for row in merged)
+
+
+def graphql_pages(synthetic, body, page_size=50):
+    # The GraphQL PR window query, answered from the synthetic repo's PRs
+    variables = json.loads(body)["variables"]
+    offset = int(variables.get("cursor") or 0)
+    nodes = []
+    for pr in synthetic.pulls_page(1, synthetic.pr_count)[offset:offset + page_size]:
+        nodes.append({
+            "number": pr["number"], "state": "OPEN" if pr["state"] == "open" else "MERGED",
+            "createdAt": pr["created_at"], "updatedAt": pr["updated_at"],
+            "mergedAt": pr["merged_at"], "closedAt": pr["closed_at"],
+            "additions": 10, "deletions": 2, "changedFiles": 1,
+            "author": {"login": pr["user"]["login"], "__typename": pr["user"]["type"]},
+            "reviews": {"nodes": []},
+            "files": {"totalCount": 1, "nodes": [{"path": "src/a.py", "additions": 10, "deletions": 2}]}
+        })
+    page_info = {"hasNextPage": offset + page_size < synthetic.pr_count, "endCursor": str(offset + page_size)}
+    return 200, {"data": {"repository": {"pullRequests": {"pageInfo": page_info, "nodes": nodes}}}}
+
+
+def test_failed_graphql_page_keeps_watermark(temp_db, synthetic_github, tmp_path, monkeypatch):
+    failures = {"left": 1}
+
+    def graphql(synthetic, body):
+        # The second page fails once
+        if json.loads(body)["variables"].get("cursor") and failures["left"]:
+            failures["left"] -= 1
+            return 502, {"message": "Injected failure"}
+        return graphql_pages(synthetic, body)
+
+    url, _, _ = synthetic_github(graphql=graphql)
+    run(url, harvest_graphql)
+    assert db.get_watermark(REPO) is None
+    partial = stored_prs()
+
+    run(url, harvest_graphql)
+    assert db.get_watermark(REPO) is not None
+    recovered = stored_prs()
+
+    fresh_db(tmp_path, monkeypatch, "fresh.db")
+    run(url, harvest_graphql)
+    assert partial < recovered == stored_prs()
+
+
+def stored(table):
+    return db.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_failed_ci_page_keeps_cursor(temp_db, synthetic_github, tmp_path, monkeypatch):
+    url, faults, _ = synthetic_github()
+    faults["/actions/runs"] = (502, None)
+    run(url)
+    assert db.get_ci_cursor(REPO) is None
+    assert stored("ci_runs") == 0
+
+    faults.clear()
+    second = run(url)
+    assert db.get_ci_cursor(REPO) is not None
+    assert second["ci_stats"]["runs_fetched"] > 0
+    recovered = stored("ci_runs")
+
+    fresh_db(tmp_path, monkeypatch, "fresh.db")
+    run(url)
+    assert recovered == stored("ci_runs") > 0
+
+
+def test_failed_dora_pages_keep_cursors(temp_db, synthetic_github, tmp_path, monkeypatch):
+    url, faults, _ = synthetic_github()
+    faults["/deployments"] = (500, 2)
+    faults["/issues"] = (503, None)
+    run(url)
+    assert db.get_dora_cursor(REPO, "deployments") is None
+    assert db.get_dora_cursor(REPO, "incidents") is None
+
+    faults.clear()
+    run(url)
+    assert db.get_dora_cursor(REPO, "deployments") is not None
+    assert db.get_dora_cursor(REPO, "incidents") is not None
+    recovered = [stored(t) for t in ("dora_deployments", "dora_changes", "dora_incidents")]
+
+    fresh_db(tmp_path, monkeypatch, "fresh.db")
+    run(url)
+    assert recovered == [stored(t) for t in ("dora_deployments", "dora_changes", "dora_incidents")]
+    assert all(recovered)
+
+
+def test_graphql_partial_data_with_errors_is_used(temp_db, synthetic_github):
+    def graphql(synthetic, body):
+        # A deleted author and an unresolvable PR come back next to the rest
+        status, payload = graphql_pages(synthetic, body)
+        nodes = payload["data"]["repository"]["pullRequests"]["nodes"]
+        nodes[0]["author"] = None
+        nodes.insert(1, None)
+        payload["errors"] = [{"message": "Could not resolve to a User", "path": ["repository", "pullRequests", "nodes", 0, "author"]}]
+        return status, payload
+
+    url, _, _ = synthetic_github(graphql=graphql)
+    run(url, harvest_graphql)
+    assert db.get_watermark(REPO) is not None
+    rows = list(db.iter_pr_rows(REPO, ""))
+    assert rows and any(row["author"] == "Unknown" for row in rows)
+
+
+def test_failed_reviews_page_keeps_watermark(temp_db, synthetic_github, tmp_path, monkeypatch):
+    # A failed /reviews lookup must not be stored as "no review yet"
+    url, faults, _ = synthetic_github()
+    faults["/reviews"] = (502, None)
+    run(url)
+    assert db.get_watermark(REPO) is None
+    faults.clear()
+    run(url)
+    reviewed = sorted((row["number"], row["first_review_at"]) for row in db.iter_pr_rows(REPO, ""))
+
+    fresh_db(tmp_path, monkeypatch, "fresh.db")
+    run(url)
+    assert reviewed == sorted((row["number"], row["first_review_at"]) for row in db.iter_pr_rows(REPO, ""))
+    assert any(at for _, at in reviewed)
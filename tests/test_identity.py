@@ -0,0 +1,89 @@
+import os
+
+from app.agents.data_harvester import finish_from_rows
+from app.agents.graphql_harvester import node_row
+from app.db import save_pr_rows
+from app.utils.identity import IdentityIndex, parse_line
+
+
+def test_parse_line():
+    names, emails, logins, team, bot = parse_line(
+        "Aliia Khasanova <aliia@example.com> @akhasanova A. Khasanova <aliia@old.example.com> [team: compiler]"
+    )
+    assert names == ["Aliia Khasanova", "A. Khasanova"]
+    assert emails == ["aliia@example.com", "aliia@old.example.com"]
+    assert logins == ["akhasanova"]
+    assert (team, bot) == ("compiler", False)
+    assert parse_line("gardener @tf-gardener [bot]")[2:] == (["tf-gardener"], None, True)
+
+
+def test_aliases_teams_and_bots(tmp_path):
+    path = tmp_path / "identities.mailmap"
+    path.write_text(
+        "# comment\n"
+        "Aliia Khasanova <aliia@example.com> @akhasanova [team: compiler]\n"
+        "Aliia Khasanova @aliia-old\n"
+        "gardener @tf-gardener [bot]\n"
+    )
+    index = IdentityIndex(str(path), team_members="web:carol,AKhasanova")
+    assert index.canonical("AKHASANOVA") == "Aliia Khasanova"
+    assert index.canonical("@aliia-old") == "Aliia Khasanova"
+    assert index.canonical("aliia@example.com") == "Aliia Khasanova"
+    assert index.canonical("stranger") == "stranger"
+    # The map wins over TEAM_MEMBERS; the team reaches every alias
+    assert index.team_of("aliia-old") == "compiler"
+    assert index.team_of("carol") == "web"
+    assert index.is_bot("tf-gardener")
+    assert index.is_bot("dependabot[bot]")
+    assert index.is_bot("renovate", "Bot")
+    assert not index.is_bot("abbott")
+
+
+def test_refresh_parses_appended_lines_and_rebuilds_on_edit(tmp_path):
+    path = tmp_path / "identities.mailmap"
+    path.write_text("Aliia Khasanova @akhasanova\n")
+    index = IdentityIndex(str(path), team_members="")
+    assert not index.refresh()
+    before = index.people
+
+    with open(path, "a") as f:
+        f.write("Bob Smith @bsmith [team: web]\n")
+    os.utime(path, ns=(1, 1))  # a distinct mtime even on coarse clocks
+    assert index.refresh()
+    assert index.people is before  # appended lines extend the same index
+    assert index.canonical("bsmith") == "Bob Smith"
+    assert index.canonical("akhasanova") == "Aliia Khasanova"
+
+    path.write_text("Bob Smith @bsmith [team: web]\n")
+    assert index.refresh()
+    assert index.people is not before  # any other edit rebuilds and swaps
+    assert index.canonical("akhasanova") == "akhasanova"
+    assert index.team_of("bsmith") == "web"
+
+
+def pr_row(number, author, author_is_bot):
+    return {
+        "number": number, "author": author, "state": "closed", "created_at": "2099-01-01T00:00:00Z",
+        "updated_at": "2099-01-02T00:00:00Z", "merged_at": "2099-01-02T00:00:00Z", "closed_at": "2099-01-02T00:00:00Z",
+        "first_review_at": None, "first_reviewer": None, "additions": None if author_is_bot else 10,
+        "deletions": None if author_is_bot else 2, "files_changed": None if author_is_bot else 1,
+        "author_is_bot": author_is_bot
+    }
+
+
+def test_graphql_bot_author_is_flagged():
+    node = {
+        "number": 1, "state": "MERGED", "createdAt": "2099-01-01T00:00:00Z", "updatedAt": "2099-01-02T00:00:00Z",
+        "mergedAt": "2099-01-02T00:00:00Z", "closedAt": "2099-01-02T00:00:00Z", "author": {"login": "renovate", "__typename": "Bot"},
+        "reviews": {"nodes": []}, "files": {"totalCount": 0, "nodes": []}
+    }
+    assert node_row(node)["author_is_bot"]
+
+
+def test_stored_bot_flag_survives_a_restart(temp_db):
+    # GraphQL logins have no [bot] suffix: only the stored flag marks them,
+    # since this process never saw the harvest that stored the rows
+    save_pr_rows("org/api", [pr_row(1, "renovate", True), pr_row(2, "alice", False)])
+    harvested = finish_from_rows("org/api", "2098-12-31T00:00:00Z", 0)
+    assert harvested["window"].merged == 2
+    assert len(harvested["event_table"]) == 1
@@ -0,0 +1,33 @@
+import sqlite3
+from datetime import datetime
+
+import app.db as db
+
+
+def test_legacy_reports_show_up_in_the_default_repos_trend(tmp_path, monkeypatch):
+    # A database from before the repos column: reports only ever covered the default repo
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE dev_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, total_additions INTEGER,
+            total_deletions INTEGER, total_prs INTEGER, merged_prs INTEGER, pr_throughput REAL,
+            avg_review_latency REAL, avg_cycle_time REAL, ci_failures INTEGER, per_author TEXT, summary TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO dev_reports (timestamp, total_additions, total_deletions, total_prs, merged_prs,
+                                 pr_throughput, avg_review_latency, avg_cycle_time, ci_failures, per_author, summary)
+        VALUES (?, 120, 30, 10, 8, 0.8, 5.0, 12.0, 2, ?, 'legacy')
+    """, (datetime.now().isoformat(), str({"alice": {"additions": 120, "deletions": 30, "files_touched": 4}})))
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+
+    trend = db.weekly_trend(["microsoft/vscode"])
+    assert len(trend) == 1
+    assert trend[0]["total_prs"] == 10
+    assert trend[0]["merged_prs"] == 8
+    assert db.get_connection().execute("SELECT repos FROM dev_reports").fetchone()[0] == "microsoft/vscode"
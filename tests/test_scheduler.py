@@ -0,0 +1,116 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from app.db import get_cached_report, get_connection, get_schedule_last_run
+from app.jobs import ReportJobQueue, report_cache_key
+from app.scheduler import SCHEDULED_REPORT_MAX_TTL, ReportScheduler, parse_schedules
+
+UTC = timezone.utc
+MONDAY_6AM = datetime(2026, 10, 5, 6, 0, tzinfo=UTC)
+
+
+class FakeJobs:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, repos, channel_id, subscriber, refresh=False, cache_ttl=None):
+        self.submitted.append((repos, channel_id, cache_ttl))
+        return f"job{len(self.submitted)}", "queued"
+
+
+def scheduler(jobs):
+    return ReportScheduler(jobs, lambda channel: None, parse_schedules("0 6 * * 1|C1|org/api"), poll_seconds=30)
+
+
+def test_new_schedule_waits_for_its_next_run(temp_db):
+    jobs = FakeJobs()
+    sched = scheduler(jobs)
+    # First sight on a Wednesday: Monday's run is not replayed
+    assert sched.run_pending(MONDAY_6AM + timedelta(days=2)) == []
+    assert jobs.submitted == []
+    assert datetime.fromisoformat(get_schedule_last_run(sched.schedules[0]["id"])) == MONDAY_6AM
+
+    assert sched.run_pending(MONDAY_6AM + timedelta(days=7, seconds=10)) == ["job1"]
+    assert sched.run_pending(MONDAY_6AM + timedelta(days=7, seconds=40)) == []
+    # Served from cache until just after the next Monday's run, within the cap
+    assert jobs.submitted[0][2] == min(7 * 86400 - 10 + 30, SCHEDULED_REPORT_MAX_TTL)
+
+
+def test_missed_runs_are_caught_up_once(temp_db):
+    jobs = FakeJobs()
+    sched = scheduler(jobs)
+    sched.run_pending(MONDAY_6AM)
+    # Down for two Mondays: one catch-up run, for the latest one
+    assert sched.run_pending(MONDAY_6AM + timedelta(days=16)) == ["job1"]
+    assert datetime.fromisoformat(get_schedule_last_run(sched.schedules[0]["id"])) == MONDAY_6AM + timedelta(days=14)
+    assert sched.run_pending(MONDAY_6AM + timedelta(days=16, minutes=1)) == []
+
+
+class BlockingPipeline:
+    # A one-node pipeline that waits until released, so a second submit merges
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get_graph(self):
+        return type("Graph", (), {"nodes": ["Report"]})()
+
+    def stream(self, state, stream_mode=None):
+        self.release.wait(5)
+        yield {"Report": {}}
+
+
+class Subscriber:
+    def __init__(self):
+        self.done = threading.Event()
+
+    def on_progress(self, job_id, text):
+        pass
+
+    def on_done(self, job_id, artifact):
+        self.done.set()
+
+    def on_followup(self, job_id, text):
+        pass
+
+    def on_error(self, job_id, error):
+        self.done.set()
+
+
+def test_merged_submit_keeps_the_longer_cache_ttl(temp_db):
+    pipeline = BlockingPipeline()
+    queue = ReportJobQueue(pipeline, lambda state: {"summary": "report", "chart": None}, workers=1, cache_ttl=60)
+    on_demand, scheduled = Subscriber(), Subscriber()
+    first, status = queue.submit(["org/api"], "C1", on_demand)
+    assert status == "queued"
+    assert queue.submit(["org/api"], "C1", scheduled, refresh=True, cache_ttl=7 * 86400) == (first, "merged")
+    pipeline.release.set()
+    assert scheduled.done.wait(5) and on_demand.done.wait(5)
+
+    cached = get_cached_report(report_cache_key(["org/api"]))
+    assert cached is not None
+    expires_at = get_connection().execute(
+        "SELECT expires_at FROM report_cache WHERE cache_key = ?", (report_cache_key(["org/api"]),)
+    ).fetchone()[0]
+    assert expires_at - cached["created_at"] == 7 * 86400
+
+
+class Recorder(Subscriber):
+    def on_done(self, job_id, artifact):
+        self.artifact = artifact
+        super().on_done(job_id, artifact)
+
+
+def test_cache_hit_keeps_no_contributions_flag(temp_db):
+    # A quiet week has no chart on purpose; served from cache it must not look like a failed render
+    pipeline = BlockingPipeline()
+    pipeline.release.set()
+    render = lambda state: {"summary": "quiet week", "chart": None, "has_contributions": False}
+    queue = ReportJobQueue(pipeline, render, workers=1, cache_ttl=60)
+    built = Recorder()
+    queue.submit(["org/api"], "C1", built)
+    assert built.done.wait(5)
+
+    cached = Recorder()
+    assert queue.submit(["org/api"], "C1", cached) == (None, "cached")
+    assert cached.artifact["chart"] is None
+    assert cached.artifact["has_contributions"] is False
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+
+from app.utils.sketch import SKETCH_RELATIVE_ACCURACY, DDSketch, merge_sketches
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def lognormal(n, seed):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(1.5, 1.2) for _ in range(n)]
+
+
+def assert_within_accuracy(sketch, values):
+    for q in QUANTILES:
+        exact = float(np.quantile(values, q, method="lower"))
+        assert abs(sketch.quantile(q) - exact) <= exact * SKETCH_RELATIVE_ACCURACY + 1e-9, q
+
+
+def test_quantiles_within_relative_accuracy():
+    values = lognormal(20000, seed=1)
+    sketch = DDSketch()
+    for value in values:
+        sketch.add(value)
+    assert_within_accuracy(sketch, values)
+    assert sketch.count == len(values)
+
+
+def test_merged_weeks_equal_one_sketch_of_all_values():
+    weeks = [lognormal(3000, seed=week) for week in range(4)]
+    weekly = []
+    for values in weeks:
+        sketch = DDSketch()
+        for value in values:
+            sketch.add(value)
+        weekly.append(sketch)
+
+    merged = merge_sketches(weekly)
+    whole = DDSketch()
+    for value in (v for values in weeks for v in values):
+        whole.add(value)
+
+    assert merged.buckets == whole.buckets
+    assert merged.count == whole.count
+    assert merged.summary() == whole.summary()
+    assert_within_accuracy(merged, [v for values in weeks for v in values])
+
+
+def test_json_round_trip_and_zeros():
+    sketch = DDSketch()
+    for value in (0.0, -2.0, 0.5, 3.0, 3.0, 40.0):
+        sketch.add(value)
+    restored = DDSketch.from_json(sketch.to_json())
+    assert restored.summary() == sketch.summary()
+    assert restored.zeros == 2
+    assert restored.quantile(0.0) == 0.0
+    assert DDSketch().summary() == {"count": 0, "mean": None, "p50": None, "p90": None, "p99": None}